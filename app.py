@@ -1,64 +1,170 @@
 import os
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, abort
+import click
+from flask.cli import ScriptInfo
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, abort, make_response, Response, jsonify, send_file
 from flask_login import login_user, logout_user, current_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-from flask_mail import Mail, Message
-from flask_migrate import Migrate
 
 from extensions import db, login_manager, mail
-from forms import LoginForm, RegisterForm, ProductForm, OfferForm, ContactForm
-from models import User, Product, Cart, Offer, Order, OrderItem, ContactMessage, ProductImage
-from image_service import ImageService
+from db_engine import database_engine
+from db_routing import read_replica_router, read_replica
+from forms import LoginForm, RegisterForm, ProductForm, ProductVariantForm, OfferForm, ContactForm
+from models import User, Product, ProductVariant, Cart, Offer, Order, OrderItem, ContactMessage, ProductImage
+from image_service import image_service
+from image_cache import derivative_cache
+from image_commands import images_cli
+from offer_scheduler import offer_scheduler
+from mail_queue import mail_queue
+from order_events import order_events
+from order_tracking import order_tracking
+from identity import identity_loader
+from password_policy import password_policy, PasswordHashingBusy
+from rate_limit import rate_limiter, by_ip, by_form_field
+from template_cache import template_cache
+from compression import compression
+from page_cache import page_cache
+from user_validation import find_conflicts, CONFLICT_MESSAGES
+from sqlalchemy.exc import IntegrityError
 from config import Config, ImageConfig
 from functools import wraps
 
-app = Flask(__name__)
-app.config.from_object(Config)
-app.config['IMAGE_CONFIG'] = ImageConfig()
-image_service = ImageService()
-# تهيئة الامتدادات
-db.init_app(app)
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-mail.init_app(app)
-image_service.init_app(app)
-migrate = Migrate(app, db)
-
-# إنشاء المجلدات المطلوبة
-with app.app_context():
-    # إنشاء مجلدات التحميل
-    folders = [
-        os.path.join(app.config['UPLOAD_FOLDER'], ImageConfig.PRODUCTS_FOLDER),
-        os.path.join(app.config['UPLOAD_FOLDER'], ImageConfig.OFFERS_FOLDER),
-        os.path.join(app.config['UPLOAD_FOLDER'], ImageConfig.USERS_FOLDER)
-    ]
-    
-    for folder in folders:
-        os.makedirs(folder, exist_ok=True)
-
-
-# إنشاء الجداول عند التشغيل الأول
-with app.app_context():
-    db.create_all()
-    # إنشاء مستخدم أدمن إذا لم يكن موجود
-    if not User.query.filter_by(username='admin').first():
-        admin = User(
-            first_name='Admin',
-            last_name='User',
-            username='admin',
-            email='admin@example.com',
-            is_admin=True
-        )
-        admin.set_password('admin123')
-        db.session.add(admin)
-        db.session.commit()
+bp = Blueprint('main', __name__)
+
+def create_app(config_object=Config):
+    """إنشاء التطبيق دون أي عمليات على قاعدة البيانات أو نظام الملفات"""
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.config['IMAGE_CONFIG'] = ImageConfig()
+    
+    # تهيئة الامتدادات (خيارات المحرك قبل إنشائه)
+    database_engine.init_app(app)
+    read_replica_router.init_app(app)
+    db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'main.login'
+    mail.init_app(app)
+    image_service.init_app(app)
+    derivative_cache.init_app(app)
+    offer_scheduler.init_app(app)
+    mail_queue.init_app(app)
+    order_events.init_app(app)
+    order_tracking.init_app(app)
+    identity_loader.init_app(app)
+    password_policy.init_app(app)
+    rate_limiter.init_app(app)
+    template_cache.init_app(app)
+    compression.init_app(app)
+    page_cache.init_app(app)
+    
+    app.register_blueprint(bp)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_admin_command)
+    app.cli.add_command(images_cli)
+    return app
+
+# مجلد ترحيلات Alembic، ونسخة الأساس التي تطابق قواعد البيانات المنشأة قبل إضافة الترحيلات
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+BASELINE_REVISION = '0001_baseline'
+
+def get_migrate(app):
+    """تسجيل Flask-Migrate عند أول حاجة إليه (مع تأجيل استيراد alembic)"""
+    from flask_migrate import Migrate
+    if 'migrate' not in app.extensions:
+        Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
+    return app.extensions['migrate']
+
+def init_database():
+    """إنشاء الجداول أو ترقيتها إلى آخر ترحيل، وإنشاء مجلدات التحميل
+
+    - قاعدة فارغة: الجداول من النماذج مباشرة ثم تعليمها بآخر ترحيل
+    - قاعدة أنشئت بـ create_all قبل الترحيلات: تعلم بنسخة الأساس ثم ترقى
+    - غير ذلك: ترقية عادية
+    """
+    from flask_migrate import stamp, upgrade
+    get_migrate(current_app._get_current_object())
+    tables = set(db.inspect(db.engine).get_table_names())
+    if not tables:
+        db.create_all()
+        stamp()
+    else:
+        if 'alembic_version' not in tables:
+            stamp(revision=BASELINE_REVISION)
+        upgrade()
+    for folder in (ImageConfig.PRODUCTS_FOLDER, ImageConfig.OFFERS_FOLDER, ImageConfig.USERS_FOLDER):
+        os.makedirs(os.path.join(current_app.config['UPLOAD_FOLDER'], folder), exist_ok=True)
+
+def seed_admin(username='admin', email='admin@example.com', password='admin123'):
+    """إنشاء مستخدم أدمن إذا لم يكن موجوداً، ويعيد True عند الإنشاء"""
+    if db.session.query(User.query.filter_by(username=username).exists()).scalar():
+        return False
+    admin = User(
+        first_name='Admin',
+        last_name='User',
+        username=username,
+        email=email,
+        is_admin=True
+    )
+    admin.set_password(password)
+    db.session.add(admin)
+    db.session.commit()
+    return True
+
+class LazyMigrateGroup(click.MultiCommand):
+    """أوامر "flask db" مع تأجيل استيراد Flask-Migrate (ومعه alembic) حتى استدعائها"""
+    
+    def _load(self, ctx):
+        from flask_migrate.cli import db as db_group
+        get_migrate(ctx.ensure_object(ScriptInfo).load_app())
+        return db_group
+    
+    def list_commands(self, ctx):
+        return self._load(ctx).list_commands(ctx)
+    
+    def get_command(self, ctx, name):
+        return self._load(ctx).get_command(ctx, name)
+
+migrate_command = LazyMigrateGroup('db', help='Perform database migrations.')
+
+@click.command('init-db')
+def init_db_command():
+    """إنشاء جداول قاعدة البيانات أو ترقيتها، ومجلدات التحميل"""
+    init_database()
+    click.echo('Database initialized')
+
+@click.command('seed-admin')
+@click.option('--username', default='admin')
+@click.option('--email', default='admin@example.com')
+@click.password_option()
+def seed_admin_command(username, email, password):
+    """إنشاء حساب الأدمن"""
+    if seed_admin(username, email, password):
+        click.echo(f'Admin user "{username}" created')
+    else:
+        click.echo(f'User "{username}" already exists')
 
 # تحميل المستخدم
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # هوية خفيفة من الجلسة، والملف الكامل يحمل عند الحاجة فقط
+    return identity_loader.load(user_id)
+
+# رفض الطلب عند امتلاء طابور تشفير كلمات المرور بدلاً من حجز العامل
+@bp.app_errorhandler(PasswordHashingBusy)
+def password_hashing_busy(e):
+    db.session.rollback()
+    flash('الخادم مشغول حالياً، يرجى المحاولة بعد قليل', 'warning')
+    response = redirect(request.url)
+    response.headers['Retry-After'] = '5'
+    return response
+
+# تجاوز الحد المسموح من الطلبات
+@bp.app_errorhandler(429)
+def too_many_requests(e):
+    response = make_response(render_template('errors/429.html', retry_after=e.retry_after), 429)
+    if e.retry_after:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
 # دالة للتحقق من أن المستخدم أدمن
 def admin_required(f):
@@ -70,46 +176,102 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# نسخ البيانات المستخدمة في ETag لصفحات الكتالوج (استعلامات مفهرسة صغيرة)
+def catalog_version():
+    count, latest = db.session.query(db.func.count(Product.id), db.func.max(Product.updated_at)).one()
+    return (count, latest), latest
+
+def product_version(id):
+    row = db.session.query(Product.updated_at).filter(Product.id == id).first()
+    if row is None:
+        abort(404)
+    return (id, row.updated_at), row.updated_at
+
+def offers_version():
+    active_offers = offer_scheduler.active_offers()
+    latest = max((offer.updated_at for offer in active_offers if offer.updated_at), default=None)
+    return tuple((offer.id, offer.updated_at) for offer in active_offers), latest
+
 # المسارات الأساسية
-@app.route('/')
+@bp.route('/')
+@read_replica
+@page_cache.conditional(catalog_version)
 def index():
     products = Product.query.order_by(Product.created_at.desc()).limit(4).all()
     return render_template('index.html', products=products)
 
-@app.route('/products')
+@bp.route('/products')
+@read_replica
+@page_cache.conditional(catalog_version)
 def products():
     products = Product.query.all()
     return render_template('products.html', products=products)
 
-@app.route('/product/<int:id>')
+@bp.route('/product/<int:id>')
+@read_replica
+@page_cache.conditional(product_version)
 def product_detail(id):
     product = Product.query.get_or_404(id)
     return render_template('product_detail.html', product=product)
 
-@app.route('/cart')
+# أحجام الصور عند الطلب، مثل /img/products/ab/cd/abcd.jpg?w=300&fmt=webp
+@bp.route('/img/<folder>/<path:name>')
+def image_derivative(folder, name):
+    try:
+        path, mimetype = derivative_cache.get(
+            folder, name,
+            width=request.args.get('w', type=int),
+            height=request.args.get('h', type=int),
+            fmt=request.args.get('fmt')
+        )
+    except FileNotFoundError:
+        abort(404)
+    except ValueError:
+        abort(400)
+    return send_file(path, mimetype=mimetype, max_age=ImageConfig.DERIVATIVE_MAX_AGE)
+
+@bp.route('/cart')
 @login_required
 def cart():
     cart_items = Cart.query.filter_by(user_id=current_user.id).all()
-    total = sum(item.product.price * item.quantity for item in cart_items)
+    total = sum(item.get_total_price() for item in cart_items)
     return render_template('cart.html', cart_items=cart_items, total=total)
 
-@app.route('/add_to_cart/<int:product_id>', methods=['POST'])
+@bp.route('/add_to_cart/<int:product_id>', methods=['POST'])
 @login_required
 def add_to_cart(product_id):
     product = Product.query.get_or_404(product_id)
-    cart_item = Cart.query.filter_by(user_id=current_user.id, product_id=product.id).first()
+    quantity = max(request.form.get('quantity', 1, type=int) or 1, 1)
+    
+    # المنتجات ذات المقاسات والألوان تضاف إلى السلة بمتغير محدد
+    variant = None
+    if product.variants:
+        variant = ProductVariant.query.filter_by(
+            id=request.form.get('variant_id', type=int), product_id=product.id, is_active=True
+        ).first()
+        if variant is None:
+            flash('يرجى اختيار المقاس واللون', 'warning')
+            return redirect(url_for('main.product_detail', id=product.id))
+    
+    cart_item = Cart.query.filter_by(
+        user_id=current_user.id, product_id=product.id, variant_id=variant.id if variant else None
+    ).first()
+    available = variant.stock if variant else product.stock
+    if (cart_item.quantity if cart_item else 0) + quantity > available:
+        flash('الكمية المطلوبة غير متوفرة في المخزون', 'warning')
+        return redirect(request.referrer or url_for('main.product_detail', id=product.id))
     
     if cart_item:
-        cart_item.quantity += 1
+        cart_item.quantity += quantity
     else:
-        cart_item = Cart(user_id=current_user.id, product_id=product.id, quantity=1)
+        cart_item = Cart(user_id=current_user.id, product_id=product.id, variant=variant, quantity=quantity)
         db.session.add(cart_item)
     
     db.session.commit()
     flash('تمت إضافة المنتج إلى سلة التسوق', 'success')
     return redirect(request.referrer)
 
-@app.route('/update_cart/<int:cart_id>', methods=['POST'])
+@bp.route('/update_cart/<int:cart_id>', methods=['POST'])
 @login_required
 def update_cart(cart_id):
     cart_item = Cart.query.get_or_404(cart_id)
@@ -118,6 +280,9 @@ def update_cart(cart_id):
     
     action = request.form.get('action')
     if action == 'increase':
+        if cart_item.quantity >= cart_item.get_available_stock():
+            flash('الكمية المطلوبة غير متوفرة في المخزون', 'warning')
+            return redirect(url_for('main.cart'))
         cart_item.quantity += 1
     elif action == 'decrease':
         if cart_item.quantity > 1:
@@ -129,20 +294,20 @@ def update_cart(cart_id):
     
     db.session.commit()
     flash('تم تحديث سلة التسوق', 'success')
-    return redirect(url_for('cart'))
+    return redirect(url_for('main.cart'))
 
-@app.route('/checkout')
+@bp.route('/checkout')
 @login_required
 def checkout():
     cart_items = Cart.query.filter_by(user_id=current_user.id).all()
     if not cart_items:
         flash('سلة التسوق فارغة', 'warning')
-        return redirect(url_for('cart'))
+        return redirect(url_for('main.cart'))
     
-    total = sum(item.product.price * item.quantity for item in cart_items)
+    total = sum(item.get_total_price() for item in cart_items)
     return render_template('checkout.html', cart_items=cart_items, total=total)
 
-@app.route('/process_order', methods=['POST'])
+@bp.route('/process_order', methods=['POST'])
 @login_required
 def process_order():
     # جمع بيانات الطلب من النموذج
@@ -153,41 +318,84 @@ def process_order():
     cart_items = Cart.query.filter_by(user_id=current_user.id).all()
     if not cart_items:
         flash('سلة التسوق فارغة', 'warning')
-        return redirect(url_for('cart'))
+        return redirect(url_for('main.cart'))
     
     # حساب الإجمالي
-    total = sum(item.product.price * item.quantity for item in cart_items)
+    total = sum(item.get_total_price() for item in cart_items)
     
     # إنشاء الطلب
     order = Order(
         user_id=current_user.id,
         total_amount=total,
         payment_method=payment_method,
-        shipping_address=shipping_address
+        shipping_address=shipping_address,
+        customer_name=current_user.get_full_name(),
+        customer_email=current_user.email,
+        customer_phone=current_user.phone,
+        tracking_number=order_tracking.generate_tracking_number()
     )
     db.session.add(order)
-    db.session.commit()
+    db.session.flush()  # للحصول على رقم الطلب ضمن نفس المعاملة
+    order_tracking.record_status(order)
     
-    # إضافة عناصر الطلب
-    for item in cart_items:
+    # إضافة عناصر الطلب (بترتيب ثابت حتى لا تتعارض أقفال الطلبات المتزامنة)
+    for item in sorted(cart_items, key=lambda item: (item.product_id, item.variant_id or 0)):
+        if item.needs_variant():
+            db.session.rollback()
+            flash(f'يرجى اختيار المقاس واللون لـ "{item.product.name}" وإضافته إلى السلة من جديد', 'warning')
+            return redirect(url_for('main.cart'))
+        # تقليل الكمية المتاحة، وإلغاء الطلب كاملاً إن نفدت
+        if not reserve_stock(item):
+            db.session.rollback()
+            flash(f'الكمية المطلوبة من "{item.product.name}" لم تعد متوفرة', 'danger')
+            return redirect(url_for('main.cart'))
         order_item = OrderItem(
             order_id=order.id,
             product_id=item.product_id,
+            variant_id=item.variant_id,
+            sku=item.variant.sku if item.variant else None,
+            variant_label=item.variant.get_label() if item.variant else None,
             quantity=item.quantity,
-            price=item.product.price
+            price=item.get_unit_price()
         )
         db.session.add(order_item)
-        # تقليل الكمية المتاحة من المنتج
-        product = Product.query.get(item.product_id)
-        product.stock -= item.quantity
         # حذف العنصر من السلة
         db.session.delete(item)
     
+    order_events.record(order, 'order_created')
     db.session.commit()
+    order_events.notify()
     flash('تم إنشاء الطلب بنجاح', 'success')
-    return redirect(url_for('order_confirmation', order_id=order.id))
+    return redirect(url_for('main.order_confirmation', order_id=order.id))
+
+def reserve_stock(item):
+    """خصم كمية عنصر السلة من المخزون، ويعيد False إن لم تعد متوفرة
 
-@app.route('/order_confirmation/<int:order_id>')
+    الشرط جزء من جملة UPDATE نفسها، فلا ينجح طلبان متزامنان على آخر قطعة
+    """
+    if item.variant_id is not None:
+        result = db.session.execute(
+            db.update(ProductVariant)
+            .where(ProductVariant.id == item.variant_id,
+                   ProductVariant.is_active.is_(True),
+                   ProductVariant.stock >= item.quantity)
+            .values(stock=ProductVariant.stock - item.quantity)
+        )
+        if result.rowcount != 1:
+            return False
+        # المجموع المحفوظ في المنتج ينقص بنفس الكمية
+        condition = Product.id == item.product_id
+    else:
+        # مخزون المنتج ذي المتغيرات مجموع محسوب منها، فلا يخصم منه عنصر بلا متغير
+        has_variants = db.select(ProductVariant.id).where(ProductVariant.product_id == Product.id).exists()
+        condition = db.and_(Product.id == item.product_id, Product.stock >= item.quantity, ~has_variants)
+    result = db.session.execute(
+        db.update(Product).where(condition)
+        .values(stock=Product.stock - item.quantity, updated_at=datetime.utcnow())
+    )
+    return result.rowcount == 1
+
+@bp.route('/order_confirmation/<int:order_id>')
 @login_required
 def order_confirmation(order_id):
     order = Order.query.get_or_404(order_id)
@@ -195,25 +403,29 @@ def order_confirmation(order_id):
         abort(403)
     return render_template('order_confirmation.html', order=order)
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
+@rate_limiter.limit('RATELIMIT_LOGIN_IP', by_ip)
+@rate_limiter.limit('RATELIMIT_LOGIN_USERNAME', by_form_field('username'))
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         if user and user.check_password(form.password.data):
+            db.session.commit()  # حفظ التجزئة الجديدة إن أعيد التشفير
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
-            return redirect(next_page or url_for('index'))
+            return redirect(next_page or url_for('main.index'))
         flash('اسم المستخدم أو كلمة المرور غير صحيحة', 'danger')
     return render_template('login.html', form=form)
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
+@rate_limiter.limit('RATELIMIT_REGISTER', by_ip)
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     form = RegisterForm()
     if form.validate_on_submit():
@@ -226,26 +438,36 @@ def register():
         )
         user.set_password(form.password.data)
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # تسجيل متزامن بنفس الاسم أو البريد بعد التحقق، وغير ذلك خطأ حقيقي
+            db.session.rollback()
+            conflicts = find_conflicts(form.username.data, form.email.data)
+            if not conflicts:
+                raise
+            form.add_conflict_errors(conflicts)
+            return render_template('register.html', form=form)
         flash('تم تسجيل حسابك بنجاح! يمكنك الآن تسجيل الدخول', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 # صفحة "من نحن"
-@app.route('/about')
+@bp.route('/about')
 def about():
     return render_template('about.html', 
                          page_title="من نحن - متجر العبايات",
                          active_page='about')
 
 # صفحة "اتصل بنا" - مع نموذج التواصل
-@app.route('/contact', methods=['GET', 'POST'])
+@bp.route('/contact', methods=['GET', 'POST'])
+@rate_limiter.limit('RATELIMIT_CONTACT', by_ip)
 def contact():
     form = ContactForm()
     
@@ -256,8 +478,17 @@ def contact():
         message = form.message.data
         
         try:
-            # إرسال البريد الإلكتروني
-            msg = Message(
+            # حفظ الرسالة في قاعدة البيانات
+            contact_message = ContactMessage(
+                name=name,
+                email=email,
+                subject=subject,
+                message=message
+            )
+            db.session.add(contact_message)
+            
+            # إضافة البريد إلى طابور الإرسال في نفس المعاملة
+            mail_queue.enqueue(
                 subject=f"رسالة جديدة من متجر العبايات: {subject}",
                 recipients=['info@abaya-store.com'],  # البريد الذي تستقبل عليه الرسائل
                 body=f"""
@@ -269,133 +500,260 @@ def contact():
                 {message}
                 """
             )
-            mail.send(msg)
-            
-            # حفظ الرسالة في قاعدة البيانات
-            contact_message = ContactMessage(
-                name=name,
-                email=email,
-                subject=subject,
-                message=message
-            )
-            db.session.add(contact_message)
             db.session.commit()
+            mail_queue.notify()
             
             flash('تم إرسال رسالتك بنجاح. سنتواصل معك قريباً!', 'success')
-            return redirect(url_for('contact'))
+            return redirect(url_for('main.contact'))
             
         except Exception as e:
+            db.session.rollback()
             flash('حدث خطأ أثناء إرسال الرسالة. يرجى المحاولة مرة أخرى.', 'danger')
-            print(f"Error sending email: {e}")
+            current_app.logger.error(f'Error saving contact message: {str(e)}')
     
     return render_template('contact.html', 
                          page_title="اتصل بنا - متجر العبايات",
                          active_page='contact',
                          form=form)
 
-@app.route('/privacy')
+@bp.route('/privacy')
 def privacy():
     return render_template('privacy.html', 
                          page_title="سياسة الخصوصية - متجر العبايات",
                          active_page='privacy')
 
-@app.route('/terms')
+@bp.route('/terms')
 def terms():
     return render_template('terms.html', 
                          page_title="الشروط والأحكام - متجر العبايات",
                          active_page='terms')
 
-@app.route('/offers')
+@bp.route('/offers')
+@page_cache.conditional(offers_version)
 def offers():
-    active_offers = Offer.query.filter_by(is_active=True).filter(Offer.end_date >= datetime.now()).all()
-    return render_template('offers.html', offers=active_offers)
+    active_offers = offer_scheduler.active_offers()
+    response = make_response(render_template('offers.html', offers=active_offers))
+    
+    # الصفحة لا تتغير قبل بدء أو انتهاء العرض التالي
+    if not current_user.is_authenticated:
+        response.headers['Cache-Control'] = f'private, max-age={offer_scheduler.seconds_until_change()}'
+        response.vary.add('Cookie')
+    return response
 
-@app.route('/account')
+@bp.route('/account')
 @login_required
 def account():
-    # جلب طلبات المستخدم
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.order_date.desc()).all()
-    return render_template('account.html', orders=orders)
+    per_page = current_app.config.get('ACCOUNT_ORDERS_PER_PAGE', 10)
+    
+    # جلب صفحة من طلبات المستخدم مع عدد المنتجات في استعلام واحد
+    query = db.session.query(
+        Order.id,
+        Order.order_date,
+        Order.status,
+        Order.total_amount,
+        Order.tracking_number,
+        db.func.coalesce(db.func.sum(OrderItem.quantity), 0).label('items_count')
+    ).outerjoin(OrderItem, OrderItem.order_id == Order.id).filter(Order.user_id == current_user.id)
+    
+    # التصفح بالمؤشر (order_date, id) بدلاً من OFFSET
+    before = request.args.get('before', '')
+    try:
+        before_date, before_id = before.split('_')
+        before_date = datetime.fromisoformat(before_date)
+        before_id = int(before_id)
+    except ValueError:
+        before_date = before_id = None
+    
+    if before_date is not None:
+        query = query.filter(db.or_(
+            Order.order_date < before_date,
+            db.and_(Order.order_date == before_date, Order.id < before_id)
+        ))
+    
+    orders = query.group_by(Order.id).order_by(
+        Order.order_date.desc(), Order.id.desc()
+    ).limit(per_page + 1).all()
+    
+    next_cursor = None
+    if len(orders) > per_page:
+        orders = orders[:per_page]
+        last = orders[-1]
+        next_cursor = f'{last.order_date.isoformat()}_{last.id}'
+    
+    return render_template('account.html',
+                         orders=orders,
+                         order_statuses=Order.STATUSES,
+                         next_cursor=next_cursor,
+                         is_first_page=before_date is None,
+                         watch_orders=order_events.should_stream(current_user.id))
 
-@app.route('/update_account', methods=['POST'])
+@bp.route('/account/orders/<int:order_id>/items')
+@login_required
+def account_order_items(order_id):
+    order_user_id = db.session.query(Order.user_id).filter(Order.id == order_id).scalar()
+    if order_user_id is None:
+        abort(404)
+    if order_user_id != current_user.id:
+        abort(403)
+    
+    items = db.session.query(
+        OrderItem.product_id, Product.name, OrderItem.quantity, OrderItem.price
+    ).join(Product, Product.id == OrderItem.product_id).filter(OrderItem.order_id == order_id).all()
+    
+    return jsonify([
+        {
+            'product_id': product_id,
+            'name': name,
+            'quantity': quantity,
+            'price': f'{price:.2f}',
+            'total': f'{price * quantity:.2f}'
+        }
+        for product_id, name, quantity, price in items
+    ])
+
+# بث مباشر لتحديثات طلبات المستخدم (Server-Sent Events)
+@bp.route('/account/order_events')
+@login_required
+def order_events_stream():
+    # 204 يوقف إعادة الاتصال في المتصفح عندما لا يوجد ما يتابع
+    if not order_events.should_stream(current_user.id):
+        return '', 204
+    response = Response(
+        order_events.stream(current_user.id, request.headers.get('Last-Event-ID', type=int)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# حقول نموذج معلومات الحساب
+ACCOUNT_FIELDS = ('first_name', 'last_name', 'username', 'email', 'phone')
+REQUIRED_ACCOUNT_FIELDS = ('first_name', 'last_name', 'username', 'email')
+
+@bp.route('/update_account', methods=['POST'])
 @login_required
 def update_account():
     if request.method == 'POST':
-        current_user.first_name = request.form.get('first_name')
-        current_user.last_name = request.form.get('last_name')
-        current_user.email = request.form.get('email')
-        current_user.phone = request.form.get('phone')
-        current_user.username = request.form.get('username')
+        user = current_user.profile
         
-        # تغيير كلمة المرور إذا تم تقديمها
-        current_password = request.form.get('current_password')
-        new_password = request.form.get('new_password')
-        confirm_password = request.form.get('confirm_password')
+        # نموذج تغيير كلمة المرور يرسل حقول كلمة المرور فقط
+        if 'new_password' in request.form:
+            return update_password(user)
         
-        if current_password and new_password and confirm_password:
-            if current_user.check_password(current_password):
-                if new_password == confirm_password:
-                    current_user.set_password(new_password)
-                    flash('تم تحديث كلمة المرور بنجاح', 'success')
-                else:
-                    flash('كلمة المرور الجديدة غير متطابقة', 'danger')
-            else:
-                flash('كلمة المرور الحالية غير صحيحة', 'danger')
+        # تحديث الحقول المرسلة فقط، والحقول المطلوبة لا تقبل قيمة فارغة
+        values = {field: request.form.get(field, '').strip()
+                  for field in ACCOUNT_FIELDS if field in request.form}
+        if any(not values[field] for field in REQUIRED_ACCOUNT_FIELDS if field in values):
+            flash('الرجاء تعبئة الحقول المطلوبة', 'danger')
+            return redirect(url_for('main.account'))
         
-        db.session.commit()
+        # رفض اسم المستخدم أو البريد المستخدم من حساب آخر قبل الحفظ
+        username, email = values.get('username'), values.get('email')
+        conflicts = find_conflicts(username, email, exclude_user_id=user.id)
+        if conflicts:
+            for field in conflicts:
+                flash(CONFLICT_MESSAGES[field], 'danger')
+            return redirect(url_for('main.account'))
+        
+        for field, value in values.items():
+            setattr(user, field, value or None)
+        
+        identity_loader.bump(user)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # حساب آخر أخذ الاسم أو البريد بعد التحقق، وغير ذلك خطأ حقيقي
+            db.session.rollback()
+            conflicts = find_conflicts(username, email, exclude_user_id=user.id)
+            if not conflicts:
+                raise
+            for field in conflicts:
+                flash(CONFLICT_MESSAGES[field], 'danger')
+            return redirect(url_for('main.account'))
         flash('تم تحديث معلومات الحساب بنجاح', 'success')
-        return redirect(url_for('account'))
+        return redirect(url_for('main.account'))
+
+def update_password(user):
+    """تغيير كلمة المرور من نموذج الحساب"""
+    current_password = request.form.get('current_password')
+    new_password = request.form.get('new_password')
+    confirm_password = request.form.get('confirm_password')
+    
+    if not (current_password and new_password and confirm_password):
+        flash('الرجاء تعبئة جميع حقول كلمة المرور', 'danger')
+    elif not user.check_password(current_password):
+        flash('كلمة المرور الحالية غير صحيحة', 'danger')
+    elif new_password != confirm_password:
+        flash('كلمة المرور الجديدة غير متطابقة', 'danger')
+    else:
+        user.set_password(new_password)
+        identity_loader.bump(user)
+        db.session.commit()
+        flash('تم تحديث كلمة المرور بنجاح', 'success')
+    return redirect(url_for('main.account'))
 
-@app.route('/update_address', methods=['POST'])
+@bp.route('/update_address', methods=['POST'])
 @login_required
 def update_address():
     if request.method == 'POST':
-        current_user.address = request.form.get('address')
-        current_user.city = request.form.get('city')
-        current_user.country = request.form.get('country')
-        current_user.phone = request.form.get('phone')
+        user = current_user.profile
+        user.address = request.form.get('address')
+        user.city = request.form.get('city')
+        user.country = request.form.get('country')
+        user.phone = request.form.get('phone')
         
         db.session.commit()
         flash('تم تحديث العنوان بنجاح', 'success')
-        return redirect(url_for('account'))
+        return redirect(url_for('main.account'))
 
-@app.route('/update_work_address', methods=['POST'])
+@bp.route('/update_work_address', methods=['POST'])
 @login_required
 def update_work_address():
     if request.method == 'POST':
-        current_user.work_address = request.form.get('work_address')
-        current_user.work_city = request.form.get('work_city')
-        current_user.work_country = request.form.get('work_country')
-        current_user.work_phone = request.form.get('work_phone')
+        user = current_user.profile
+        user.work_address = request.form.get('work_address')
+        user.work_city = request.form.get('work_city')
+        user.work_country = request.form.get('work_country')
+        user.work_phone = request.form.get('work_phone')
         
         db.session.commit()
         flash('تم تحديث عنوان العمل بنجاح', 'success')
-        return redirect(url_for('account'))
+        return redirect(url_for('main.account'))
 
 # مسار تتبع الطلب
-@app.route('/track_order')
+@bp.route('/track_order')
 def track_order():
     return render_template('track_order.html', 
                          page_title="تتبع الطلب - متجر العبايات",
-                         active_page='track_order')
+                         active_page='track_order',
+                         watch_orders=current_user.is_authenticated and order_events.should_stream(current_user.id))
+
+@bp.route('/track_order/lookup')
+@rate_limiter.limit('RATELIMIT_TRACK_ORDER', by_ip, methods=('GET',))
+def track_order_lookup():
+    result = order_tracking.lookup(request.args.get('tracking_number'), request.args.get('email'))
+    if result is None:
+        return jsonify({'error': 'لم يتم العثور على طلب بهذا الرقم والبريد الإلكتروني'}), 404
+    return jsonify(result)
 
 # سياسة الإرجاع
-@app.route('/return_policy')
+@bp.route('/return_policy')
 def return_policy():
     return render_template('return_policy.html', 
                          page_title="سياسة الإرجاع - متجر العبايات",
                          active_page='return_policy')
 
 # الأسئلة الشائعة
-@app.route('/faq')
+@bp.route('/faq')
 def faq():
     return render_template('faq.html', 
                          page_title="الأسئلة الشائعة - متجر العبايات",
                          active_page='faq')
 
 # لوحة تحكم الأدمن
-@app.route('/admin')
+@bp.route('/admin')
 @admin_required
+@read_replica
 def admin_dashboard():
     total_products = Product.query.count()
     total_users = User.query.count()
@@ -413,14 +771,24 @@ def admin_dashboard():
                          latest_orders=latest_orders)
 
 # إدارة المنتجات
-@app.route('/admin/products')
+@bp.route('/admin/products')
 @admin_required
+@read_replica
 def admin_products():
     page = request.args.get('page', 1, type=int)
-    products = Product.query.order_by(Product.created_at.desc()).paginate(page=page, per_page=10)
+    query = Product.query
+    # نفس حدود الشارات في القالب، على عمود المخزون المفهرس
+    stock_filter = request.args.get('stock')
+    if stock_filter == 'in_stock':
+        query = query.filter(Product.stock > 10)
+    elif stock_filter == 'low_stock':
+        query = query.filter(Product.stock.between(1, 10))
+    elif stock_filter == 'out_of_stock':
+        query = query.filter(Product.stock <= 0)
+    products = query.order_by(Product.created_at.desc()).paginate(page=page, per_page=10)
     return render_template('admin/products.html', products=products)
 
-@app.route('/admin/product/add', methods=['GET', 'POST'])
+@bp.route('/admin/product/add', methods=['GET', 'POST'])
 @admin_required
 def add_product():
     form = ProductForm()
@@ -440,7 +808,8 @@ def add_product():
         # معالجة الصور المرفوعة
         images = form.images.data
         if images and images[0].filename != '':
-            for i, image_file in enumerate(images):
+            saved = set()
+            for image_file in images:
                 if image_file and image_file.filename != '':
                     try:
                         # معالجة الصورة باستخدام الخدمة
@@ -449,13 +818,20 @@ def add_product():
                             ImageConfig.PRODUCTS_FOLDER
                         )
                         
+                        # نفس الصورة مرفوعة مرتين
+                        if image_variants['original'] in saved:
+                            continue
+                        
                         # حفظ معلومات الصورة في قاعدة البيانات
                         product_image = ProductImage(
                             product_id=product.id,
                             image_url=image_variants['original'],  # حفظ اسم الملف الأصلي
-                            is_primary=(i == 0)  # أول صورة هي الأساسية
+                            is_primary=not saved,  # أول صورة هي الأساسية
+                            variants_version=image_service.variants_fingerprint(),
+                            **image_service.image_metadata(image_variants['original'], ImageConfig.PRODUCTS_FOLDER)
                         )
                         db.session.add(product_image)
+                        saved.add(image_variants['original'])
                         
                     except ValueError as e:
                         flash(f'خطأ في معالجة الصورة: {str(e)}', 'danger')
@@ -463,17 +839,17 @@ def add_product():
                         return render_template('admin/add_product.html', form=form)
                     except Exception as e:
                         flash('حدث خطأ غير متوقع في معالجة الصورة', 'danger')
-                        app.logger.error(f'Unexpected error processing image: {str(e)}')
+                        current_app.logger.error(f'Unexpected error processing image: {str(e)}')
                         db.session.rollback()
                         return render_template('admin/add_product.html', form=form)
         
         db.session.commit()
         flash('تمت إضافة المنتج بنجاح', 'success')
-        return redirect(url_for('admin_products'))
+        return redirect(url_for('main.admin_products'))
     
     return render_template('admin/add_product.html', form=form)
 
-@app.route('/admin/products/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/admin/products/edit/<int:id>', methods=['GET', 'POST'])
 @admin_required
 def edit_product(id):
     product = Product.query.get_or_404(id)
@@ -484,59 +860,140 @@ def edit_product(id):
         product.description = form.description.data
         product.price = form.price.data
         product.category = form.category.data
-        product.stock = form.stock.data
+        # مخزون المنتجات ذات المتغيرات يحسب منها
+        if not product.variants:
+            product.stock = form.stock.data
         product.discount = form.discount.data
         product.is_active = form.is_active.data
         
-        # معالجة الصور الجديدة
+        # معالجة الصور الجديدة بنفس مسار إضافة المنتج
         images = form.images.data
         if images and images[0].filename != '':
-            for i, image in enumerate(images):
-                if image and image.filename != '':
-                    filename = secure_filename(f"{product.id}_{i}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{image.filename}")
-                    products_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'products')
-                    os.makedirs(products_dir, exist_ok=True)
+            existing = {image.image_url for image in product.images}
+            has_primary = any(image.is_primary for image in product.images)
+            for image_file in images:
+                if image_file and image_file.filename != '':
+                    try:
+                        image_variants = image_service.process_uploaded_image(
+                            image_file, 
+                            ImageConfig.PRODUCTS_FOLDER
+                        )
+                        metadata = image_service.image_metadata(image_variants['original'], ImageConfig.PRODUCTS_FOLDER)
+                    except ValueError as e:
+                        flash(f'خطأ في معالجة الصورة: {str(e)}', 'danger')
+                        db.session.rollback()
+                        return render_template('admin/edit_product.html', form=form, product=product,
+                                               variant_form=ProductVariantForm())
+                    except Exception as e:
+                        flash('حدث خطأ غير متوقع في معالجة الصورة', 'danger')
+                        current_app.logger.error(f'Unexpected error processing image: {str(e)}')
+                        db.session.rollback()
+                        return render_template('admin/edit_product.html', form=form, product=product,
+                                               variant_form=ProductVariantForm())
                     
-                    image_path = os.path.join(products_dir, filename)
-                    image.save(image_path)
+                    # نفس الصورة مرفوعة من قبل لهذا المنتج
+                    if image_variants['original'] in existing:
+                        continue
+                    existing.add(image_variants['original'])
                     
                     product_image = ProductImage(
                         product_id=product.id,
-                        image_url=filename,
-                        is_primary=False  # لا نجعلها أساسية تلقائياً
+                        image_url=image_variants['original'],
+                        is_primary=not has_primary,  # أول صورة للمنتج تصبح أساسية
+                        variants_version=image_service.variants_fingerprint(),
+                        **metadata
                     )
                     db.session.add(product_image)
+                    has_primary = True
         
         db.session.commit()
         flash('تم تحديث المنتج بنجاح', 'success')
-        return redirect(url_for('admin_products'))
+        return redirect(url_for('main.admin_products'))
     
-    return render_template('admin/edit_product.html', form=form, product=product)
+    return render_template('admin/edit_product.html', form=form, product=product,
+                           variant_form=ProductVariantForm(formdata=None))
+
+# متغيرات المنتج (المقاسات والألوان)
+@bp.route('/admin/products/<int:id>/variants/add', methods=['POST'])
+@admin_required
+def add_product_variant(id):
+    product = Product.query.get_or_404(id)
+    form = ProductVariantForm()
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, 'danger')
+        return redirect(url_for('main.edit_product', id=product.id))
+    
+    variant = ProductVariant(
+        product_id=product.id,
+        sku=form.sku.data.strip(),
+        size=form.size.data or None,
+        color=form.color.data or None,
+        stock=form.stock.data or 0,
+        price_delta=form.price_delta.data or 0.0
+    )
+    db.session.add(variant)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        flash('رمز SKU أو المقاس واللون مستخدم من قبل', 'danger')
+        return redirect(url_for('main.edit_product', id=product.id))
+    flash('تمت إضافة المتغير بنجاح', 'success')
+    return redirect(url_for('main.edit_product', id=product.id))
+
+@bp.route('/admin/product/variant/update/<int:variant_id>', methods=['POST'])
+@admin_required
+def update_product_variant(variant_id):
+    variant = ProductVariant.query.get_or_404(variant_id)
+    stock = request.form.get('stock', type=int)
+    if stock is None or stock < 0:
+        flash('الكمية غير صالحة', 'danger')
+        return redirect(url_for('main.edit_product', id=variant.product_id))
+    
+    variant.stock = stock
+    variant.price_delta = request.form.get('price_delta', variant.price_delta, type=float)
+    variant.is_active = 'is_active' in request.form
+    db.session.commit()
+    flash('تم تحديث المتغير بنجاح', 'success')
+    return redirect(url_for('main.edit_product', id=variant.product_id))
+
+@bp.route('/admin/product/variant/delete/<int:variant_id>', methods=['POST'])
+@admin_required
+def delete_product_variant(variant_id):
+    variant = ProductVariant.query.get_or_404(variant_id)
+    product_id = variant.product_id
+    db.session.delete(variant)
+    db.session.commit()
+    flash('تم حذف المتغير بنجاح', 'success')
+    return redirect(url_for('main.edit_product', id=product_id))
 
-@app.route('/admin/product/delete/<int:id>', methods=['POST'])
+@bp.route('/admin/product/delete/<int:id>', methods=['POST'])
 @admin_required
 def delete_product(id):
     product = Product.query.get_or_404(id)
     
     try:
-        # حذف جميع الصور المرتبطة بالمنتج من الخادم
-        for image in product.images:
-            image_path = os.path.join(app.config['UPLOAD_FOLDER'], 'products', image.image_url)
-            if os.path.exists(image_path):
-                os.remove(image_path)
+        filenames = {image.image_url for image in product.images}
         
         # حذف المنتج من قاعدة البيانات (سيحذف تلقائياً الصور المرتبطة به بسبب cascade)
         db.session.delete(product)
         db.session.commit()
+        
+        # حذف جميع أحجام الصور من الخادم، إلا الملفات المشتركة مع منتجات أخرى
+        shared = {row.image_url for row in ProductImage.query.filter(ProductImage.image_url.in_(filenames))}
+        for filename in filenames - shared:
+            image_service.delete_image_variants(filename, ImageConfig.PRODUCTS_FOLDER)
         flash('تم حذف المنتج بنجاح', 'success')
     except Exception as e:
         db.session.rollback()
         flash('حدث خطأ أثناء حذف المنتج', 'danger')
-        app.logger.error(f'Error deleting product: {e}')
+        current_app.logger.error(f'Error deleting product: {e}')
     
-    return redirect(url_for('admin_products'))
+    return redirect(url_for('main.admin_products'))
 
-@app.route('/admin/product/set_primary_image/<int:image_id>', methods=['POST'])
+@bp.route('/admin/product/set_primary_image/<int:image_id>', methods=['POST'])
 @admin_required
 def set_primary_image(image_id):
     image = ProductImage.query.get_or_404(image_id)
@@ -549,17 +1006,46 @@ def set_primary_image(image_id):
     db.session.commit()
     
     flash('تم تعيين الصورة كأساسية', 'success')
-    return redirect(url_for('edit_product', id=image.product_id))
+    return redirect(url_for('main.edit_product', id=image.product_id))
+
+@bp.route('/admin/product/delete_image/<int:image_id>', methods=['POST'])
+@admin_required
+def delete_product_image(image_id):
+    image = ProductImage.query.get_or_404(image_id)
+    product_id = image.product_id
+    filename = image.image_url
+
+    try:
+        db.session.delete(image)
+        db.session.flush()
+
+        # نقل صفة الصورة الأساسية إلى أقدم صورة متبقية
+        if image.is_primary:
+            remaining = ProductImage.query.filter_by(product_id=product_id).order_by(ProductImage.id).first()
+            if remaining:
+                remaining.is_primary = True
+        db.session.commit()
+
+        # حذف أحجام الصورة من الخادم، إلا إذا كان الملف مستخدماً في صورة أخرى
+        if not ProductImage.query.filter_by(image_url=filename).first():
+            image_service.delete_image_variants(filename, ImageConfig.PRODUCTS_FOLDER)
+        flash('تم حذف الصورة بنجاح', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('حدث خطأ أثناء حذف الصورة', 'danger')
+        current_app.logger.error(f'Error deleting product image: {e}')
+
+    return redirect(url_for('main.edit_product', id=product_id))
 
 # مسار لعرض لوحة تحكم العروض (للمسؤولين فقط)
-@app.route('/admin/offers')
+@bp.route('/admin/offers')
 @admin_required
 def admin_offers():
     all_offers = Offer.query.order_by(Offer.created_at.desc()).all()
     return render_template('offers.html', offers=all_offers)
 
 # مسار لإضافة عرض جديد
-@app.route('/admin/offer/add', methods=['GET', 'POST'])
+@bp.route('/admin/offer/add', methods=['GET', 'POST'])
 @admin_required
 def add_offer():
     form = OfferForm()
@@ -589,24 +1075,26 @@ def add_offer():
                         ImageConfig.OFFERS_FOLDER
                     )
                     offer.image = image_variants['original']
+                    offer.variants_version = image_service.variants_fingerprint()
                 except ValueError as e:
                     flash(f'خطأ في معالجة صورة العرض: {str(e)}', 'danger')
                     return render_template('admin/add_offer.html', form=form)
             
             db.session.add(offer)
             db.session.commit()
+            offer_scheduler.invalidate()
             flash('تمت إضافة العرض بنجاح', 'success')
-            return redirect(url_for('admin_offers'))
+            return redirect(url_for('main.admin_offers'))
             
         except Exception as e:
             db.session.rollback()
             flash('حدث خطأ أثناء إضافة العرض', 'danger')
-            app.logger.error(f'Error adding offer: {str(e)}')
+            current_app.logger.error(f'Error adding offer: {str(e)}')
     
     return render_template('admin/add_offer.html', form=form)
 
 # مسار لتعديل عرض
-@app.route('/admin/offer/edit/<int:id>', methods=['GET', 'POST'])
+@bp.route('/admin/offer/edit/<int:id>', methods=['GET', 'POST'])
 @admin_required
 def edit_offer(id):
     offer = Offer.query.get_or_404(id)
@@ -622,41 +1110,50 @@ def edit_offer(id):
         offer.end_date = form.end_date.data
         
         db.session.commit()
+        offer_scheduler.invalidate()
         flash('تم تحديث العرض بنجاح', 'success')
-        return redirect(url_for('admin_offers'))
+        return redirect(url_for('main.admin_offers'))
     
     return render_template('admin/edit_offer.html', form=form, offer=offer)
 
 # مسار لحذف عرض
-@app.route('/admin/offer/delete/<int:id>', methods=['POST'])
+@bp.route('/admin/offer/delete/<int:id>', methods=['POST'])
 @admin_required
 def delete_offer(id):
     offer = Offer.query.get_or_404(id)
+    filename = offer.image
     db.session.delete(offer)
     db.session.commit()
+    offer_scheduler.invalidate()
+    
+    # حذف صورة العرض بجميع أحجامها إن لم يستخدمها عرض آخر
+    if filename and filename != 'default_offer.jpg' and not Offer.query.filter_by(image=filename).first():
+        image_service.delete_image_variants(filename, ImageConfig.OFFERS_FOLDER)
     flash('تم حذف العرض بنجاح', 'success')
-    return redirect(url_for('admin_offers'))
+    return redirect(url_for('main.admin_offers'))
 
 # مسار لتغيير حالة العرض (تفعيل/تعطيل)
-@app.route('/admin/offer/toggle/<int:id>', methods=['POST'])
+@bp.route('/admin/offer/toggle/<int:id>', methods=['POST'])
 @admin_required
 def toggle_offer(id):
     offer = Offer.query.get_or_404(id)
     offer.is_active = not offer.is_active
     db.session.commit()
+    offer_scheduler.invalidate()
     
     status = "مفعل" if offer.is_active else "معطل"
     flash(f'تم {status} العرض بنجاح', 'success')
-    return redirect(url_for('admin_offers'))
+    return redirect(url_for('main.admin_offers'))
 
 # إدارة المستخدمين
-@app.route('/admin/users')
+@bp.route('/admin/users')
 @admin_required
+@read_replica
 def admin_users():
     users = User.query.all()
     return render_template('users.html', users=users)
 
-@app.route('/admin/user/toggle_admin/<int:id>', methods=['POST'])
+@bp.route('/admin/user/toggle_admin/<int:id>', methods=['POST'])
 @admin_required
 def toggle_admin(id):
     user = User.query.get_or_404(id)
@@ -664,26 +1161,29 @@ def toggle_admin(id):
         flash('لا يمكنك تعديل صلاحياتك الخاصة', 'danger')
     else:
         user.is_admin = not user.is_admin
+        identity_loader.bump(user)
         db.session.commit()
         status = 'مدير' if user.is_admin else 'مستخدم عادي'
         flash(f'تم تغيير صلاحيات المستخدم إلى {status}', 'success')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
-@app.route('/admin/user/delete/<int:id>', methods=['POST'])
+@bp.route('/admin/user/delete/<int:id>', methods=['POST'])
 @admin_required
 def delete_user(id):
     user = User.query.get_or_404(id)
     if user.id == current_user.id:
         flash('لا يمكنك حذف حسابك الخاص', 'danger')
     else:
+        identity_loader.bump(user)
         db.session.delete(user)
         db.session.commit()
         flash('تم حذف المستخدم بنجاح', 'success')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
 # إدارة الطلبات
-@app.route('/admin/orders')
+@bp.route('/admin/orders')
 @admin_required
+@read_replica
 def admin_orders():
     status_filter = request.args.get('status', 'all')
     
@@ -694,35 +1194,40 @@ def admin_orders():
     
     return render_template('admin/orders.html', orders=orders, status_filter=status_filter)
 
-@app.route('/admin/order/<int:id>')
+@bp.route('/admin/order/<int:id>')
 @admin_required
 def admin_order_detail(id):
     order = Order.query.get_or_404(id)
     return render_template('admin/order_detail.html', order=order)
 
-@app.route('/admin/order/update_status/<int:id>', methods=['POST'])
+@bp.route('/admin/order/update_status/<int:id>', methods=['POST'])
 @admin_required
 def update_order_status(id):
     order = Order.query.get_or_404(id)
     new_status = request.form.get('status')
     
     if new_status in ['pending', 'processing', 'shipped', 'delivered', 'cancelled']:
-        order.status = new_status
-        db.session.commit()
+        if order.status != new_status:
+            order.status = new_status
+            order_tracking.record_status(order)
+            order_events.record(order, 'order_status_changed')
+            db.session.commit()
+            order_tracking.invalidate(order)
+            order_events.notify()
         flash('تم تحديث حالة الطلب بنجاح', 'success')
     else:
         flash('حالة الطلب غير صالحة', 'danger')
     
-    return redirect(url_for('admin_order_detail', id=id))
+    return redirect(url_for('main.admin_order_detail', id=id))
 
 # إدارة رسائل التواصل
-@app.route('/admin/messages')
+@bp.route('/admin/messages')
 @admin_required
 def admin_messages():
     messages = ContactMessage.query.order_by(ContactMessage.created_at.desc()).all()
     return render_template('admin/messages.html', messages=messages)
 
-@app.route('/admin/message/<int:id>')
+@bp.route('/admin/message/<int:id>')
 @admin_required
 def admin_message_detail(id):
     message = ContactMessage.query.get_or_404(id)
@@ -732,18 +1237,21 @@ def admin_message_detail(id):
         db.session.commit()
     return render_template('admin/message_detail.html', message=message)
 
-@app.route('/admin/message/delete/<int:id>', methods=['POST'])
+@bp.route('/admin/message/delete/<int:id>', methods=['POST'])
 @admin_required
 def delete_message(id):
     message = ContactMessage.query.get_or_404(id)
     db.session.delete(message)
     db.session.commit()
     flash('تم حذف الرسالة بنجاح', 'success')
-    return redirect(url_for('admin_messages'))
+    return redirect(url_for('main.admin_messages'))
 
 if __name__ == '__main__':
-    # إنشاء مجلد التحميل إذا لم يكن موجوداً
-    upload_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'products')
-    os.makedirs(upload_dir, exist_ok=True)
+    app = create_app()
+    
+    # تهيئة قاعدة البيانات والأدمن الافتراضي عند التشغيل المحلي فقط
+    with app.app_context():
+        init_database()
+        seed_admin()
     
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
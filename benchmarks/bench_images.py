@@ -0,0 +1,346 @@
+"""قياس أداء معالجة الصور على مجموعة صور صناعية ثابتة
+
+المجموعة تنشأ بشكل محدد (نفس البايتات في كل تشغيل) وتشمل JPEG/PNG/WebP/GIF/BMP
+بأوضاع RGB وRGBA وPalette، بأحجام من 0.3 إلى 40 ميجابكسل، وصوراً بدوران EXIF وGIF متحركة.
+لكل صورة تقاس العمليات التالية، كل قياس في عملية جديدة:
+- process: process_uploaded_image كاملة (التحقق، فك الضغط، التدوير، جميع الأحجام)
+- save_variants: save_image_variants على صورة مفكوكة مسبقاً
+- resize: resize_image إلى الحجم المتوسط
+
+النتائج: الزمن الفعلي، زمن المعالج، ذروة الذاكرة (VmHWM) وحجم الملفات الناتجة.
+لمقارنة تعديلين: احفظ نتيجة كل منهما بـ --output ثم قارن بـ --compare.
+
+الاستخدام:
+    python benchmarks/bench_images.py --quick
+    python benchmarks/bench_images.py --runs 3 --output before.json
+    python benchmarks/bench_images.py --runs 3 --output after.json --compare before.json
+    python benchmarks/bench_images.py --case jpeg_rgb_12mp --operation process --json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPERATIONS = ['process', 'save_variants', 'resize']
+
+# الأحجام بالبكسل لكل فئة ميجابكسل
+SIZES = {
+    '0.3mp': (640, 480),
+    '2mp': (1600, 1200),
+    '12mp': (4000, 3000),
+    '24mp': (6000, 4000),
+    '40mp': (7300, 5480),
+}
+
+# (الاسم، الصيغة، الوضع، الحجم، اتجاه EXIF)
+CASES = [
+    (f'jpeg_rgb_{size}', 'JPEG', 'RGB', size, None) for size in SIZES
+] + [
+    ('jpeg_rgb_exif6_12mp', 'JPEG', 'RGB', '12mp', 6),
+    ('jpeg_rgb_exif8_2mp', 'JPEG', 'RGB', '2mp', 8),
+    ('png_rgb_2mp', 'PNG', 'RGB', '2mp', None),
+    ('png_rgba_0.3mp', 'PNG', 'RGBA', '0.3mp', None),
+    ('png_rgba_12mp', 'PNG', 'RGBA', '12mp', None),
+    ('png_palette_2mp', 'PNG', 'P', '2mp', None),
+    ('webp_rgb_2mp', 'WEBP', 'RGB', '2mp', None),
+    ('webp_rgba_12mp', 'WEBP', 'RGBA', '12mp', None),
+    ('gif_palette_0.3mp', 'GIF', 'P', '0.3mp', None),
+    ('gif_palette_2mp', 'GIF', 'P', '2mp', None),
+    ('bmp_rgb_2mp', 'BMP', 'RGB', '2mp', None),
+    ('gif_animated_0.3mp', 'GIF', 'P', '0.3mp', None),
+    ('gif_animated_2mp', 'GIF', 'P', '2mp', None),
+]
+
+# عدد الإطارات للحالات المتحركة
+ANIMATED_FRAMES = {'gif_animated_0.3mp': 24, 'gif_animated_2mp': 12}
+
+QUICK_SIZES = {'0.3mp', '2mp'}
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif', 'BMP': 'bmp'}
+
+# يشغل داخل عملية جديدة ويطبع النتائج بصيغة JSON
+PROBE = '''
+import json, os, resource, sys, time
+from werkzeug.datastructures import FileStorage
+from app import create_app, image_service
+from config import Config
+
+operation, path, upload_folder = sys.argv[1], sys.argv[2], sys.argv[3]
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    UPLOAD_FOLDER = upload_folder
+
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def reset_peak():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+def output_bytes():
+    total = 0
+    for root, _, files in os.walk(upload_folder):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+app = create_app(BenchConfig)
+with app.test_request_context():
+    from PIL import Image
+    image = None
+    if operation != 'process':
+        # فك الضغط خارج القياس، كما تستقبله الدالة من process_uploaded_image
+        Image.MAX_IMAGE_PIXELS = None
+        image = Image.open(path)
+        image.load()
+    reset_peak()
+    before = peak_rss_kb()
+    cpu_started, started = time.process_time(), time.perf_counter()
+    outcome = 'ok'
+    try:
+        if operation == 'process':
+            with open(path, 'rb') as stream:
+                image_service.process_uploaded_image(FileStorage(stream=stream, filename=os.path.basename(path)))
+        elif operation == 'save_variants':
+            image_service.save_image_variants(image, 'bench.' + path.rsplit('.', 1)[1], 'products')
+        else:
+            image_service.resize_image(image, image_service.config.SIZES['medium'])
+    except ValueError as e:
+        outcome = 'rejected: ' + str(e)
+    wall, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    after = peak_rss_kb()
+
+print(json.dumps({
+    'wall_ms': wall * 1000,
+    'cpu_ms': cpu * 1000,
+    'peak_mb': after / 1024,
+    'peak_delta_mb': (after - before) / 1024,
+    'output_bytes': output_bytes(),
+    'outcome': outcome,
+}))
+'''
+
+
+def make_image(mode, size, seed):
+    """صورة محددة المحتوى: تدرجات مع ضوضاء ثابتة البذرة حتى لا تضغط بشكل غير واقعي"""
+    import random
+    from PIL import Image
+
+    tile_size = 256
+    noise = Image.frombytes('L', (tile_size, tile_size), random.Random(seed).randbytes(tile_size * tile_size))
+    tiled = Image.new('L', size)
+    for x in range(0, size[0], tile_size):
+        for y in range(0, size[1], tile_size):
+            tiled.paste(noise, (x, y))
+
+    red = Image.linear_gradient('L').resize(size)
+    green = Image.radial_gradient('L').resize(size)
+    blue = Image.blend(red.transpose(Image.Transpose.ROTATE_180), tiled, 0.35)
+    image = Image.merge('RGB', (Image.blend(red, tiled, 0.2), Image.blend(green, tiled, 0.2), blue))
+
+    if mode == 'RGBA':
+        image.putalpha(Image.linear_gradient('L').rotate(90).resize(size))
+    elif mode == 'P':
+        image = image.quantize(64)
+    return image
+
+
+def build_corpus(directory, cases):
+    from PIL import Image
+
+    paths = {}
+    for name, format_name, mode, size, orientation in cases:
+        path = os.path.join(directory, f'{name}.{EXTENSIONS[format_name]}')
+        paths[name] = path
+        if os.path.exists(path):
+            continue
+        # البذرة من اسم الحالة، فالملف نفسه مهما اختيرت الحالات
+        image = make_image(mode, SIZES[size], seed=name)
+        save_kwargs = {}
+        if format_name == 'JPEG':
+            save_kwargs['quality'] = 92
+        elif format_name == 'WEBP':
+            save_kwargs['quality'] = 90
+        if orientation:
+            # الكاميرا تحفظ الصورة مدورة وتسجل الاتجاه في EXIF
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            image = image.transpose(Image.Transpose.ROTATE_90 if orientation == 6 else Image.Transpose.ROTATE_270)
+            save_kwargs['exif'] = exif.tobytes()
+        if name in ANIMATED_FRAMES:
+            # إطارات متحركة: نفس الصورة مزاحة أفقياً في كل إطار
+            from PIL import ImageChops
+            count = ANIMATED_FRAMES[name]
+            frames = [ImageChops.offset(image, image.size[0] * i // count, 0) for i in range(1, count)]
+            save_kwargs.update(save_all=True, append_images=frames, duration=80, loop=0)
+        image.save(path, format=format_name, **save_kwargs)
+    return paths
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def run_case(operation, path):
+    with tempfile.TemporaryDirectory() as upload_folder:
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE, operation, path, upload_folder],
+            cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_format_summary(results):
+    """مجموع حجم الملفات المرفوعة وحجم جميع الأحجام الناتجة عنها لكل صيغة (عملية process)"""
+    totals = {}
+    for result in results:
+        if result['operation'] != 'process' or result['outcome'] != 'ok':
+            continue
+        key = f"{result['format']} {result['mode']}" + (' animated' if result['case'] in ANIMATED_FRAMES else '')
+        source, output = totals.get(key, (0, 0))
+        totals[key] = (source + result['file_bytes'], output + result['output_bytes'])
+    if not totals:
+        return
+    print(f"\n{'format':<22} {'source KB':>10} {'output KB':>10} {'ratio':>7}")
+    for key, (source, output) in sorted(totals.items()):
+        print(f"{key:<22} {source // 1024:>10} {output // 1024:>10} {output / source:>7.2f}")
+
+
+def compare(results, baseline_path):
+    """الفرق بالنسبة المئوية مقابل نتيجة سابقة لنفس الحالة والعملية"""
+    with open(baseline_path) as f:
+        baseline = {(r['case'], r['operation']): r for r in json.load(f)['results']}
+    print(f"\ncompared with {baseline_path}")
+    print(f"{'case':<22} {'operation':<14} {'wall':>8} {'cpu':>8} {'peak':>8} {'bytes':>8}")
+    for result in results:
+        old = baseline.get((result['case'], result['operation']))
+        if old is None:
+            continue
+
+        def delta(key):
+            if not old[key]:
+                return '-'
+            return f'{(result[key] - old[key]) / old[key] * 100:+.0f}%'
+
+        print(f"{result['case']:<22} {result['operation']:<14} {delta('wall_ms'):>8} {delta('cpu_ms'):>8} "
+              f"{delta('peak_delta_mb'):>8} {delta('output_bytes'):>8}")
+
+    # توفير الحجم لكل صيغة: مجموع ملفات process الناتجة قبل وبعد
+    savings = {}
+    for result in results:
+        old = baseline.get((result['case'], 'process'))
+        if result['operation'] != 'process' or old is None:
+            continue
+        before, after = savings.get(result['format'], (0, 0))
+        savings[result['format']] = (before + old['output_bytes'], after + result['output_bytes'])
+    if savings:
+        print(f"\n{'format':<8} {'before KB':>10} {'after KB':>10} {'saved':>8}")
+        for format_name, (before, after) in sorted(savings.items()):
+            saved = f'{(before - after) / before * 100:.0f}%' if before else '-'
+            print(f"{format_name:<8} {before // 1024:>10} {after // 1024:>10} {saved:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=1, help='عدد مرات القياس لكل حالة (تؤخذ القيمة الوسطى)')
+    parser.add_argument('--quick', action='store_true', help='الأحجام الصغيرة فقط (0.3 و2 ميجابكسل)')
+    parser.add_argument('--case', action='append', help='حالة محددة (يمكن تكرارها)')
+    parser.add_argument('--operation', action='append', choices=OPERATIONS, help='عملية محددة (يمكن تكرارها)')
+    parser.add_argument('--corpus-dir', help='مجلد لحفظ المجموعة وإعادة استخدامها بين التشغيلات')
+    parser.add_argument('--output', help='حفظ النتائج بصيغة JSON في ملف')
+    parser.add_argument('--compare', help='ملف JSON سابق للمقارنة')
+    parser.add_argument('--json', action='store_true', help='طباعة النتائج بصيغة JSON')
+    args = parser.parse_args()
+
+    cases = [case for case in CASES
+             if (not args.case or case[0] in args.case) and (not args.quick or case[3] in QUICK_SIZES)]
+    operations = args.operation or OPERATIONS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus_dir or tmp
+        os.makedirs(corpus, exist_ok=True)
+        paths = build_corpus(corpus, cases)
+
+        results = []
+        for name, format_name, mode, size, orientation in cases:
+            path = paths[name]
+            for operation in operations:
+                runs = [run_case(operation, path) for _ in range(args.runs)]
+                results.append({
+                    'case': name,
+                    'operation': operation,
+                    'format': format_name,
+                    'mode': mode,
+                    'pixels': SIZES[size][0] * SIZES[size][1],
+                    'exif_orientation': orientation,
+                    'file_bytes': os.path.getsize(path),
+                    'file_sha256': file_digest(path),
+                    'wall_ms': round(statistics.median(run['wall_ms'] for run in runs), 1),
+                    'cpu_ms': round(statistics.median(run['cpu_ms'] for run in runs), 1),
+                    'peak_mb': round(max(run['peak_mb'] for run in runs), 1),
+                    'peak_delta_mb': round(max(run['peak_delta_mb'] for run in runs), 1),
+                    'output_bytes': runs[-1]['output_bytes'],
+                    'outcome': runs[-1]['outcome'],
+                })
+
+    from PIL import __version__ as pillow_version
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'pillow': pillow_version,
+        'cpu_count': os.cpu_count(),
+        'runs': args.runs,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"revision {report['revision']}, Pillow {pillow_version}, {args.runs} run(s)")
+        print(f"{'case':<22} {'operation':<14} {'wall ms':>9} {'cpu ms':>9} {'peak MB':>8} {'delta MB':>9} "
+              f"{'out KB':>8}  outcome")
+        for result in results:
+            print(f"{result['case']:<22} {result['operation']:<14} {result['wall_ms']:>9} {result['cpu_ms']:>9} "
+                  f"{result['peak_mb']:>8} {result['peak_delta_mb']:>9} {result['output_bytes'] // 1024:>8}  "
+                  f"{result['outcome']}")
+
+        print_format_summary(results)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
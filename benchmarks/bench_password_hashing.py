@@ -0,0 +1,78 @@
+"""قياس عدد عمليات تسجيل الدخول في الثانية لكل نواة لإعدادات تشفير مختلفة
+
+الاستخدام:
+    python benchmarks/bench_password_hashing.py
+    python benchmarks/bench_password_hashing.py --method pbkdf2:sha256:600000 --method scrypt:16384:8:1 --logins 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from password_policy import PasswordPolicy  # noqa: E402
+
+DEFAULT_METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+
+
+def bench_method(method, logins, workers):
+    app = Flask(__name__)
+    app.config.update(
+        PASSWORD_HASH_METHOD=method,
+        PASSWORD_HASH_WORKERS=workers,
+        PASSWORD_HASH_QUEUE_SIZE=logins,
+        PASSWORD_HASH_TIMEOUT=None
+    )
+    policy = PasswordPolicy(app)
+
+    stored_hash = policy.hash('benchmark-password')
+
+    # محاكاة طلبات تسجيل دخول متزامنة تتنافس على المجموعة المحدودة
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    with ThreadPoolExecutor(max_workers=workers * 4) as clients:
+        results = list(clients.map(lambda _: policy.verify(stored_hash, 'benchmark-password'), range(logins)))
+    elapsed = time.perf_counter() - started
+    cpu_time = time.process_time() - cpu_started
+
+    assert all(results)
+    cores = min(workers, os.cpu_count() or 1)
+    return {
+        'method': method,
+        'workers': workers,
+        'logins': logins,
+        'seconds': round(elapsed, 3),
+        'cpu_seconds': round(cpu_time, 3),
+        'logins_per_sec': round(logins / elapsed, 2),
+        'logins_per_sec_per_core': round(logins / elapsed / cores, 2),
+        'ms_per_login': round(cpu_time / logins * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', action='append', help='صيغة werkzeug، يمكن تكرارها')
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--json', action='store_true', help='طباعة النتائج بصيغة JSON')
+    args = parser.parse_args()
+
+    results = [bench_method(method, args.logins, args.workers) for method in args.method or DEFAULT_METHODS]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'method':<24} {'logins/s':>10} {'per core':>10} {'ms/login':>10}")
+    for result in results:
+        print(f"{result['method']:<24} {result['logins_per_sec']:>10} "
+              f"{result['logins_per_sec_per_core']:>10} {result['ms_per_login']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""قياس زمن بدء التطبيق البارد: الاستيراد، create_app، وأول طلب
+
+كل تشغيل يتم في عملية جديدة حتى لا تؤثر الوحدات المحملة مسبقاً على النتيجة.
+
+الاستخدام:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['PIL', 'flask_mail', 'flask_migrate', 'alembic']
+
+# يشغل داخل عملية جديدة ويطبع النتائج بصيغة JSON
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app as module
+from config import Config
+imported = time.perf_counter()
+
+# قاعدة في الذاكرة تضبط قبل create_app، وإلا أنشئ المحرك لقاعدة المطور وعدلها init_database
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    MAIL_QUEUE_WORKER = False
+    ORDER_EVENTS_WORKER = False
+
+application = module.create_app(BenchConfig)
+created = time.perf_counter()
+with application.app_context():
+    module.init_database()
+response = application.test_client().get('/login')
+assert response.status_code == 200, response.status_code
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'total_ms': (first_request - started) * 1000,
+    'heavy_modules': [name for name in %r if name in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def run_once():
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='طباعة النتائج بصيغة JSON')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    result = {
+        key: round(statistics.median(run[key] for run in runs), 1)
+        for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms')
+    }
+    result['runs'] = args.runs
+    result['heavy_modules'] = runs[-1]['heavy_modules']
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        print(f'{key:<18} {result[key]:>8} ms')
+    print(f"heavy modules loaded: {', '.join(result['heavy_modules']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
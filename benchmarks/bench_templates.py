@@ -0,0 +1,99 @@
+"""قياس زمن أول طلب وذاكرة العامل مع ترجمة القوالب وبدونها
+
+كل حالة تشغل في عملية جديدة كما يحدث عند إقلاع عامل gunicorn:
+- no-cache: ترجمة القوالب عند أول استخدام (السلوك السابق)
+- bytecode-cache: قراءة القوالب المترجمة من مجلد التخزين المشترك
+- warm-up: bytecode-cache مع ترجمة كل القوالب عند الإقلاع (كما في wsgi.py)
+
+الاستخدام:
+    python benchmarks/bench_templates.py
+    python benchmarks/bench_templates.py --runs 10 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = ['/', '/products', '/login', '/register', '/faq', '/contact']
+
+# يشغل داخل عملية جديدة ويطبع النتائج بصيغة JSON
+PROBE = '''
+import json, resource, sys, time
+from app import create_app, init_database
+from config import Config
+from template_cache import template_cache
+
+mode, cache_dir = sys.argv[1], sys.argv[2]
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    TEMPLATE_BYTECODE_CACHE = mode != 'no-cache'
+    TEMPLATE_CACHE_DIR = cache_dir
+    MAIL_QUEUE_WORKER = False
+    ORDER_EVENTS_WORKER = False
+
+app = create_app(BenchConfig)
+with app.app_context():
+    init_database()
+
+started = time.perf_counter()
+if mode == 'warm-up':
+    template_cache.warm_up(app)
+boot = time.perf_counter() - started
+
+client = app.test_client()
+first = {}
+for page in %r:
+    started = time.perf_counter()
+    assert client.get(page).status_code == 200, page
+    first[page] = (time.perf_counter() - started) * 1000
+
+print(json.dumps({
+    'boot_ms': boot * 1000,
+    'first_requests_ms': sum(first.values()),
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+''' % (PAGES,)
+
+
+def run_once(mode, cache_dir):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, mode, cache_dir], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='طباعة النتائج بصيغة JSON')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # تعبئة مجلد التخزين مرة واحدة كما يفعل "flask compile-templates" أثناء النشر
+        run_once('bytecode-cache', cache_dir)
+        for mode in ('no-cache', 'bytecode-cache', 'warm-up'):
+            runs = [run_once(mode, cache_dir) for _ in range(args.runs)]
+            result = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+            result['mode'] = mode
+            results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"first requests: {', '.join(PAGES)}")
+    print(f"{'mode':<16} {'boot ms':>10} {'first req ms':>14} {'max rss MB':>12}")
+    for result in results:
+        print(f"{result['mode']:<16} {result['boot_ms']:>10} {result['first_requests_ms']:>14} "
+              f"{result['max_rss_mb']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""قياس ذروة الذاكرة والزمن لكل صورة مرفوعة في مسار معالجة الصور
+
+كل ملف يعالج في عملية جديدة، وتقاس ذروة الذاكرة (VmHWM) قبل المعالجة وبعدها.
+الملفات تنشأ مسبقاً في مجلد مؤقت، وتشمل صوراً عادية وقنبلة فك ضغط وملفاً بامتداد مزيف.
+
+الاستخدام:
+    python benchmarks/bench_uploads.py
+    python benchmarks/bench_uploads.py --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# يشغل داخل عملية جديدة ويطبع النتائج بصيغة JSON
+PROBE = '''
+import json, os, resource, sys, time
+from werkzeug.datastructures import FileStorage
+from app import create_app, image_service
+from config import Config
+
+path, upload_folder = sys.argv[1], sys.argv[2]
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    UPLOAD_FOLDER = upload_folder
+
+def peak_rss_kb():
+    # VmHWM في لينكس يمكن تصفيره، بخلاف ru_maxrss الموروث من العملية الأم
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def reset_peak():
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+app = create_app(BenchConfig)
+with app.test_request_context():
+    import PIL.Image  # noqa: F401 - لا يحسب زمن الاستيراد ضمن المعالجة
+    reset_peak()
+    before = peak_rss_kb()
+    started = time.perf_counter()
+    with open(path, 'rb') as stream:
+        try:
+            image_service.process_uploaded_image(FileStorage(stream=stream, filename=os.path.basename(path)))
+            outcome = 'accepted'
+        except ValueError as e:
+            outcome = 'rejected: ' + str(e)
+    elapsed = time.perf_counter() - started
+    after = peak_rss_kb()
+
+print(json.dumps({
+    'ms': elapsed * 1000,
+    'peak_mb': after / 1024,
+    'peak_delta_mb': (after - before) / 1024,
+    'outcome': outcome,
+}))
+'''
+
+
+def build_corpus(directory):
+    from PIL import Image
+
+    def noise(size):
+        # ضوضاء حتى لا يكون الملف صغيراً بشكل غير واقعي
+        return Image.effect_noise(size, 40).convert('RGB')
+
+    cases = []
+
+    def save(name, image, **kwargs):
+        path = os.path.join(directory, name)
+        image.save(path, **kwargs)
+        cases.append(path)
+
+    save('photo_4000x3000.jpg', noise((4000, 3000)), quality=90)
+    save('photo_1600x1200.jpg', noise((1600, 1200)), quality=90)
+    save('graphic_3000x3000.png', Image.new('RGBA', (3000, 3000), (200, 30, 60, 255)))
+    # قنبلة فك ضغط: ملف صغير يتمدد إلى 900 ميجابايت في الذاكرة
+    save('bomb_30000x30000.png', Image.new('L', (30000, 30000), 0), optimize=True)
+    # PNG باسم jpg: تحدد الصيغة من المحتوى
+    image = Image.new('RGB', (800, 600), (0, 90, 40))
+    path = os.path.join(directory, 'spoofed_png.jpg')
+    image.save(path, format='PNG')
+    cases.append(path)
+    with open(os.path.join(directory, 'not_an_image.jpg'), 'wb') as f:
+        f.write(b'<?php echo "hello"; ?>' * 100)
+    cases.append(os.path.join(directory, 'not_an_image.jpg'))
+    return cases
+
+
+def run_case(path, upload_folder):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, path, upload_folder], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['file'] = os.path.basename(path)
+    result['file_kb'] = os.path.getsize(path) // 1024
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', action='store_true', help='طباعة النتائج بصيغة JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus, tempfile.TemporaryDirectory() as uploads:
+        results = [run_case(path, uploads) for path in build_corpus(corpus)]
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    print(f"{'file':<24} {'KB':>7} {'ms':>8} {'peak MB':>8} {'delta MB':>9}  outcome")
+    for result in results:
+        print(f"{result['file']:<24} {result['file_kb']:>7} {result['ms']:>8.1f} {result['peak_mb']:>8.1f} "
+              f"{result['peak_delta_mb']:>9.1f}  {result['outcome']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import zlib
+
+from flask import request
+
+from ttl_cache import TTLCache
+
+try:
+    # اختياري: pip install brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Compression:
+    """ضغط الاستجابات بـ gzip أو brotli حسب Accept-Encoding
+
+    الاستجابات العادية تضغط دفعة واحدة وتخزن إن كانت قابلة للتخزين،
+    والاستجابات المتدفقة تضغط جزءاً بجزء مع تفريغ كل جزء فوراً
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.cache = TTLCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.mimetypes = set(app.config.get('COMPRESS_MIMETYPES', ()))
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.br_level = app.config.get('COMPRESS_BR_LEVEL', 5)
+        self.cache_max_item_size = app.config.get('COMPRESS_CACHE_MAX_ITEM_SIZE', 512 * 1024)
+        self.cache = TTLCache(ttl=app.config.get('COMPRESS_CACHE_TTL', 300),
+                              maxsize=app.config.get('COMPRESS_CACHE_SIZE', 256))
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        app.after_request(self.compress_response)
+
+    def _should_compress(self, response):
+        if response.mimetype not in self.mimetypes:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers:
+            return False
+        return True
+
+    @staticmethod
+    def _is_cacheable(response):
+        cache_control = response.cache_control
+        if cache_control.no_store or cache_control.private:
+            return False
+        return response.get_etag()[0] is not None or cache_control.public or cache_control.max_age is not None
+
+    def compress_response(self, response):
+        if not self.enabled or not self._should_compress(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed and not response.direct_passthrough:
+            response.response = self._compress_stream(response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            # الملفات الثابتة تقرأ بالكامل مرة واحدة ثم تخدم من الذاكرة المؤقتة
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self._compress_cached(response, data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # المحتوى المضغوط ليس مطابقاً بايت ببايت للأصل
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress_cached(self, response, data, encoding):
+        if not self._is_cacheable(response) or len(data) > self.cache_max_item_size:
+            return self.compress(data, encoding)
+        etag = response.get_etag()[0]
+        key = (encoding, response.mimetype, etag or hashlib.blake2b(data, digest_size=16).hexdigest())
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = self.compress(data, encoding)
+            self.cache.set(key, compressed)
+        return compressed
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.br_level)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def _compress_stream(self, response, encoding):
+        # يقرأ المصدر الآن قبل استبدال response.response بالمولد الناتج
+        source = response.response
+        chunks = response.iter_encoded()
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.br_level)
+            compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            compress, finish = compressor.compress, compressor.flush
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+
+        def generate():
+            try:
+                for chunk in chunks:
+                    # التفريغ بعد كل جزء حتى لا تتأخر الأحداث المتدفقة داخل الضاغط
+                    data = compress(chunk) + flush()
+                    if data:
+                        yield data
+                yield finish()
+            finally:
+                close = getattr(source, 'close', None)
+                if close is not None:
+                    close()
+
+        return generate()
+
+
+# إنشاء نسخة من الخدمة
+compression = Compression()
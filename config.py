@@ -13,6 +13,16 @@ class ImageConfig:
     # الحجم الأقصى للملف (10 ميجابايت)
     MAX_FILE_SIZE = 10 * 1024 * 1024
     
+    # حدود تفحص من ترويسة الصورة قبل فك ضغطها (حماية من قنابل فك الضغط)
+    MAX_PIXELS = 24_000_000                 # حوالي 6000x4000
+    MAX_DIMENSION = 12000                   # أطول ضلع بالبكسل
+    MAX_DECODE_MEMORY = 256 * 1024 * 1024   # ذاكرة تقديرية لفك الصورة ومعالجتها
+    MAX_FRAMES = 200
+    
+    # الملفات المرفوعة تكتب على القرص بعد هذا الحجم بدلاً من ذاكرة العامل
+    UPLOAD_SPOOL_SIZE = 256 * 1024
+    UPLOAD_TMP_DIR = os.environ.get('UPLOAD_TMP_DIR')  # الافتراضي مجلد النظام المؤقت
+    
     # إعدادات الصور المصغرة
     THUMBNAIL_SIZE = (300, 300)
     MEDIUM_SIZE = (600, 600)
@@ -21,17 +31,40 @@ class ImageConfig:
     # جودة الضغط
     JPEG_QUALITY = 85
     PNG_COMPRESSION = 6
+    WEBP_QUALITY = 80
+    
+    # الصور المتحركة (GIF) تحفظ WebP متحركاً بجميع إطاراتها، أو بصيغتها الأصلية عند False
+    ANIMATED_WEBP = True
+    
+    # الصورة المموهة الصغيرة التي تعرض مكان الصورة حتى تحمل (تخزن في قاعدة البيانات)
+    PLACEHOLDER_SIZE = 16     # أطول ضلع بالبكسل
+    PLACEHOLDER_QUALITY = 40
     
     # المجلدات
     PRODUCTS_FOLDER = 'products'
     OFFERS_FOLDER = 'offers'
     USERS_FOLDER = 'users'
+    # عدد مستويات المجلدات الفرعية للصور (ab/cd/name)، 0 للتخزين في مجلد واحد
+    SHARD_DEPTH = 2
+    
+    # الأحجام التي يمكن طلبها من /img عند الحاجة (w و h بالبكسل)، وأي حجم آخر يرفض
+    DERIVATIVE_WIDTHS = (150, 300, 450, 600, 900, 1200)
+    DERIVATIVE_HEIGHTS = (150, 300, 450, 600, 900, 1200)
+    DERIVATIVE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR')  # الافتراضي instance/image_cache
+    DERIVATIVE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    DERIVATIVE_LOCK_TIMEOUT = 30        # ثوان انتظار عامل آخر ينشئ نفس المشتق
+    DERIVATIVE_MAX_AGE = 365 * 24 * 3600  # أسماء الملفات فريدة، فالمشتق لا يتغير
+    
+    # تنظيف الملفات غير المستخدمة (flask images gc)
+    GC_MIN_AGE = 24 * 3600  # ثوان، الملفات الأحدث قد تكون رفعاً لم يحفظ في قاعدة البيانات بعد
+    QUARANTINE_DIR = os.environ.get('UPLOAD_QUARANTINE_DIR')  # الافتراضي instance/upload_quarantine
     
     # الأحجام المطلوبة لكل نوع
+    # بعد تغيير الأحجام أو الجودة: flask images rebuild
     SIZES = {
-        'thumbnail': (300, 300),
-        'medium': (600, 600),
-        'large': (1200, 1200),
+        'thumbnail': THUMBNAIL_SIZE,
+        'medium': MEDIUM_SIZE,
+        'large': LARGE_SIZE,
         'original': None  # الحجم الأصلي
     }
 
@@ -43,6 +76,23 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///abaya_store.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # إعدادات المحرك: auto يختار حسب نوع قاعدة البيانات، أو sqlite / postgresql / none
+    DATABASE_ENGINE_PROFILE = os.environ.get('DATABASE_ENGINE_PROFILE') or 'auto'
+    # SQLite: وضع WAL دائماً مع الإعدادات التالية
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = 5000              # مللي ثانية انتظار القفل قبل "database is locked"
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024    # بايت
+    SQLITE_CACHE_SIZE = -64000              # القيمة السالبة بالكيلوبايت (حوالي 64 ميجابايت)
+    # PostgreSQL: مجموعة اتصالات لكل عامل
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 5)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 10)
+    DATABASE_POOL_TIMEOUT = 30              # ثوان انتظار اتصال متاح
+    DATABASE_POOL_RECYCLE = 1800            # ثوان قبل تجديد الاتصال
+    DATABASE_STATEMENT_TIMEOUT = 15000      # مللي ثانية، 0 لتعطيله
+    # نسخة قراءة اختيارية لصفحات الكتالوج والتقارير (للتجربة: ملف SQLite ثان مع flask sync-replica)
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    REPLICA_READ_YOUR_WRITES_WINDOW = 5     # ثوان قراءة من الأساسية بعد كتابة المستخدم
+    
     # تحميل الملفات
     UPLOAD_FOLDER = UPLOAD_FOLDER
     MAX_CONTENT_LENGTH = ImageConfig.MAX_FILE_SIZE
@@ -50,12 +100,89 @@ class Config:
     # البريد الإلكتروني
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
-    MAIL_USE_TLS = True
+    # للتجربة محلياً: python -m aiosmtpd -n -l localhost:1025
+    # مع MAIL_SERVER=localhost و MAIL_PORT=1025 و MAIL_USE_TLS=false
+    MAIL_USE_TLS = (os.environ.get('MAIL_USE_TLS') or 'true').lower() == 'true'
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or MAIL_USERNAME or 'noreply@abaya-store.com'
+    
+    # طابور البريد الصادر
+    MAIL_QUEUE_WORKER = True           # تشغيل المرسل في الخلفية داخل العامل
+    MAIL_QUEUE_BATCH_SIZE = 20         # عدد الرسائل لكل اتصال SMTP
+    MAIL_QUEUE_RATE_LIMIT = 60         # الحد الأقصى للرسائل في الدقيقة
+    MAIL_QUEUE_MAX_ATTEMPTS = 5
+    MAIL_QUEUE_RETRY_DELAY = 30        # ثوان، تتضاعف مع كل محاولة فاشلة
+    MAIL_QUEUE_POLL_INTERVAL = 10
+    
+    # أحداث الطلبات
+    ORDER_EVENTS_WORKER = True
+    ORDER_EVENTS_POLL_INTERVAL = 30         # فحص الأحداث غير المرسلة بالبريد
+    ORDER_EVENTS_STREAM_POLL_INTERVAL = 2   # عند وجود مشتركين في البث المباشر
+    ORDER_EVENTS_KEEPALIVE = 15
+    # كل اتصال بث يحجز عاملاً، فيغلق بعد مدة ويعيد المتصفح الاتصال بعد STREAM_RETRY
+    # مع عمال sync في gunicorn عطله (False) أو استخدم عمالاً بخيوط (انظر wsgi.py)
+    ORDER_EVENTS_STREAM = True
+    ORDER_EVENTS_STREAM_MAX_AGE = 300       # ثوان
+    ORDER_EVENTS_STREAM_RETRY = 10000       # ملي ثانية
+    
+    # تتبع الطلبات
+    TRACKING_CACHE_TTL = 30       # ثوان
+    TRACKING_CACHE_SIZE = 4096
+    
+    # تشفير كلمات المرور (صيغة werkzeug مثل scrypt:N:r:p أو pbkdf2:sha256:iterations)
+    # أي تغيير هنا أو في PASSWORD_HASH_VERSION يعيد تشفير كلمة المرور عند تسجيل الدخول التالي
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_HASH_SALT_LENGTH = 16
+    PASSWORD_HASH_VERSION = 2
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)  # عمليات تشفير متزامنة لكل عامل
+    PASSWORD_HASH_QUEUE_SIZE = 8   # طلبات تنتظر دورها قبل الرفض
+    PASSWORD_HASH_TIMEOUT = 5      # ثوان انتظار مكان في الطابور
+    
+    # تحديد عدد الطلبات (صيغة القاعدة: عدد/مدة مثل 5/minute أو 3/10minutes)
+    # memory:// لعامل واحد، و sqlite:///path/to/ratelimit.db لمشاركة العدادات بين عدة عمال
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE_URL = os.environ.get('RATELIMIT_STORAGE_URL') or 'memory://'
+    RATELIMIT_LOGIN_IP = '20/minute'
+    RATELIMIT_LOGIN_USERNAME = '5/minute'
+    RATELIMIT_REGISTER = '5/hour'
+    RATELIMIT_CONTACT = '3/10minutes'
+    RATELIMIT_TRACK_ORDER = '30/minute'
+    
+    # عدد الطلبات في كل صفحة من سجل طلبات الحساب
+    ACCOUNT_ORDERS_PER_PAGE = 10
     
     # الجلسات
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    # مدة الاعتماد على هوية المستخدم المخزنة في الجلسة قبل إعادة قراءتها (بالثواني)،
+    # ورقم الإصدار يقارن بصف المستخدم في كل طلب
+    IDENTITY_CACHE_TTL = 60
+    
+    # القوالب: تترجم مرة واحدة وتحفظ في مجلد مشترك بين العمال (الافتراضي instance/jinja_cache)
+    # TEMPLATES_AUTO_RELOAD = None يعني إعادة التحميل في وضع debug فقط
+    TEMPLATES_AUTO_RELOAD = None
+    TEMPLATE_BYTECODE_CACHE = True
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
+    TEMPLATE_WARMUP = True             # ترجمة جميع القوالب عند إقلاع العامل (wsgi.py)
+    
+    # ضغط الاستجابات (brotli اختياري: pip install brotli)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIMETYPES = [
+        'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+        'application/javascript', 'application/json', 'image/svg+xml', 'text/event-stream'
+    ]
+    COMPRESS_MIN_SIZE = 500            # بايت، الاستجابات الأصغر ترسل كما هي
+    COMPRESS_LEVEL = 6                 # gzip
+    COMPRESS_BR_LEVEL = 5              # brotli
+    COMPRESS_CACHE_SIZE = 256          # عدد الاستجابات المضغوطة المحفوظة لكل عامل
+    COMPRESS_CACHE_TTL = 300
+    COMPRESS_CACHE_MAX_ITEM_SIZE = 512 * 1024
+    
+    # صفحات الكتالوج: ETag من نسخة البيانات، والمتصفح يتحقق منها في كل زيارة
+    CATALOG_CACHE_MAX_AGE = 0          # ثوان يستخدم فيها الزائر نسخته دون تحقق
+    ASSET_VERSION = os.environ.get('ASSET_VERSION')  # الافتراضي آخر تعديل على القوالب
     
     # التخزين المؤقت
-    CACHE_TYPE = 'simple'
\ No newline at end of file
+    CACHE_TYPE = 'simple'
+    # أقصى مدة لبقاء العروض في الذاكرة قبل إعادة تحميلها (بالثواني)
+    OFFER_CACHE_MAX_AGE = 300
\ No newline at end of file
@@ -0,0 +1,73 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class DatabaseEngine:
+    """إعدادات محرك قاعدة البيانات حسب نوعها (SQLite أو PostgreSQL)
+
+    يجب استدعاء init_app قبل db.init_app لأن خيارات المحرك تقرأ عند إنشائه
+    """
+
+    PROFILES = ('none', 'sqlite', 'postgresql')
+
+    def __init__(self, app=None):
+        self.profile = 'none'
+        self.sqlite_pragmas = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.profile = self._resolve_profile(app)
+        options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+
+        if self.profile == 'sqlite':
+            # تطبق على كل اتصال جديد عبر حدث connect
+            self.sqlite_pragmas = {
+                'journal_mode': 'WAL',
+                'synchronous': app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+                'busy_timeout': app.config.get('SQLITE_BUSY_TIMEOUT', 5000),
+                'mmap_size': app.config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+                'cache_size': app.config.get('SQLITE_CACHE_SIZE', -64000),
+            }
+        elif self.profile == 'postgresql':
+            options.setdefault('pool_size', app.config.get('DATABASE_POOL_SIZE', 5))
+            options.setdefault('max_overflow', app.config.get('DATABASE_MAX_OVERFLOW', 10))
+            options.setdefault('pool_timeout', app.config.get('DATABASE_POOL_TIMEOUT', 30))
+            options.setdefault('pool_recycle', app.config.get('DATABASE_POOL_RECYCLE', 1800))
+            options.setdefault('pool_pre_ping', True)
+
+            # حد أقصى لمدة الاستعلام حتى لا يحجز استعلام عالق اتصالاً من المجموعة
+            timeout = app.config.get('DATABASE_STATEMENT_TIMEOUT', 15000)
+            if timeout:
+                connect_args = options.setdefault('connect_args', {})
+                connect_args.setdefault('options', f'-c statement_timeout={int(timeout)}')
+
+    @classmethod
+    def _resolve_profile(cls, app):
+        profile = app.config.get('DATABASE_ENGINE_PROFILE', 'auto')
+        if profile == 'auto':
+            uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+            if uri.startswith('sqlite'):
+                # قاعدة البيانات في الذاكرة لا تدعم WAL
+                return 'none' if ':memory:' in uri or uri in ('sqlite://', 'sqlite:///') else 'sqlite'
+            if uri.startswith('postgresql') or uri.startswith('postgres'):
+                return 'postgresql'
+            return 'none'
+        if profile not in cls.PROFILES:
+            raise ValueError(f'Unknown database engine profile: {profile}')
+        return profile
+
+    def on_connect(self, dbapi_connection, connection_record):
+        if not self.sqlite_pragmas or not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in self.sqlite_pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+# إنشاء نسخة من الخدمة
+database_engine = DatabaseEngine()
+event.listen(Engine, 'connect', database_engine.on_connect)
@@ -0,0 +1,109 @@
+import sqlite3
+import time
+from functools import wraps
+
+import click
+from flask import g, has_request_context, request, session as flask_session
+from flask.cli import with_appcontext
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+PRIMARY_UNTIL_KEY = '_db_primary_until'
+
+
+class RoutingSession(Session):
+    """جلسة توجه استعلامات القراءة في المسارات المعلمة إلى نسخة القراءة
+
+    الكتابة، وأي قراءة بعد كتابة في نفس الطلب، تذهب دائماً إلى قاعدة البيانات الأساسية
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and self._use_replica(clause):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if not has_request_context() or not g.get('db_read_replica'):
+            return False
+        if self.info.get('has_writes'):
+            return False
+        # INSERT/UPDATE/DELETE والنصوص الخام تذهب إلى الأساسية
+        if clause is not None and not getattr(clause, 'is_select', False):
+            return False
+        return flask_session.get(PRIMARY_UNTIL_KEY, 0) <= time.time()
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_writes(session, flush_context):
+    session.info['has_writes'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _pin_to_primary(session):
+    # قراءة ما كتبه المستخدم: طلباته التالية تقرأ من الأساسية حتى تلحق النسخة
+    if not session.info.get('has_writes') or not has_request_context():
+        return
+    if read_replica_router.enabled:
+        flask_session[PRIMARY_UNTIL_KEY] = time.time() + read_replica_router.read_your_writes_window
+
+
+class ReadReplicaRouter:
+    """إضافة نسخة القراءة كـ bind باسم replica عند تحديد REPLICA_DATABASE_URL
+
+    يجب استدعاء init_app قبل db.init_app حتى ينشأ محرك النسخة
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.read_your_writes_window = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        replica_url = app.config.get('REPLICA_DATABASE_URL')
+        self.enabled = bool(replica_url)
+        self.read_your_writes_window = app.config.get('REPLICA_READ_YOUR_WRITES_WINDOW', 5)
+        if self.enabled:
+            binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+            binds.setdefault(REPLICA_BIND, replica_url)
+            app.config['SQLALCHEMY_BINDS'] = binds
+        app.cli.add_command(sync_replica_command)
+
+
+def read_replica(f):
+    """مزخرف لمسارات القراءة: طلبات GET تقرأ من النسخة إن وجدت"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.db_read_replica = request.method in ('GET', 'HEAD')
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@click.command('sync-replica')
+@with_appcontext
+def sync_replica_command():
+    """نسخ قاعدة SQLite الأساسية إلى ملف نسخة القراءة (للتجربة محلياً)"""
+    from extensions import db
+
+    primary = db.engines[None].url
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None:
+        raise click.ClickException('REPLICA_DATABASE_URL is not set')
+    if primary.get_backend_name() != 'sqlite' or replica.url.get_backend_name() != 'sqlite':
+        raise click.ClickException('sync-replica only supports SQLite files; use database replication instead')
+
+    source = sqlite3.connect(primary.database)
+    target = sqlite3.connect(replica.url.database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    click.echo(f'Copied {primary.database} to {replica.url.database}')
+
+
+# إنشاء نسخة من الخدمة
+read_replica_router = ReadReplicaRouter()
@@ -1,7 +1,35 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_mail import Mail
 
-db = SQLAlchemy()
+from db_routing import RoutingSession
+
+
+class LazyMail:
+    """واجهة Flask-Mail تؤجل استيراد المكتبة وتهيئتها حتى أول رسالة"""
+
+    def __init__(self):
+        self._mail = None
+
+    def init_app(self, app):
+        # لا شيء قبل أول استخدام
+        pass
+
+    def _get_mail(self):
+        if self._mail is None:
+            from flask_mail import Mail
+            self._mail = Mail()
+        if 'mail' not in current_app.extensions:
+            self._mail.init_app(current_app._get_current_object())
+        return self._mail
+
+    def connect(self):
+        return self._get_mail().connect()
+
+    def send(self, message):
+        return self._get_mail().send(message)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
-mail = Mail()
\ No newline at end of file
+mail = LazyMail()
\ No newline at end of file
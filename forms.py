@@ -1,9 +1,9 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, MultipleFileField, BooleanField, TextAreaField, FloatField, IntegerField, SelectField, FileField, DateTimeField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, NumberRange, Optional
+from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional
 from flask_wtf.file import FileAllowed, FileSize
-from models import User
 from config import ImageConfig
+from user_validation import find_conflicts, CONFLICT_MESSAGES
 
 class LoginForm(FlaskForm):
     username = StringField('اسم المستخدم', validators=[DataRequired()])
@@ -22,15 +22,18 @@ class RegisterForm(FlaskForm):
     agree_terms = BooleanField('أوافق على الشروط والأحكام', validators=[DataRequired()])
     submit = SubmitField('تسجيل')
 
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            raise ValidationError('اسم المستخدم موجود مسبقا، اختر اسم آخر')
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators):
+            return False
+        
+        # التحقق من اسم المستخدم والبريد الإلكتروني معاً في استعلام واحد
+        conflicts = find_conflicts(self.username.data, self.email.data)
+        self.add_conflict_errors(conflicts)
+        return not conflicts
 
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('البريد الإلكتروني موجود مسبقا، اختر بريد آخر')
+    def add_conflict_errors(self, conflicts):
+        for field in conflicts:
+            getattr(self, field).errors.append(CONFLICT_MESSAGES[field])
 
 class ProductForm(FlaskForm):
     name = StringField('اسم المنتج', validators=[DataRequired(), Length(max=100)])
@@ -51,6 +54,14 @@ class ProductForm(FlaskForm):
     is_active = BooleanField('نشط', default=True)
     submit = SubmitField('حفظ')
 
+class ProductVariantForm(FlaskForm):
+    sku = StringField('رمز SKU', validators=[DataRequired(), Length(max=64)])
+    size = StringField('المقاس', validators=[Optional(), Length(max=20)])
+    color = StringField('اللون', validators=[Optional(), Length(max=30)])
+    stock = IntegerField('الكمية المتاحة', validators=[Optional(), NumberRange(min=0)], default=0)
+    price_delta = FloatField('فرق السعر', validators=[Optional()], default=0.0)
+    submit = SubmitField('إضافة المتغير')
+
 class OfferForm(FlaskForm):
     title = StringField('عنوان العرض', validators=[DataRequired(), Length(max=100)])
     description = TextAreaField('وصف العرض', validators=[DataRequired()])
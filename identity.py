@@ -0,0 +1,90 @@
+import time
+
+from flask import session
+from flask_login import UserMixin
+
+from extensions import db
+from models import User
+
+
+class SessionUser(UserMixin):
+    """هوية خفيفة للمستخدم تكفي للمصادقة وشريط التنقل"""
+
+    def __init__(self, id, first_name, last_name, username, is_admin, version):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.username = username
+        self.is_admin = is_admin
+        self.version = version
+        self._profile = None
+
+    @property
+    def profile(self):
+        """الملف الكامل للمستخدم، يحمل مرة واحدة عند الحاجة فقط"""
+        if self._profile is None:
+            self._profile = db.session.get(User, self.id)
+        return self._profile
+
+    def __getattr__(self, name):
+        # أي خاصية غير موجودة في الهوية الخفيفة تقرأ من الملف الكامل
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.profile, name)
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'
+
+
+class IdentityLoader:
+    """تحميل هوية المستخدم من الجلسة مع مدة صلاحية ورقم إصدار
+
+    رقم الإصدار يقرأ من صف المستخدم في كل طلب (عمود واحد بالمفتاح الأساسي)، فيصل
+    تغيير الصلاحيات أو حذف الحساب إلى جميع العمال فوراً، وتبقى بقية الهوية من الجلسة
+    """
+
+    SESSION_KEY = '_identity'
+    COLUMNS = (User.id, User.first_name, User.last_name, User.username, User.is_admin, User.version)
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+
+    def load(self, user_id):
+        user_id = int(user_id)
+        version = db.session.query(User.version).filter(User.id == user_id).scalar()
+        if version is None:
+            # الحساب محذوف
+            session.pop(self.SESSION_KEY, None)
+            return None
+
+        snapshot = session.get(self.SESSION_KEY)
+        if (snapshot and snapshot['id'] == user_id
+                and time.time() - snapshot['loaded_at'] < self.ttl
+                and snapshot['version'] == version):
+            return SessionUser(**{key: snapshot[key] for key in
+                                  ('id', 'first_name', 'last_name', 'username', 'is_admin', 'version')})
+
+        row = db.session.query(*self.COLUMNS).filter(User.id == user_id).first()
+        if row is None:
+            session.pop(self.SESSION_KEY, None)
+            return None
+
+        data = dict(row._mapping)
+        session[self.SESSION_KEY] = dict(data, loaded_at=time.time())
+        return SessionUser(**data)
+
+    def bump(self, user):
+        """زيادة رقم الإصدار عند تعديل بيانات الهوية أو الصلاحيات، قبل commit"""
+        user.version = (user.version or 0) + 1
+        snapshot = session.get(self.SESSION_KEY)
+        if snapshot and snapshot['id'] == user.id:
+            session.pop(self.SESSION_KEY, None)
+
+
+# إنشاء نسخة من الخدمة
+identity_loader = IdentityLoader()
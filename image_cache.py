@@ -0,0 +1,234 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from flask import url_for
+from werkzeug.utils import secure_filename
+
+from image_service import image_service
+
+# صيغ الإخراج المسموحة: الاسم في الرابط -> (صيغة Pillow، الامتداد، نوع المحتوى)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'png': ('PNG', 'png', 'image/png'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+}
+
+# الصيغة الافتراضية للمشتقات حسب امتداد الأصل
+DEFAULT_OUTPUT = {'jpg': 'jpeg', 'jpeg': 'jpeg', 'png': 'png', 'webp': 'webp', 'gif': 'png', 'bmp': 'png'}
+
+
+class DerivativeCache:
+    """إنشاء أحجام الصور عند أول طلب وتخزينها على القرص بحد أقصى للحجم الكلي
+
+    - الأحجام والصيغ من قائمة مسموحة فقط حتى لا يمتلئ التخزين بأحجام عشوائية
+    - الملفات موزعة على مجلدات فرعية حسب أول بايتات المفتاح
+    - الطلبات المتزامنة لنفس المشتق تنتظر إنشاءه مرة واحدة (داخل العامل وبين العمال)
+    - عند تجاوز الحد يحذف الأقدم استخداماً
+    """
+
+    # لا تحذف المشتقات المستخدمة خلال هذه المدة، فقد تكون قيد الإرسال لعميل الآن
+    EVICT_GRACE = 60
+
+    def __init__(self, app=None):
+        self.app = None
+        self._inflight = {}  # المفتاح -> Event لإنشاء جار في هذا العامل
+        self._inflight_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._total_bytes = None
+        self._evict_after = 0  # لا فائدة من الحذف قبل انتهاء مهلة الملفات المحمية
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        config = app.config['IMAGE_CONFIG']
+        self.folders = {config.PRODUCTS_FOLDER, config.OFFERS_FOLDER, config.USERS_FOLDER}
+        self.widths = set(config.DERIVATIVE_WIDTHS)
+        self.heights = set(config.DERIVATIVE_HEIGHTS)
+        self.directory = config.DERIVATIVE_CACHE_DIR or os.path.join(app.instance_path, 'image_cache')
+        self.max_bytes = config.DERIVATIVE_CACHE_MAX_BYTES
+        self.lock_timeout = config.DERIVATIVE_LOCK_TIMEOUT
+        self.max_depth = config.SHARD_DEPTH
+        app.add_template_global(self.srcset, 'image_srcset')
+
+    def srcset(self, folder, name, source_width=None, fallback_width=600):
+        """قيمة srcset من المشتقات المسموحة حتى عرض الأصل، ورابط src للمتصفحات القديمة
+
+        المشتق لا يكبر الصورة، فأول عرض مسموح أكبر من الأصل يوصف بعرض الأصل نفسه
+        """
+        widths = sorted(self.widths)
+        if source_width:
+            larger = [width for width in widths if width >= source_width]
+            widths = [width for width in widths if width < source_width] + larger[:1]
+        candidates = [
+            (url_for('main.image_derivative', folder=folder, name=name, w=width),
+             min(width, source_width) if source_width else width)
+            for width in widths
+        ]
+        fallback = next((url for url, width in candidates if width >= fallback_width), candidates[-1][0])
+        return ', '.join(f'{url} {width}w' for url, width in candidates), fallback
+
+    def validate(self, folder, name, width, height, fmt):
+        """التحقق من الطلب مقابل القوائم المسموحة، ويعيد مسار الأصل وصيغة الإخراج"""
+        # الاسم قد يتضمن مجلدات فرعية (ab/cd/name.jpg)، وكل جزء يجب أن يكون اسماً آمناً
+        parts = name.split('/')
+        if folder not in self.folders or len(parts) > self.max_depth + 1 or '.' not in parts[-1] \
+                or any(secure_filename(part) != part for part in parts):
+            raise FileNotFoundError(name)
+        # الأسماء القديمة بلا مجلدات فرعية تبقى صالحة بعد "flask images shard"
+        name = image_service.resolve(name, folder)
+        if width is None and height is None:
+            raise ValueError('w or h is required')
+        if (width is not None and width not in self.widths) or (height is not None and height not in self.heights):
+            raise ValueError('size is not allowed')
+        ext = name.rsplit('.', 1)[1].lower()
+        fmt = fmt or DEFAULT_OUTPUT.get(ext)
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError('format is not allowed')
+
+        source = os.path.join(self.app.config['UPLOAD_FOLDER'], folder, name)
+        if not os.path.isfile(source):
+            raise FileNotFoundError(name)
+        return source, fmt
+
+    def path_for(self, source, width, height, fmt):
+        # زمن تعديل الأصل جزء من المفتاح، فاستبدال الصورة ينتج مشتقاً جديداً
+        stat = os.stat(source)
+        key = hashlib.sha1(
+            f'{source}:{stat.st_mtime_ns}:{stat.st_size}:{width}x{height}:{fmt}'.encode()
+        ).hexdigest()
+        return os.path.join(self.directory, key[:2], key[2:4], f'{key}.{OUTPUT_FORMATS[fmt][1]}')
+
+    def get(self, folder, name, width=None, height=None, fmt=None):
+        """مسار المشتق ونوع محتواه، مع إنشائه إن لم يكن موجوداً"""
+        source, fmt = self.validate(folder, name, width, height, fmt)
+        path = self.path_for(source, width, height, fmt)
+        mimetype = OUTPUT_FORMATS[fmt][2]
+
+        if self._touch(path):
+            return path, mimetype
+
+        # عامل واحد فقط ينشئ كل مشتق، والباقي ينتظر النتيجة
+        with self._inflight_lock:
+            event = self._inflight.get(path)
+            owner = event is None
+            if owner:
+                event = self._inflight[path] = threading.Event()
+        if not owner:
+            event.wait(self.lock_timeout)
+            if self._touch(path):
+                return path, mimetype
+
+        try:
+            self._generate(source, path, width, height, fmt)
+        finally:
+            if owner:
+                with self._inflight_lock:
+                    self._inflight.pop(path, None)
+                event.set()
+        return path, mimetype
+
+    @staticmethod
+    def _touch(path):
+        """تحديث زمن آخر استخدام للمشتق إن وجد (أساس ترتيب الحذف)"""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _generate(self, source, path, width, height, fmt):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lock_path = path + '.lock'
+        # قفل بين العمال: من ينجح في إنشاء ملف القفل ينشئ المشتق
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                if os.path.exists(path):
+                    return
+                if time.monotonic() > deadline or self._is_stale(lock_path):
+                    # عامل توقف أثناء الإنشاء: نتجاهل قفله
+                    break
+                time.sleep(0.05)
+
+        try:
+            if os.path.exists(path):
+                return
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    image_service.render_derivative(source, output, (width, height), OUTPUT_FORMATS[fmt][0])
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        finally:
+            try:
+                os.unlink(lock_path)
+            except FileNotFoundError:
+                pass
+        self._account(os.path.getsize(path))
+
+    def _is_stale(self, lock_path):
+        try:
+            return time.time() - os.path.getmtime(lock_path) > self.lock_timeout
+        except FileNotFoundError:
+            return False
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(('.tmp', '.lock')):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        return entries
+
+    def _account(self, size):
+        with self._evict_lock:
+            entries = None
+            if self._total_bytes is None:
+                entries = self._scan()
+                self._total_bytes = sum(entry[1] for entry in entries)
+            else:
+                self._total_bytes += size
+            # إن منعت المهلة الحذف في المرة السابقة فلا إعادة مسح قبل انتهائها
+            if self._total_bytes > self.max_bytes and time.time() >= self._evict_after:
+                self._evict(entries)
+
+    def _evict(self, entries=None):
+        """حذف الأقدم استخداماً حتى ينخفض الحجم إلى 90% من الحد"""
+        entries = sorted(entries if entries is not None else self._scan())
+        total = sum(entry[1] for entry in entries)
+        target = self.max_bytes * 0.9
+        now = time.time()
+        recent = now - self.EVICT_GRACE
+        self._evict_after = 0
+        for used_at, size, path in entries:
+            if total <= target:
+                break
+            if used_at > recent:
+                # الباقي استخدم للتو: المحاولة التالية بعد انتهاء مهلة أقدمها
+                self._evict_after = used_at + self.EVICT_GRACE
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        # العمال الآخرون يحذفون أيضاً، فالمجموع يعاد حسابه من القرص
+        self._total_bytes = total
+
+
+# إنشاء نسخة من الخدمة
+derivative_cache = DerivativeCache()
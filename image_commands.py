@@ -0,0 +1,444 @@
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import click
+from flask import Flask, current_app
+from flask.cli import AppGroup
+
+from config import ImageConfig
+from extensions import db
+from image_service import image_service
+from models import Offer, ProductImage
+
+# أوامر صيانة الصور: flask images ...
+images_cli = AppGroup('images', help='Image maintenance commands.')
+
+
+def _referenced_images():
+    """الصور المستخدمة في قاعدة البيانات: (المجلد، اسم الملف) -> الكائنات التي تشير إليها"""
+    references = {}
+    for image in ProductImage.query:
+        references.setdefault((ImageConfig.PRODUCTS_FOLDER, image.image_url), []).append((image, 'image_url'))
+    for offer in Offer.query.filter(Offer.image.isnot(None), Offer.image != 'default_offer.jpg'):
+        references.setdefault((ImageConfig.OFFERS_FOLDER, offer.image), []).append((offer, 'image'))
+    return references
+
+
+def _missing_variants(folder, filename):
+    upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
+    return [name for name in image_service.variant_filenames(filename).values()
+            if not os.path.exists(os.path.join(upload_path, name))]
+
+
+@images_cli.command('reprocess')
+@click.option('--workers', type=int, default=None, help='عدد الصور المعالجة بالتوازي (افتراضياً عدد الأنوية)')
+@click.option('--dry-run', is_flag=True, help='عرض الصور التي تحتاج معالجة دون تعديلها')
+def reprocess_command(workers, dry_run):
+    """إعادة معالجة الصور القديمة المحفوظة دون أحجام (تدوير، حذف EXIF، إنشاء الأحجام)"""
+    app = current_app._get_current_object()
+    upload_folder = app.config['UPLOAD_FOLDER']
+
+    references = _referenced_images()
+    jobs = []
+    for folder, filename in references:
+        if not _missing_variants(folder, filename):
+            continue
+        if not os.path.isfile(os.path.join(upload_folder, folder, filename)):
+            click.echo(f'missing  {folder}/{filename}')
+            continue
+        jobs.append((folder, filename))
+
+    if dry_run or not jobs:
+        click.echo(f'{len(jobs)} images need reprocessing')
+        return
+
+    def process(folder, filename):
+        # Pillow يحرر GIL أثناء فك الضغط وتغيير الحجم والحفظ، فتعمل الخيوط بالتوازي فعلاً
+        with app.app_context():
+            with open(os.path.join(upload_folder, folder, filename), 'rb') as stream:
+                new_filename = image_service.process_image_stream(stream, folder)['original']
+            metadata = image_service.image_metadata(new_filename, folder) if folder == ImageConfig.PRODUCTS_FOLDER else {}
+            return new_filename, metadata
+
+    replaced = []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(process, *job): job for job in jobs}
+        for future in as_completed(futures):
+            folder, filename = futures[future]
+            try:
+                new_filename, metadata = future.result()
+            except ValueError as e:
+                failed += 1
+                click.echo(f'failed   {folder}/{filename}: {e}')
+                continue
+            # التعديل عبر الكائنات حتى يتغير updated_at للمنتج وتتجدد نسخة الكتالوج
+            for obj, attribute in references[(folder, filename)]:
+                setattr(obj, attribute, new_filename)
+                obj.variants_version = image_service.variants_fingerprint()
+                for key, value in metadata.items():
+                    setattr(obj, key, value)
+            if new_filename != filename:
+                replaced.append((folder, filename))
+            click.echo(f'done     {folder}/{filename} -> {new_filename}')
+
+    db.session.commit()
+
+    # حذف الملفات القديمة بعد حفظ الأسماء الجديدة فقط
+    for folder, filename in replaced:
+        image_service.delete_image_variants(filename, folder)
+    click.echo(f'Reprocessed {len(jobs) - failed} images, {failed} failed')
+
+
+def _scan_folder(path, prefix=''):
+    """جميع الملفات تحت مجلد التحميل: (المسار النسبي، الحجم، زمن التعديل)"""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scan_folder(entry.path, f'{prefix}{entry.name}/')
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                yield f'{prefix}{entry.name}', stat.st_size, stat.st_mtime
+
+
+def _referenced_files():
+    """أسماء جميع الملفات المستخدمة (الأصل وأحجامه) لكل مجلد، باستعلام واحد لكل جدول"""
+    referenced = {}
+    for folder, column in ((ImageConfig.PRODUCTS_FOLDER, ProductImage.image_url),
+                           (ImageConfig.OFFERS_FOLDER, Offer.image)):
+        names = referenced[folder] = set()
+        for (filename,) in db.session.query(column).distinct():
+            if filename and '.' in filename:
+                names.update(image_service.variant_filenames(filename).values())
+    return referenced
+
+
+def _format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+
+
+@images_cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='عرض الملفات غير المستخدمة دون نقلها أو حذفها')
+@click.option('--delete', is_flag=True, help='حذف نهائي بدلاً من النقل إلى مجلد العزل')
+@click.option('--min-age', type=int, default=None, help='تجاهل الملفات الأحدث من هذا العدد من الثواني')
+@click.option('--workers', type=int, default=8, show_default=True)
+def gc_command(dry_run, delete, min_age, workers):
+    """نقل أو حذف ملفات التحميل التي لا يشير إليها أي منتج أو عرض، مع تقرير المساحة لكل مجلد"""
+    config = current_app.config['IMAGE_CONFIG']
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    cutoff = time.time() - (config.GC_MIN_AGE if min_age is None else min_age)
+    referenced = _referenced_files()
+
+    orphans = []
+    report = []
+    for folder in (config.PRODUCTS_FOLDER, config.OFFERS_FOLDER, config.USERS_FOLDER):
+        path = os.path.join(upload_folder, folder)
+        if not os.path.isdir(path):
+            continue
+        usage = {'files': 0, 'bytes': 0, 'orphans': 0, 'orphan_bytes': 0}
+        # المجلدات التي لا يشير إليها جدول (مثل users) يقاس حجمها فقط
+        names = referenced.get(folder)
+        for name, size, mtime in _scan_folder(path):
+            usage['files'] += 1
+            usage['bytes'] += size
+            if names is None or name in names or name.startswith('default_') or mtime > cutoff:
+                continue
+            orphans.append((folder, name))
+            usage['orphans'] += 1
+            usage['orphan_bytes'] += size
+        report.append((folder, usage))
+
+    click.echo(f"{'folder':<10} {'files':>7} {'size':>10} {'orphans':>8} {'orphan size':>12}")
+    for folder, usage in report:
+        click.echo(f"{folder:<10} {usage['files']:>7} {_format_size(usage['bytes']):>10} "
+                   f"{usage['orphans']:>8} {_format_size(usage['orphan_bytes']):>12}")
+
+    if dry_run:
+        for folder, name in orphans:
+            click.echo(f'orphan   {folder}/{name}')
+        return
+    if not orphans:
+        return
+
+    quarantine = None
+    if not delete:
+        quarantine = os.path.join(config.QUARANTINE_DIR or os.path.join(current_app.instance_path, 'upload_quarantine'),
+                                  time.strftime('%Y%m%d-%H%M%S'))
+
+    def remove(job):
+        folder, name = job
+        source = os.path.join(upload_folder, folder, name)
+        try:
+            # رفع جديد لنفس المحتوى يحدث زمن التعديل، فيعاد الفحص قبل الإزالة مباشرة
+            if os.stat(source).st_mtime > cutoff:
+                return False
+            if quarantine is None:
+                os.remove(source)
+            else:
+                target = os.path.join(quarantine, folder, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(source, target)
+            return True
+        except FileNotFoundError:
+            return False
+
+    # العمليات على الملفات تنتظر القرص غالباً، فتنفذ بالتوازي
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        removed = sum(executor.map(remove, orphans))
+
+    if quarantine is None:
+        click.echo(f'Deleted {removed} orphaned files')
+    else:
+        click.echo(f'Moved {removed} orphaned files to {quarantine}')
+
+
+def _link_variants(upload_path, filename, sharded):
+    """ربط جميع أحجام الصورة بمسارها الجديد دون حذف القديم، ويعيد False إن لم يوجد الأصل"""
+    old_names = image_service.variant_filenames(filename)
+    new_names = image_service.variant_filenames(sharded)
+    for size_name, old_name in old_names.items():
+        source = os.path.join(upload_path, old_name)
+        target = os.path.join(upload_path, new_names[size_name])
+        if os.path.exists(target):
+            # نقل سابق توقف قبل حفظ قاعدة البيانات، أو صورة مشتركة بين أكثر من سجل
+            continue
+        if not os.path.exists(source):
+            if size_name == 'original':
+                return False
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+    return True
+
+
+@images_cli.command('shard')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+@click.option('--dry-run', is_flag=True, help='عرض عدد الصور التي ستنقل دون تعديلها')
+def shard_command(batch_size, dry_run):
+    """نقل الصور المحفوظة في مجلد واحد إلى المجلدات الفرعية (ab/cd/name) وتحديث السجلات
+
+    يمكن إيقافه وإعادة تشغيله في أي وقت: الملفات تربط بالمسار الجديد أولاً، ثم تحفظ
+    السجلات على دفعات، ثم تحذف المسارات القديمة، فلا تظهر صورة مكسورة في أي لحظة
+    """
+    if not current_app.config['IMAGE_CONFIG'].SHARD_DEPTH:
+        raise click.ClickException('ImageConfig.SHARD_DEPTH is 0')
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    for folder, model, column in ((ImageConfig.PRODUCTS_FOLDER, ProductImage, 'image_url'),
+                                  (ImageConfig.OFFERS_FOLDER, Offer, 'image')):
+        attribute = getattr(model, column)
+        pending = model.query.filter(~attribute.contains('/'), attribute.isnot(None),
+                                     attribute != 'default_offer.jpg')
+        if dry_run:
+            click.echo(f'{folder}: {pending.count()} rows to migrate')
+            continue
+
+        upload_path = os.path.join(upload_folder, folder)
+        moved = missing = 0
+        last_id = 0
+        while True:
+            # ترقيم حسب المعرف حتى لا تتكرر السجلات التي لم توجد ملفاتها
+            rows = pending.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            replaced = set()
+            for row in rows:
+                filename = getattr(row, column)
+                sharded = image_service.shard_path(filename)
+                if not _link_variants(upload_path, filename, sharded):
+                    missing += 1
+                    continue
+                setattr(row, column, sharded)
+                replaced.add(filename)
+            db.session.commit()
+
+            # المسار القديم لم يعد مستخدماً بعد حفظ الدفعة
+            for filename in replaced:
+                for old_name in image_service.variant_filenames(filename).values():
+                    try:
+                        os.remove(os.path.join(upload_path, old_name))
+                    except FileNotFoundError:
+                        pass
+            moved += len(replaced)
+            click.echo(f'{folder}: {moved} images migrated')
+        click.echo(f'{folder}: done, {moved} images migrated, {missing} rows without files')
+
+
+@images_cli.command('describe')
+@click.option('--all', 'describe_all', is_flag=True, help='إعادة الحساب لجميع الصور وليس الناقصة فقط')
+@click.option('--batch-size', type=int, default=200, show_default=True)
+def describe_command(describe_all, batch_size):
+    """حساب أبعاد صور المنتجات ولونها الغالب وصورتها المموهة الصغيرة للصور المحفوظة سابقاً"""
+    query = ProductImage.query
+    if not describe_all:
+        query = query.filter(ProductImage.width.is_(None))
+
+    described = failed = 0
+    last_id = 0
+    while True:
+        rows = query.filter(ProductImage.id > last_id).order_by(ProductImage.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        metadata = {}
+        for row in rows:
+            if row.image_url not in metadata:
+                try:
+                    metadata[row.image_url] = image_service.image_metadata(row.image_url, ImageConfig.PRODUCTS_FOLDER)
+                except (OSError, ValueError) as e:
+                    metadata[row.image_url] = None
+                    click.echo(f'failed   {row.image_url}: {e}')
+            if metadata[row.image_url] is None:
+                failed += 1
+                continue
+            for key, value in metadata[row.image_url].items():
+                setattr(row, key, value)
+            described += 1
+        db.session.commit()
+    click.echo(f'Described {described} images, {failed} failed')
+
+
+def _init_rebuild_worker(upload_folder, image_config):
+    """تهيئة عملية إعادة الإنشاء: تطبيق صغير للإعدادات فقط، دون قاعدة البيانات"""
+    # أولوية أقل من عمال الموقع حتى لا تبطئ الطلبات أثناء إعادة الإنشاء
+    if hasattr(os, 'nice'):
+        os.nice(10)
+    app = Flask(__name__)
+    app.config.update(UPLOAD_FOLDER=upload_folder, IMAGE_CONFIG=image_config)
+    image_service.init_app(app)
+    app.app_context().push()
+
+
+def _rebuild_variants(job):
+    """إعادة إنشاء أحجام صورة واحدة من أصلها، ويعيد (المجلد، الاسم، الحجم قبل، الحجم بعد، الخطأ)"""
+    from PIL import ImageOps
+
+    folder, filename = job
+    upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
+    # الأصل لا يعاد حفظه حتى لا تتراكم خسارة الضغط
+    sizes = [size_name for size_name in image_service.config.SIZES if size_name != 'original']
+    paths = [os.path.join(upload_path, name) for size_name, name in image_service.variant_filenames(filename).items()
+             if size_name in sizes]
+    before = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+    try:
+        with open(os.path.join(upload_path, filename), 'rb') as stream:
+            detected = image_service.sniff_format(stream)
+            if detected is None:
+                raise ValueError('صيغة الملف غير مدعومة')
+            image = image_service.open_image(stream, detected[0])
+            with image:
+                if getattr(image, 'is_animated', False):
+                    image_service.save_animated_variants(image, filename, folder, sizes=sizes)
+                else:
+                    ImageOps.exif_transpose(image, in_place=True)
+                    image_service.save_image_variants(image, filename, folder, sizes=sizes)
+    except (OSError, ValueError) as e:
+        return folder, filename, before, before, str(e)
+    after = sum(os.path.getsize(path) for path in paths)
+    return folder, filename, before, after, None
+
+
+@images_cli.command('rebuild')
+@click.option('--workers', type=int, default=None, help='عدد العمليات (افتراضياً عدد الأنوية)')
+@click.option('--force', is_flag=True, help='إعادة إنشاء جميع الصور حتى المطابقة للإعدادات الحالية')
+@click.option('--io-limit', type=float, default=0, help='الحد الأقصى للكتابة بالميجابايت في الثانية (0 بلا حد)')
+@click.option('--checkpoint-every', type=int, default=50, show_default=True,
+              help='حفظ التقدم في قاعدة البيانات بعد هذا العدد من الصور')
+@click.option('--dry-run', is_flag=True, help='عرض عدد الصور التي تحتاج إعادة إنشاء فقط')
+def rebuild_command(workers, force, io_limit, checkpoint_every, dry_run):
+    """إعادة إنشاء أحجام الصور التي أنشئت بإعدادات قديمة (ImageConfig.SIZES أو الجودة)
+
+    كل صورة تسجل بصمة الإعدادات بعد إعادة إنشائها، فإيقاف الأمر وتشغيله لاحقاً يكمل من حيث توقف
+    """
+    fingerprint = image_service.variants_fingerprint()
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+
+    sources = ((ImageConfig.PRODUCTS_FOLDER, ProductImage, ProductImage.image_url),
+               (ImageConfig.OFFERS_FOLDER, Offer, Offer.image))
+    jobs = []
+    for folder, model, column in sources:
+        query = db.session.query(column).filter(column.isnot(None), column != 'default_offer.jpg')
+        if not force:
+            query = query.filter(db.or_(model.variants_version.is_(None), model.variants_version != fingerprint))
+        for (filename,) in query.distinct():
+            if os.path.isfile(os.path.join(upload_folder, folder, filename)):
+                jobs.append((folder, filename))
+            else:
+                click.echo(f'missing  {folder}/{filename}')
+
+    click.echo(f'{len(jobs)} images to rebuild (settings {fingerprint})')
+    if dry_run or not jobs:
+        return
+
+    def checkpoint(done):
+        # تسجيل الصور المنتهية، والأمر التالي يتخطاها
+        for folder, model, column in sources:
+            filenames = [filename for done_folder, filename in done if done_folder == folder]
+            if filenames:
+                model.query.filter(column.in_(filenames)).update(
+                    {model.variants_version: fingerprint}, synchronize_session=False)
+        db.session.commit()
+        done.clear()
+
+    # لا ترسل صورة جديدة للعمال قبل انتهاء صورة سابقة، فيمكن إبطاء الكتابة من هنا
+    workers = workers or os.cpu_count()
+    slots = threading.Semaphore(workers * 2)
+
+    def feed():
+        for job in jobs:
+            slots.acquire()
+            yield job
+
+    started = time.perf_counter()
+    processed = failed = 0
+    bytes_before = bytes_after = 0
+    done = []
+    # اتصالات قاعدة البيانات لا تنتقل إلى العمليات الفرعية
+    db.engine.dispose(close=False)
+    pool = multiprocessing.Pool(workers, initializer=_init_rebuild_worker,
+                                initargs=(upload_folder, current_app.config['IMAGE_CONFIG']))
+    try:
+        for folder, filename, before, after, error in pool.imap_unordered(_rebuild_variants, feed()):
+            processed += 1
+            if error:
+                failed += 1
+                click.echo(f'failed   {folder}/{filename}: {error}')
+            else:
+                bytes_before += before
+                bytes_after += after
+                done.append((folder, filename))
+
+            elapsed = time.perf_counter() - started
+            if io_limit:
+                # النوم حتى يعود معدل الكتابة إلى الحد المطلوب
+                delay = bytes_after / (io_limit * 1024 * 1024) - elapsed
+                if delay > 0:
+                    time.sleep(delay)
+            slots.release()
+
+            if len(done) >= checkpoint_every:
+                checkpoint(done)
+            if processed % checkpoint_every == 0 or processed == len(jobs):
+                click.echo(f'{processed}/{len(jobs)} images, {processed / max(elapsed, 1e-6):.1f} images/sec')
+        checkpoint(done)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    elapsed = time.perf_counter() - started
+    click.echo(f'Rebuilt {processed - failed} images in {elapsed:.1f}s '
+               f'({(processed - failed) / max(elapsed, 1e-6):.1f} images/sec), {failed} failed')
+    change = f'saved {_format_size(bytes_before - bytes_after)}' if bytes_before >= bytes_after \
+        else f'grew by {_format_size(bytes_after - bytes_before)}'
+    click.echo(f'Variants: {_format_size(bytes_before)} -> {_format_size(bytes_after)} ({change})')
@@ -1,9 +1,38 @@
+import base64
+import hashlib
 import os
+import shutil
+import tempfile
 import uuid
-from PIL import Image, ImageOps
 from io import BytesIO
-from flask import current_app
-from werkzeug.utils import secure_filename
+from flask import current_app, Request
+
+# توقيع بداية الملف لكل صيغة مدعومة: (البايتات، الإزاحة، صيغة Pillow، الامتداد)
+MAGIC_SIGNATURES = [
+    (b'\xff\xd8\xff', 0, 'JPEG', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 0, 'PNG', 'png'),
+    (b'GIF87a', 0, 'GIF', 'gif'),
+    (b'GIF89a', 0, 'GIF', 'gif'),
+    (b'WEBP', 8, 'WEBP', 'webp'),  # بعد RIFF وطول الملف
+    (b'BM', 0, 'BMP', 'bmp'),
+]
+
+# البايتات لكل بكسل في ذاكرة Pillow بعد فك الضغط
+_BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I;16B': 2, 'I;16L': 2}
+
+
+class SpooledUploadRequest(Request):
+    """طلب يكتب الملفات المرفوعة على القرص على دفعات بدلاً من ذاكرة العامل"""
+    
+    max_form_memory_size = 512 * 1024
+    max_form_parts = 200
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        image_config = current_app.config['IMAGE_CONFIG']
+        # الملفات الصغيرة تبقى في الذاكرة، والأكبر تنقل إلى ملف مؤقت تلقائياً
+        return tempfile.SpooledTemporaryFile(max_size=image_config.UPLOAD_SPOOL_SIZE,
+                                             dir=image_config.UPLOAD_TMP_DIR)
+
 
 class ImageService:
     def __init__(self, app=None):
@@ -12,6 +41,7 @@ class ImageService:
     
     def init_app(self, app):
         self.config = app.config.get('IMAGE_CONFIG')
+        app.request_class = SpooledUploadRequest
     
     @staticmethod
     def allowed_file(filename):
@@ -21,9 +51,75 @@ class ImageService:
                filename.rsplit('.', 1)[1].lower() in allowed_extensions
     
     @staticmethod
-    def generate_unique_filename(original_filename):
+    def sniff_format(stream):
+        """تحديد صيغة الصورة من أول بايتات الملف، ويعيد (صيغة Pillow، الامتداد) أو None"""
+        position = stream.tell()
+        header = stream.read(16)
+        stream.seek(position)
+        for signature, offset, format_name, ext in MAGIC_SIGNATURES:
+            if header[offset:offset + len(signature)] == signature:
+                if format_name == 'WEBP' and not header.startswith(b'RIFF'):
+                    continue
+                return format_name, ext
+        return None
+    
+    @staticmethod
+    def stream_size(stream):
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        return size
+    
+    def open_image(self, stream, format_name):
+        """فتح الصورة بقراءة الترويسة فقط، ورفضها قبل فك الضغط إن تجاوزت حدود البكسل والذاكرة"""
+        from PIL import Image
+        
+        # حماية إضافية لأي مسار آخر يفتح الصور
+        Image.MAX_IMAGE_PIXELS = self.config.MAX_PIXELS
+        try:
+            image = Image.open(stream, formats=[format_name])
+        except Image.DecompressionBombError:
+            raise ValueError('أبعاد الصورة أكبر من المسموح به')
+        except OSError:
+            raise ValueError('ملف الصورة تالف أو غير مقروء')
+        
+        width, height = image.size
+        pixels = width * height
+        frames = getattr(image, 'n_frames', 1)
+        # الصورة المفكوكة + نسخة RGB أثناء التحويل والحفظ
+        decode_bytes = pixels * (_BYTES_PER_PIXEL.get(image.mode, 4) + 4)
+        # أكبر إطار RGBA ينشأ أثناء المعالجة: الأصل أو لوحة أحد الأحجام
+        frame_bytes = max(pixels, self.canvas_pixels(image.size, animated=frames > 1)) * 4
+        if frames > 1:
+            # مكتبة حفظ WebP تجمع إطارات الحجم الجاري حفظه كلها في الذاكرة قبل ترميزها
+            decode_bytes += frames * frame_bytes
+        else:
+            decode_bytes += frame_bytes
+        
+        if max(width, height) > self.config.MAX_DIMENSION or pixels > self.config.MAX_PIXELS:
+            image.close()
+            raise ValueError(f'أبعاد الصورة أكبر من المسموح به ({width}x{height})')
+        if decode_bytes > self.config.MAX_DECODE_MEMORY:
+            image.close()
+            raise ValueError('الصورة تحتاج ذاكرة أكبر من المسموح بها لمعالجتها')
+        if frames > self.config.MAX_FRAMES:
+            image.close()
+            raise ValueError('عدد إطارات الصورة أكبر من المسموح به')
+        return image
+    
+    def canvas_pixels(self, size, animated=False):
+        """أكبر عدد بكسلات في إطار تنشئه أحجام الصورة
+        
+        الصور الثابتة تحشى إلى أبعاد الحجم كاملة، والمتحركة تصغر فقط دون حشو أو تكبير
+        """
+        canvases = [self.fit_size(size, dimensions) if animated else dimensions
+                    for dimensions in self.config.SIZES.values() if dimensions]
+        return max((w * h for w, h in canvases), default=0)
+    
+    @staticmethod
+    def generate_unique_filename(original_filename, ext=None):
         """إنشاء اسم فريد للملف"""
-        ext = original_filename.rsplit('.', 1)[1].lower()
+        ext = ext or original_filename.rsplit('.', 1)[1].lower()
         unique_id = uuid.uuid4().hex
         return f"{unique_id}.{ext}"
     
@@ -35,7 +131,9 @@ class ImageService:
     @staticmethod
     def optimize_image(image, format_type='JPEG'):
         """تحسين جودة الصورة"""
-        if format_type.upper() == 'JPEG':
+        from PIL import Image  # استيراد مؤجل لتسريع بدء التطبيق
+        
+        if format_type.upper() in ('JPEG', 'JPG'):
             # تحويل إلى RGB إذا كانت الصورة بـ RGBA
             if image.mode in ('RGBA', 'LA'):
                 background = Image.new('RGB', image.size, (255, 255, 255))
@@ -46,19 +144,41 @@ class ImageService:
         
         return image
     
+    @staticmethod
+    def fit_size(size, dimensions):
+        """أبعاد الصورة بعد تصغيرها لتدخل في dimensions مع الحفاظ على التناسب، دون تكبير"""
+        if not dimensions:
+            return size
+        scale = min(dimensions[0] / size[0], dimensions[1] / size[1], 1)
+        if scale == 1:
+            return size
+        return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+    
     def resize_image(self, image, size):
         """تغيير حجم الصورة مع الحفاظ على التناسب"""
+        from PIL import Image
+        
         if size is None:
             return image
         
         width, height = size
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        
+        # ألوان الـ palette لا تصغر إلا بأقرب بكسل، فتحول أولاً ثم تعاد إلى palette عند الحفظ
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
         
-        # الحفاظ على نسبة الطول إلى العرض
-        image.thumbnail((width, height), Image.Resampling.LANCZOS)
+        # الحفاظ على نسبة الطول إلى العرض، في صورة جديدة بالحجم المطلوب دون نسخ الأصل
+        target = self.fit_size(image.size, size)
+        if target != image.size:
+            image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
         
-        # إنشاء صورة جديدة بخلفية بيضاء للحفاظ على الأبعاد
+        # إنشاء صورة جديدة بخلفية بيضاء (أو شفافة للصور الشفافة) للحفاظ على الأبعاد
         if image.size != (width, height):
-            new_image = Image.new('RGB', (width, height), (255, 255, 255))
+            if has_alpha:
+                new_image = Image.new('RGBA', (width, height), (255, 255, 255, 0))
+            else:
+                new_image = Image.new('RGB', (width, height), (255, 255, 255))
             # وضع الصورة في المنتصف
             offset = ((width - image.size[0]) // 2, (height - image.size[1]) // 2)
             new_image.paste(image, offset)
@@ -66,19 +186,40 @@ class ImageService:
         
         return image
     
-    def save_image_variants(self, image, filename, folder):
-        """حفظ الصورة بجميع الأحجام المطلوبة"""
+    @staticmethod
+    def to_palette(image, colors=256):
+        """إعادة صورة مصغرة إلى palette بعدد ألوان الأصل، حتى لا يكبر ملف PNG/GIF عن الأصل"""
+        from PIL import Image
+        
+        if image.mode == 'P':
+            return image
+        # FASTOCTREE أسرع بكثير من MEDIANCUT ويحفظ الشفافية في الـ palette
+        return image.convert('RGBA' if image.mode in ('RGBA', 'LA') else 'RGB').quantize(
+            colors, method=Image.Quantize.FASTOCTREE)
+    
+    def save_image_variants(self, image, filename, folder, sizes=None):
+        """حفظ الصورة بجميع الأحجام المطلوبة (أو بالأحجام المحددة في sizes فقط)"""
+        from PIL import Image
+        
         variants = {}
-        base_name = filename.rsplit('.', 1)[0]
         ext = filename.rsplit('.', 1)[1].lower()
+        format_name = Image.registered_extensions()[f'.{ext}']
         
-        # التأكد من وجود المجلدات
+        # التأكد من وجود المجلدات (الاسم قد يتضمن مجلدات فرعية)
         upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
-        os.makedirs(upload_path, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.join(upload_path, filename)), exist_ok=True)
+        
+        # عدد ألوان الـ palette المستخدمة فعلاً، لإعادة الأحجام المصغرة إليه
+        palette_colors = None
+        if image.mode == 'P' and ext in ('png', 'gif'):
+            palette_colors = len(image.getcolors(256) or ()) or 256
         
         for size_name, dimensions in self.config.SIZES.items():
-            # نسخة من الصورة الأصلية للمعالجة
-            processed_image = image.copy()
+            if sizes is not None and size_name not in sizes:
+                continue
+            
+            # تغيير الحجم ينتج صورة جديدة، فلا حاجة لنسخ الأصل بالكامل لكل حجم
+            processed_image = image
             
             # تغيير الحجم إذا كان مطلوباً
             if dimensions:
@@ -86,12 +227,11 @@ class ImageService:
             
             # تحسين الجودة
             processed_image = self.optimize_image(processed_image, ext)
+            if palette_colors:
+                processed_image = self.to_palette(processed_image, palette_colors)
             
             # إنشاء اسم الملف
-            if size_name == 'original':
-                variant_filename = filename
-            else:
-                variant_filename = f"{base_name}_{size_name}.{ext}"
+            variant_filename = self.variant_filenames(filename)[size_name]
             
             # حفظ الصورة
             variant_path = os.path.join(upload_path, variant_filename)
@@ -105,74 +245,298 @@ class ImageService:
                 save_kwargs['compress_level'] = self.config.PNG_COMPRESSION
                 save_kwargs['optimize'] = True
             
-            processed_image.save(variant_path, **save_kwargs)
+            self._save_atomic(processed_image, variant_path, format_name, save_kwargs)
             variants[size_name] = variant_filename
         
         return variants
     
+    def variants_fingerprint(self):
+        """بصمة إعدادات الأحجام والجودة، تحفظ مع كل صورة لمعرفة الصور التي تحتاج إعادة إنشاء أحجامها"""
+        settings = (sorted(self.config.SIZES.items()), self.config.JPEG_QUALITY, self.config.PNG_COMPRESSION)
+        return hashlib.sha1(repr(settings).encode()).hexdigest()[:12]
+    
     def process_uploaded_image(self, file, folder='products'):
         """معالجة الصورة المرفوعة"""
         if not file or file.filename == '':
             return None
+        return self.process_image_stream(file.stream, folder)
+    
+    @staticmethod
+    def content_hash(stream):
+        """بصمة محتوى الملف، تستخدم اسماً له حتى لا تحفظ نفس الصورة مرتين"""
+        digest = hashlib.sha256()
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(64 * 1024), b''):
+            digest.update(chunk)
+        stream.seek(0)
+        return digest.hexdigest()[:32]
+    
+    def shard_path(self, filename):
+        """مسار الملف داخل مجلدات فرعية حسب بصمة الاسم، مثل ab/cd/abcd1234.jpg
         
-        if not self.allowed_file(file.filename):
+        حتى لا يتجمع عشرات الآلاف من الملفات في مجلد واحد
+        """
+        base_name = filename.rsplit('/', 1)[-1]
+        stem = base_name.rsplit('.', 1)[0]
+        # أسماء الصور الجديدة بصمات أصلاً، والأسماء القديمة تحسب بصمتها
+        digest = stem if len(stem) >= 32 and all(c in '0123456789abcdef' for c in stem) \
+            else hashlib.md5(base_name.encode()).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.config.SHARD_DEPTH)]
+        return '/'.join(shards + [base_name])
+    
+    def variant_filenames(self, filename):
+        """أسماء ملفات جميع الأحجام لصورة أصلية"""
+        base_name, ext = filename.rsplit('.', 1)
+        return {
+            size_name: filename if size_name == 'original' else f"{base_name}_{size_name}.{ext.lower()}"
+            for size_name in self.config.SIZES
+        }
+    
+    def process_image_stream(self, stream, folder='products'):
+        """التحقق من الصورة وحفظها بجميع الأحجام، ويعيد أسماء الملفات لكل حجم"""
+        from PIL import ImageOps
+        
+        # التحقق من الحجم والصيغة قبل أي قراءة للصورة
+        if self.stream_size(stream) > self.config.MAX_FILE_SIZE:
+            raise ValueError('حجم الملف أكبر من المسموح به')
+        
+        detected = self.sniff_format(stream)
+        if detected is None:
             raise ValueError('صيغة الملف غير مدعومة')
+        format_name, ext = detected
         
-        # فتح الصورة
+        digest = self.content_hash(stream)
+        image = self.open_image(stream, format_name)
         try:
-            image = Image.open(file.stream)
+            animated = getattr(image, 'is_animated', False)
+            if animated and self.config.ANIMATED_WEBP:
+                # WebP المتحرك أصغر بكثير من GIF بنفس الجودة
+                ext = 'webp'
             
-            # التحقق من حجم الملف
-            file.seek(0, 2)  # الانتقال إلى نهاية الملف
-            file_size = file.tell()
-            file.seek(0)  # العودة إلى بداية الملف
+            # الامتداد من محتوى الملف وليس من الاسم الذي أرسله المستخدم،
+            # والاسم من بصمة المحتوى فتعاد الصورة المكررة دون معالجتها من جديد
+            unique_filename = self.shard_path(f'{digest}.{ext}')
+            variants = self.variant_filenames(unique_filename)
+            upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
+            try:
+                # تحديث زمن التعديل حتى لا يعدها "flask images gc" ملفات قديمة غير مستخدمة
+                for name in variants.values():
+                    os.utime(os.path.join(upload_path, name))
+                return variants
+            except FileNotFoundError:
+                pass
             
-            if file_size > self.config.MAX_FILE_SIZE:
-                raise ValueError('حجم الملف أكبر من المسموح به')
+            if animated:
+                self.strip_metadata(image)
+                return self.save_animated_variants(image, unique_filename, folder)
             
-            # إنشاء اسم فريد للملف
-            original_filename = secure_filename(file.filename)
-            unique_filename = self.generate_unique_filename(original_filename)
+            # تدوير الصورة حسب اتجاه الكاميرا ثم حذف بيانات EXIF وغيرها
+            ImageOps.exif_transpose(image, in_place=True)
+            self.strip_metadata(image)
             
             # حفظ جميع الأحجام
-            variants = self.save_image_variants(image, unique_filename, folder)
-            
-            return variants
+            return self.save_image_variants(image, unique_filename, folder)
             
         except Exception as e:
             current_app.logger.error(f'Error processing image: {str(e)}')
             raise ValueError(f'خطأ في معالجة الصورة: {str(e)}')
+        finally:
+            image.close()
+    
+    def save_animated_variants(self, image, filename, folder, sizes=None):
+        """حفظ صورة متحركة بجميع الأحجام (أو بالأحجام المحددة في sizes فقط) مع إطاراتها كلها
+        
+        الإطارات تصغر دون حشو إلى أبعاد الحجم ودون تكبير، وتعطى لمكتبة الحفظ واحداً تلو الآخر
+        عند طلبها، والأحجام الأكبر من الأصل تنسخ من ملف محفوظ بنفس الأبعاد بدلاً من ترميزها من جديد
+        """
+        from PIL import Image, ImageSequence
+        
+        variants = {}
+        ext = filename.rsplit('.', 1)[1].lower()
+        format_name = Image.registered_extensions()[f'.{ext}']
+        loop = image.info.get('loop', 0)
+        durations = [frame.info.get('duration', 100) for frame in ImageSequence.Iterator(image)]
+        
+        upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
+        os.makedirs(os.path.dirname(os.path.join(upload_path, filename)), exist_ok=True)
+        
+        save_kwargs = {'save_all': True, 'duration': durations, 'loop': loop}
+        if format_name == 'WEBP':
+            # method=0 أسرع بمرتين من 4 لكل إطار، والفرق في الحجم قليل
+            save_kwargs.update(quality=self.config.WEBP_QUALITY, method=0)
+        elif format_name == 'GIF':
+            save_kwargs.update(disposal=2, optimize=True)
+        
+        saved = {}  # الملف المحفوظ لكل أبعاد
+        for size_name, dimensions in self.config.SIZES.items():
+            if sizes is not None and size_name not in sizes:
+                continue
+            
+            target = self.fit_size(image.size, dimensions)
+            variant_filename = self.variant_filenames(filename)[size_name]
+            variant_path = os.path.join(upload_path, variant_filename)
+            if target in saved:
+                self._copy_atomic(saved[target], variant_path)
+            else:
+                frames = self._animated_frames(image, target)
+                first = next(frames)
+                self._save_atomic(first, variant_path, format_name, dict(save_kwargs, append_images=frames))
+                saved[target] = variant_path
+            variants[size_name] = variant_filename
+        
+        return variants
+    
+    @staticmethod
+    def _animated_frames(image, size):
+        """إطارات الصورة المتحركة بالأبعاد المطلوبة، يفك كل إطار ويصغر عند طلبه فقط"""
+        from PIL import Image, ImageSequence
+        
+        for frame in ImageSequence.Iterator(image):
+            frame = frame.convert('RGBA')
+            if frame.size != size:
+                frame = frame.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            yield frame
+    
+    @staticmethod
+    def _write_atomic(path, write):
+        # الكتابة في ملف مؤقت ثم استبداله، فلا يخدم ملف نصف مكتوب أثناء إعادة الإنشاء
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                write(output)
+            os.chmod(tmp_path, 0o644)  # mkstemp ينشئ الملف للمالك فقط
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    
+    @classmethod
+    def _save_atomic(cls, image, path, format_name, save_kwargs):
+        cls._write_atomic(path, lambda output: image.save(output, format=format_name, **save_kwargs))
+    
+    @classmethod
+    def _copy_atomic(cls, source_path, path):
+        def copy(output):
+            with open(source_path, 'rb') as source:
+                shutil.copyfileobj(source, output)
+        cls._write_atomic(path, copy)
+    
+    @staticmethod
+    def strip_metadata(image):
+        """إزالة EXIF (الموقع، الجهاز...) والتعليقات، مع إبقاء ما يلزم لعرض الصورة"""
+        keep = ('transparency', 'icc_profile', 'duration', 'loop', 'background')
+        image.info = {key: value for key, value in image.info.items() if key in keep}
+        image.getexif().clear()
+    
+    def render_derivative(self, source_path, output, size, format_name):
+        """كتابة نسخة من صورة محفوظة بعرض و/أو ارتفاع محدد دون تكبيرها"""
+        from PIL import Image, ImageOps
+        
+        with open(source_path, 'rb') as stream:
+            detected = self.sniff_format(stream)
+            if detected is None:
+                raise ValueError('صيغة الملف غير مدعومة')
+            image = self.open_image(stream, detected[0])
+            
+            with image:
+                # الصور القديمة قد تكون محفوظة دون تدوير، فتحسب الأبعاد كما ستعرض
+                rotated = image.getexif().get(0x0112) in (5, 6, 7, 8)
+                source_size = image.size[::-1] if rotated else image.size
+                width, height = size
+                scales = [1]
+                if width:
+                    scales.append(width / source_size[0])
+                if height:
+                    scales.append(height / source_size[1])
+                scale = min(scales)
+                target = (max(1, round(source_size[0] * scale)), max(1, round(source_size[1] * scale)))
+                
+                # JPEG يمكن فك ضغطه مباشرة بمقياس أصغر (1/2، 1/4، 1/8) فيقل الوقت والذاكرة
+                if detected[0] == 'JPEG':
+                    image.draft('RGB', target[::-1] if rotated else target)
+                ImageOps.exif_transpose(image, in_place=True)
+                
+                derivative = image
+                if derivative.mode not in ('RGB', 'RGBA', 'L'):
+                    has_alpha = 'transparency' in derivative.info or derivative.mode in ('LA', 'PA')
+                    derivative = derivative.convert('RGBA' if has_alpha else 'RGB')
+                if derivative.size != target:
+                    derivative = derivative.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+                
+                save_kwargs = {}
+                if format_name == 'JPEG':
+                    derivative = self.optimize_image(derivative, 'JPEG')
+                    save_kwargs = {'quality': self.config.JPEG_QUALITY, 'optimize': True, 'progressive': True}
+                elif format_name == 'PNG':
+                    save_kwargs = {'compress_level': self.config.PNG_COMPRESSION, 'optimize': True}
+                elif format_name == 'WEBP':
+                    save_kwargs = {'quality': self.config.WEBP_QUALITY, 'method': 4}
+                derivative.save(output, format=format_name, **save_kwargs)
+    
+    def image_metadata(self, filename, folder):
+        """أبعاد الصورة ولونها الغالب وصورة مصغرة جداً (data URI) تعرض مكانها حتى تحمل"""
+        from PIL import Image, ImageFilter, ImageOps
+        
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder, self.resolve(filename, folder))
+        with open(path, 'rb') as stream:
+            detected = self.sniff_format(stream)
+            if detected is None:
+                raise ValueError('صيغة الملف غير مدعومة')
+            image = self.open_image(stream, detected[0])
+            
+            with image:
+                # الأبعاد كما تعرض، فالصور القديمة قد تكون محفوظة دون تدوير
+                rotated = image.getexif().get(0x0112) in (5, 6, 7, 8)
+                width, height = image.size
+                scale = min(self.config.PLACEHOLDER_SIZE / width, self.config.PLACEHOLDER_SIZE / height, 1)
+                target = (max(1, round(width * scale)), max(1, round(height * scale)))
+                
+                # فك ضغط JPEG بأصغر مقياس ممكن يكفي لصورة بهذا الحجم
+                if detected[0] == 'JPEG':
+                    image.draft('RGB', target)
+                small = image.resize(target, Image.Resampling.BOX, reducing_gap=2.0)
+                small.info = {key: value for key, value in image.info.items() if key == 'transparency'}
+                small.getexif()[0x0112] = image.getexif().get(0x0112, 1)
+                small = ImageOps.exif_transpose(small)
+        
+        if small.mode in ('P', 'PA'):
+            small = small.convert('RGBA')
+        small = self.optimize_image(small, 'JPEG')
+        red, green, blue = small.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+        
+        # WebP بهذا الحجم أقل من 100 بايت، بينما ترويسة JPEG وحدها حوالي 600 بايت
+        buffer = BytesIO()
+        small.filter(ImageFilter.GaussianBlur(1)).save(buffer, 'WEBP', quality=self.config.PLACEHOLDER_QUALITY)
+        return {
+            'width': height if rotated else width,
+            'height': width if rotated else height,
+            'dominant_color': f'#{red:02x}{green:02x}{blue:02x}',
+            'placeholder': 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'),
+        }
     
     def get_image_url(self, filename, folder, size='medium'):
         """الحصول على رابط الصورة بالحجم المطلوب"""
         if not filename or filename == 'default_product.jpg':
             return None
         
-        base_name = filename.rsplit('.', 1)[0]
-        ext = filename.rsplit('.', 1)[1].lower()
-        
-        if size == 'original':
-            image_filename = filename
-        else:
-            image_filename = f"{base_name}_{size}.{ext}"
-        
+        image_filename = self.variant_filenames(self.resolve(filename, folder))[size]
         return f"uploads/{folder}/{image_filename}"
     
+    def resolve(self, filename, folder):
+        """مسار الصورة الفعلي: الأسماء القديمة بلا مجلدات فرعية قد تكون نقلت إلى مجلدها المقسم"""
+        if '/' in filename or not self.config.SHARD_DEPTH:
+            return filename
+        if os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], folder, filename)):
+            return filename
+        return self.shard_path(filename)
+    
     def delete_image_variants(self, filename, folder):
         """حذف جميع أحجام الصورة"""
         try:
-            base_name = filename.rsplit('.', 1)[0]
-            ext = filename.rsplit('.', 1)[1].lower()
-            
             upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
             
             # حذف جميع الأحجام
-            for size_name in self.config.SIZES.keys():
-                if size_name == 'original':
-                    variant_filename = filename
-                else:
-                    variant_filename = f"{base_name}_{size_name}.{ext}"
-                
+            for variant_filename in self.variant_filenames(self.resolve(filename, folder)).values():
                 variant_path = os.path.join(upload_path, variant_filename)
                 if os.path.exists(variant_path):
                     os.remove(variant_path)
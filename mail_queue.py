@@ -0,0 +1,179 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from extensions import db, mail
+from models import OutgoingEmail
+
+
+class MailQueue:
+    """طابور بريد صادر محفوظ في قاعدة البيانات ويرسل في الخلفية"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.use_worker = app.config.get('MAIL_QUEUE_WORKER', True)
+        self.batch_size = app.config.get('MAIL_QUEUE_BATCH_SIZE', 20)
+        self.rate_limit = app.config.get('MAIL_QUEUE_RATE_LIMIT', 60)
+        self.max_attempts = app.config.get('MAIL_QUEUE_MAX_ATTEMPTS', 5)
+        self.retry_delay = app.config.get('MAIL_QUEUE_RETRY_DELAY', 30)
+        self.poll_interval = app.config.get('MAIL_QUEUE_POLL_INTERVAL', 10)
+        self.claim_timeout = app.config.get('MAIL_QUEUE_CLAIM_TIMEOUT', 600)
+        app.cli.add_command(send_mail_command)
+        if self.use_worker:
+            # رسائل بقيت في الطابور قبل إعادة التشغيل ترسل دون انتظار رسالة جديدة
+            app.before_request(self._start_on_first_request)
+
+    def enqueue(self, subject, recipients, body=None, html=None, sender=None):
+        """إضافة رسالة إلى الطابور ضمن المعاملة الحالية، تحفظ مع أول commit"""
+        email = OutgoingEmail(
+            subject=subject,
+            recipients=','.join(recipients),
+            body=body,
+            html=html,
+            sender=sender
+        )
+        db.session.add(email)
+        return email
+
+    def notify(self):
+        """إيقاظ المرسل بعد حفظ رسائل جديدة"""
+        if not self.use_worker:
+            return
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def _start_on_first_request(self):
+        if self._thread is None:
+            self.notify()
+
+    def _ensure_worker(self):
+        # يبدأ المرسل مع أول طلب أو أول رسالة، لا عند الاستيراد، حتى لا تنشئ أوامر CLI
+        # أو العملية الأم في gunicorn --preload خيوطاً غير لازمة
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mail-queue', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    # الاستمرار ما دامت الدفعات ممتلئة
+                    while self.send_pending() >= self.batch_size:
+                        pass
+                except Exception as e:
+                    self.app.logger.error(f'Error in mail queue worker: {str(e)}')
+                finally:
+                    db.session.remove()
+
+    def _claim_batch(self):
+        """حجز دفعة من الرسائل المستحقة حتى لا يرسلها عامل آخر"""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.claim_timeout)
+
+        candidates = db.session.query(
+            OutgoingEmail.id, OutgoingEmail.status, OutgoingEmail.next_attempt_at
+        ).filter(db.or_(
+            db.and_(OutgoingEmail.status == 'pending', OutgoingEmail.next_attempt_at <= now),
+            # رسائل حجزها عامل توقف قبل إنهائها
+            db.and_(OutgoingEmail.status == 'sending', OutgoingEmail.next_attempt_at <= stale)
+        )).order_by(OutgoingEmail.next_attempt_at).limit(self.batch_size).all()
+
+        claimed = []
+        for email_id, status, next_attempt_at in candidates:
+            result = db.session.execute(
+                db.update(OutgoingEmail)
+                .where(OutgoingEmail.id == email_id,
+                       OutgoingEmail.status == status,
+                       OutgoingEmail.next_attempt_at == next_attempt_at)
+                .values(status='sending', next_attempt_at=now)
+            )
+            if result.rowcount == 1:
+                claimed.append(email_id)
+        db.session.commit()
+
+        if not claimed:
+            return []
+        return OutgoingEmail.query.filter(OutgoingEmail.id.in_(claimed)).all()
+
+    def _mark_failed(self, email, error):
+        email.attempts = (email.attempts or 0) + 1
+        email.last_error = str(error)
+        if email.attempts >= self.max_attempts:
+            email.status = 'failed'
+        else:
+            email.status = 'pending'
+            delay = self.retry_delay * 2 ** (email.attempts - 1)
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    def send_pending(self):
+        """إرسال دفعة واحدة عبر اتصال SMTP واحد، وإرجاع عدد الرسائل المحجوزة"""
+        emails = self._claim_batch()
+        if not emails:
+            return 0
+
+        from flask_mail import Message  # استيراد مؤجل حتى أول رسالة
+
+        interval = 60.0 / self.rate_limit if self.rate_limit else 0
+        try:
+            with mail.connect() as connection:
+                for email in emails:
+                    started = time.monotonic()
+                    try:
+                        connection.send(Message(
+                            subject=email.subject,
+                            recipients=email.get_recipients(),
+                            body=email.body,
+                            html=email.html,
+                            sender=email.sender
+                        ))
+                        email.status = 'sent'
+                        email.sent_at = datetime.utcnow()
+                    except Exception as e:
+                        self._mark_failed(email, e)
+                    db.session.commit()
+
+                    # احترام الحد الأقصى لعدد الرسائل في الدقيقة
+                    remaining = interval - (time.monotonic() - started)
+                    if remaining > 0:
+                        time.sleep(remaining)
+        except Exception as e:
+            # تعذر الاتصال بالخادم: إعادة جدولة ما لم يرسل
+            db.session.rollback()
+            for email in emails:
+                if email.status == 'sending':
+                    self._mark_failed(email, e)
+            db.session.commit()
+            self.app.logger.error(f'Error connecting to mail server: {str(e)}')
+
+        return len(emails)
+
+
+@click.command('send-mail')
+@with_appcontext
+def send_mail_command():
+    """إرسال جميع الرسائل المستحقة في طابور البريد"""
+    total = 0
+    while True:
+        sent = mail_queue.send_pending()
+        total += sent
+        if sent < mail_queue.batch_size:
+            break
+    click.echo(f'Processed {total} queued emails')
+
+
+# إنشاء نسخة من الخدمة
+mail_queue = MailQueue()
@@ -0,0 +1,62 @@
+"""order tracking numbers and status history
+
+Revision ID: 0004_order_tracking
+Revises: 0003_order_event
+Create Date: 2026-10-19 12:30:00
+
+"""
+import secrets
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_order_tracking'
+down_revision = '0003_order_event'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tracking_number', sa.String(length=20), nullable=True))
+        batch_op.create_index('ix_order_tracking_lookup', ['tracking_number', 'customer_email', 'id', 'status', 'order_date'], unique=False)
+
+    op.create_table('order_status_history',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_status_history', schema=None) as batch_op:
+        batch_op.create_index('ix_order_status_history_order', ['order_id', 'created_at', 'status'], unique=False)
+
+    # الطلبات السابقة: رقم تتبع بنفس صيغة OrderTracking.generate_tracking_number وحالتها الحالية كأول سجل
+    order = sa.table('order', sa.column('id', sa.Integer), sa.column('tracking_number', sa.String),
+                     sa.column('status', sa.String), sa.column('order_date', sa.DateTime))
+    history = sa.table('order_status_history', sa.column('order_id', sa.Integer),
+                       sa.column('status', sa.String), sa.column('created_at', sa.DateTime))
+    connection = op.get_bind()
+    order_ids = connection.execute(sa.select(order.c.id).where(order.c.tracking_number.is_(None))).scalars().all()
+    for order_id in order_ids:
+        connection.execute(
+            order.update().where(order.c.id == order_id)
+            .values(tracking_number=f'AB{secrets.token_hex(8).upper()}')
+        )
+    connection.execute(history.insert().from_select(
+        ['order_id', 'status', 'created_at'],
+        sa.select(order.c.id, sa.func.coalesce(order.c.status, 'pending'), order.c.order_date)
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('order_status_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_status_history_order')
+
+    op.drop_table('order_status_history')
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_tracking_lookup')
+        batch_op.drop_column('tracking_number')
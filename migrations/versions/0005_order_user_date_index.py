@@ -0,0 +1,26 @@
+"""index for cursor-paginated account order history
+
+Revision ID: 0005_order_user_date_index
+Revises: 0004_order_tracking
+Create Date: 2026-10-19 12:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_order_user_date_index'
+down_revision = '0004_order_tracking'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_user_date', ['user_id', 'order_date', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_user_date')
@@ -0,0 +1,26 @@
+"""user.version for session identity invalidation
+
+Revision ID: 0006_user_version
+Revises: 0005_order_user_date_index
+Create Date: 2026-10-19 12:50:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_user_version'
+down_revision = '0005_order_user_date_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,42 @@
+"""updated_at on product and offer for catalog ETags
+
+Revision ID: 0008_updated_at
+Revises: 0007_password_hash_length
+Create Date: 2026-10-19 13:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_updated_at'
+down_revision = '0007_password_hash_length'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_product_updated_at'), ['updated_at'], unique=False)
+
+    with op.batch_alter_table('offer', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # نسخة أولية للصفوف الحالية حتى لا تكون ETag مبنية على NULL
+    for name in ('product', 'offer'):
+        table = sa.table(name, sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+        op.execute(
+            table.update().where(table.c.updated_at.is_(None))
+            .values(updated_at=sa.func.coalesce(table.c.created_at, sa.func.current_timestamp()))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('offer', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_updated_at'))
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,33 @@
+"""product image dimensions and blurred placeholders
+
+Revision ID: 0009_product_image_metadata
+Revises: 0008_updated_at
+Create Date: 2026-10-19 13:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_product_image_metadata'
+down_revision = '0008_updated_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # الصفوف الحالية تملأ بالأمر "flask images describe"
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('width', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('height', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('dominant_color', sa.String(length=7), nullable=True))
+        batch_op.add_column(sa.Column('placeholder', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.drop_column('placeholder')
+        batch_op.drop_column('dominant_color')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
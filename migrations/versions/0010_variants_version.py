@@ -0,0 +1,33 @@
+"""variants_version fingerprint on product images and offers
+
+Revision ID: 0010_variants_version
+Revises: 0009_product_image_metadata
+Create Date: 2026-10-19 13:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_variants_version'
+down_revision = '0009_product_image_metadata'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # NULL يعني أحجاماً قديمة، فيعيد "flask images rebuild" إنشاءها
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variants_version', sa.String(length=12), nullable=True))
+
+    with op.batch_alter_table('offer', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variants_version', sa.String(length=12), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('offer', schema=None) as batch_op:
+        batch_op.drop_column('variants_version')
+
+    with op.batch_alter_table('product_image', schema=None) as batch_op:
+        batch_op.drop_column('variants_version')
@@ -0,0 +1,71 @@
+"""product variants (size/colour SKUs) with per-variant stock
+
+Revision ID: 0011_product_variants
+Revises: 0010_variants_version
+Create Date: 2026-10-19 13:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_product_variants'
+down_revision = '0010_variants_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_variant',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('sku', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.String(length=20), nullable=True),
+    sa.Column('color', sa.String(length=30), nullable=True),
+    sa.Column('stock', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('price_delta', sa.Float(), server_default='0', nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'size', 'color', name='uq_product_variant_options'),
+    sa.UniqueConstraint('sku')
+    )
+    with op.batch_alter_table('product_variant', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_variant_product_id'), ['product_id'], unique=False)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_active_stock', ['is_active', 'stock'], unique=False)
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variant_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_cart_variant_id_product_variant', 'product_variant',
+                                    ['variant_id'], ['id'], ondelete='CASCADE')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('variant_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('sku', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('variant_label', sa.String(length=60), nullable=True))
+        batch_op.create_foreign_key('fk_order_item_variant_id_product_variant', 'product_variant',
+                                    ['variant_id'], ['id'], ondelete='SET NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_order_item_variant_id_product_variant', type_='foreignkey')
+        batch_op.drop_column('variant_label')
+        batch_op.drop_column('sku')
+        batch_op.drop_column('variant_id')
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_cart_variant_id_product_variant', type_='foreignkey')
+        batch_op.drop_column('variant_id')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_active_stock')
+
+    with op.batch_alter_table('product_variant', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_variant_product_id'))
+
+    op.drop_table('product_variant')
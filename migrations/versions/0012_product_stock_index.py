@@ -0,0 +1,28 @@
+"""index product.stock alone for the admin stock filter
+
+Revision ID: 0012_product_stock_index
+Revises: 0011_product_variants
+Create Date: 2026-10-19 15:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_product_stock_index'
+down_revision = '0011_product_variants'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_active_stock')
+        batch_op.create_index(batch_op.f('ix_product_stock'), ['stock'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_stock'))
+        batch_op.create_index('ix_product_active_stock', ['is_active', 'stock'], unique=False)
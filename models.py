@@ -1,7 +1,7 @@
 from extensions import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+from password_policy import password_policy
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,7 +9,7 @@ class User(db.Model, UserMixin):
     last_name = db.Column(db.String(50), nullable=False)
     username = db.Column(db.String(20), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))
     is_admin = db.Column(db.Boolean, default=False)
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
@@ -20,6 +20,8 @@ class User(db.Model, UserMixin):
     work_country = db.Column(db.String(100))
     work_phone = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # يزداد عند تعديل الاسم أو الصلاحيات لإبطال الهوية المخزنة في الجلسات
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     # العلاقات
     cart_items = db.relationship('Cart', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -29,10 +31,15 @@ class User(db.Model, UserMixin):
         return f'<User {self.username}>'
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_policy.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not password_policy.verify(self.password_hash, password):
+            return False
+        # إعادة التشفير بالإعدادات الحالية إذا تغيرت السياسة (يحفظ مع commit التالي)
+        if password_policy.needs_rehash(self.password_hash):
+            self.password_hash = password_policy.hash(password)
+        return True
     
     def get_full_name(self):
         return f'{self.first_name} {self.last_name}'
@@ -43,6 +50,13 @@ class ProductImage(db.Model):
     image_url = db.Column(db.String(255), nullable=False)
     is_primary = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # تحسب عند المعالجة حتى تحجز القوالب مكان الصورة وتعرض بديلاً مموهاً قبل تحميلها
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    dominant_color = db.Column(db.String(7))
+    placeholder = db.Column(db.Text)  # data URI لصورة WebP صغيرة جداً
+    # بصمة إعدادات الأحجام التي أنشئت بها الملفات (ImageService.variants_fingerprint)
+    variants_version = db.Column(db.String(12))
 
     product = db.relationship('Product', backref=db.backref('images', lazy=True, cascade='all, delete-orphan'))
     
@@ -52,14 +66,20 @@ class Product(db.Model):
     description = db.Column(db.Text)
     price = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(50))
-    stock = db.Column(db.Integer, default=0)
+    # للمنتجات ذات المتغيرات: مجموع مخزون المتغيرات النشطة، يحدث مع كل تغيير عليها
+    # (مفهرس لتصفية المخزون في لوحة التحكم)
+    stock = db.Column(db.Integer, default=0, index=True)
     discount = db.Column(db.Float, default=0.0)  # تأكد من وجود هذا الحقل
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # يتغير مع أي تعديل على المنتج أو صوره، ويستخدم في ETag لصفحات الكتالوج
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # العلاقات
     carts = db.relationship('Cart', backref='product', lazy=True, cascade='all, delete-orphan')
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
+    variants = db.relationship('ProductVariant', backref='product', lazy=True,
+                               cascade='all, delete-orphan', order_by='ProductVariant.id')
     
     def __repr__(self):
         return f'<Product {self.name}>'
@@ -85,26 +105,99 @@ class Product(db.Model):
     @property
     def primary_image(self):
         """الحصول على الصورة الأساسية"""
+        image = self.main_image
+        return image.image_url if image else 'default_product.jpg'
+    
+    @property
+    def main_image(self):
+        """سجل الصورة الأساسية (أو أول صورة) مع أبعادها، أو None"""
         if self.images:
-            primary = next((img for img in self.images if img.is_primary), None)
-            if primary:
-                return primary.image_url
-            return self.images[0].image_url
-        return 'default_product.jpg'
+            return next((img for img in self.images if img.is_primary), self.images[0])
+        return None
     
     
+class ProductVariant(db.Model):
+    """مقاس/لون من المنتج برمز SKU ومخزون خاص به"""
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'size', 'color', name='uq_product_variant_options'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False, index=True)
+    sku = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.String(20))
+    color = db.Column(db.String(30))
+    stock = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    price_delta = db.Column(db.Float, nullable=False, default=0.0, server_default='0')  # يضاف إلى سعر المنتج
+    is_active = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    cart_items = db.relationship('Cart', backref='variant', lazy=True, cascade='all, delete-orphan')
+    # عناصر الطلبات تحتفظ بنسخة من SKU والوصف، فحذف المتغير يفرغ variant_id فقط
+    order_items = db.relationship('OrderItem', backref='variant', lazy=True)
+
+    def __repr__(self):
+        return f'<ProductVariant {self.sku}>'
+
+    def get_label(self):
+        return ' / '.join(value for value in (self.size, self.color) if value) or self.sku
+
+    def get_price(self):
+        return self.product.price + (self.price_delta or 0)
+
+    def get_display_price(self):
+        return f'{self.get_price():.2f}'
+
+    def is_in_stock(self):
+        return self.is_active and self.stock > 0
+
+
+@db.event.listens_for(ProductVariant, 'after_insert')
+@db.event.listens_for(ProductVariant, 'after_update')
+@db.event.listens_for(ProductVariant, 'after_delete')
+def refresh_product_stock(mapper, connection, target):
+    """إعادة حساب مخزون المنتج من متغيراته حتى تقرأ القوائم عموداً واحداً مفهرساً"""
+    total = db.select(db.func.coalesce(db.func.sum(ProductVariant.stock), 0)).where(
+        ProductVariant.product_id == target.product_id, ProductVariant.is_active.is_(True)
+    ).scalar_subquery()
+    connection.execute(
+        db.update(Product).where(Product.id == target.product_id).values(stock=total, updated_at=datetime.utcnow())
+    )
+
+@db.event.listens_for(ProductImage, 'after_insert')
+@db.event.listens_for(ProductImage, 'after_update')
+@db.event.listens_for(ProductImage, 'after_delete')
+def touch_product(mapper, connection, target):
+    """تحديث updated_at للمنتج عند تغيير صوره حتى تتغير نسخة صفحته"""
+    connection.execute(
+        db.update(Product).where(Product.id == target.product_id).values(updated_at=datetime.utcnow())
+    )
+
 class Cart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id', ondelete='CASCADE'))
     quantity = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Cart {self.user_id} - {self.product_id}>'
     
+    def needs_variant(self):
+        """عنصر أضيف بلا متغير ثم أضيفت للمنتج مقاسات وألوان، فلا يمكن حجزه حتى يختار المستخدم متغيراً"""
+        return self.variant_id is None and bool(self.product.variants)
+    
+    def get_available_stock(self):
+        if self.variant:
+            return self.variant.stock if self.variant.is_active else 0
+        return 0 if self.needs_variant() else self.product.stock
+    
+    def get_unit_price(self):
+        return self.variant.get_price() if self.variant else self.product.price
+    
     def get_total_price(self):
-        return self.product.price * self.quantity
+        return self.get_unit_price() * self.quantity
     
     def get_display_total_price(self):
         return f'{self.get_total_price():.2f}'
@@ -117,16 +210,19 @@ class Offer(db.Model):
     original_price = db.Column(db.Float, nullable=False)
     offer_price = db.Column(db.Float, nullable=False)
     image = db.Column(db.String(100), default='default_offer.jpg')
+    variants_version = db.Column(db.String(12))
     start_date = db.Column(db.DateTime, default=datetime.utcnow)
     end_date = db.Column(db.DateTime, default=datetime.utcnow() + timedelta(days=7))
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f"Offer('{self.title}', '{self.discount_percentage}%')"
     
     def is_active_now(self):
-        now = datetime.utcnow()
+        # نفس الساعة المستخدمة في جدولة العروض وفي نموذج إدخال التواريخ
+        now = datetime.now()
         return self.is_active and self.start_date <= now <= self.end_date
     
     def get_display_original_price(self):
@@ -151,6 +247,23 @@ class ContactMessage(db.Model):
         return self.created_at.strftime('%Y-%m-%d %H:%M')
 
 class Order(db.Model):
+    __table_args__ = (
+        # فهرس يغطي استعلام تتبع الطلب دون قراءة صف الطلب نفسه
+        db.Index('ix_order_tracking_lookup', 'tracking_number', 'customer_email', 'id', 'status', 'order_date'),
+        # سجل طلبات المستخدم مرتب حسب التاريخ
+        db.Index('ix_order_user_date', 'user_id', 'order_date', 'id'),
+    )
+
+    STATUSES = {
+        'pending': 'قيد الانتظار',
+        'processing': 'قيد المعالجة',
+        'shipped': 'تم الشحن',
+        'delivered': 'تم التوصيل',
+        'cancelled': 'ملغي'
+    }
+    # حالات لا تتغير بعدها، فلا حاجة لمتابعة الطلب مباشرة
+    FINAL_STATUSES = ('delivered', 'cancelled')
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -161,6 +274,7 @@ class Order(db.Model):
     customer_name = db.Column(db.String(100))
     customer_email = db.Column(db.String(120))
     customer_phone = db.Column(db.String(20))
+    tracking_number = db.Column(db.String(20))  # مفهرس ضمن ix_order_tracking_lookup
     
     # العلاقة مع العناصر
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
@@ -169,14 +283,7 @@ class Order(db.Model):
         return f'<Order {self.id} - {self.user_id}>'
     
     def get_status_display(self):
-        statuses = {
-            'pending': 'قيد الانتظار',
-            'processing': 'قيد المعالجة',
-            'shipped': 'تم الشحن',
-            'delivered': 'تم التوصيل',
-            'cancelled': 'ملغي'
-        }
-        return statuses.get(self.status, self.status)
+        return self.STATUSES.get(self.status, self.status)
     
     def get_order_date(self):
         return self.order_date.strftime('%Y-%m-%d %H:%M')
@@ -184,10 +291,27 @@ class Order(db.Model):
     def get_display_total_amount(self):
         return f'{self.total_amount:.2f}'
 
+class OrderStatusHistory(db.Model):
+    __table_args__ = (
+        db.Index('ix_order_status_history_order', 'order_id', 'created_at', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<OrderStatusHistory {self.order_id} - {self.status}>'
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id', ondelete='SET NULL'))
+    # نسخة وقت الطلب، تبقى صحيحة بعد تعديل المتغير أو حذفه
+    sku = db.Column(db.String(64))
+    variant_label = db.Column(db.String(60))
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     
@@ -201,4 +325,41 @@ class OrderItem(db.Model):
         return f'{self.price:.2f}'
     
     def get_display_total_price(self):
-        return f'{self.get_total_price():.2f}'
\ No newline at end of file
+        return f'{self.get_total_price():.2f}'
+
+
+class OutgoingEmail(db.Model):
+    __table_args__ = (
+        db.Index('ix_outgoing_email_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # مفصولة بفواصل
+    sender = db.Column(db.String(120))
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    status = db.Column(db.String(20), default='pending')  # pending / sending / sent / failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<OutgoingEmail {self.id} - {self.status}>'
+
+    def get_recipients(self):
+        return [email.strip() for email in self.recipients.split(',') if email.strip()]
+
+class OrderEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    event_type = db.Column(db.String(30), nullable=False)  # order_created / order_status_changed
+    payload = db.Column(db.Text)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    dispatched_at = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return f'<OrderEvent {self.event_type} - Order {self.order_id}>'
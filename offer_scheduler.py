@@ -0,0 +1,85 @@
+import bisect
+import threading
+from datetime import datetime
+
+from extensions import db
+from models import Offer
+
+
+class OfferScheduler:
+    """جدولة العروض في الذاكرة بدلاً من الاستعلام عنها في كل طلب"""
+
+    def __init__(self, app=None, clock=datetime.now):
+        self.clock = clock
+        self.max_age = 300
+        self._lock = threading.Lock()
+        self._offers = None      # العروض المحملة مرتبة حسب تاريخ البدء
+        self._starts = []        # تواريخ البدء المرتبة للبحث الثنائي
+        self._active = []
+        self._boundary = None    # أقرب لحظة تتغير فيها قائمة العروض النشطة
+        self._loaded_at = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_age = app.config.get('OFFER_CACHE_MAX_AGE', 300)
+
+    def invalidate(self):
+        """إلغاء الذاكرة المؤقتة بعد أي تعديل على العروض"""
+        with self._lock:
+            self._offers = None
+
+    def _load(self, now):
+        """تحميل العروض غير المنتهية من قاعدة البيانات مرة واحدة"""
+        offers = Offer.query.filter(
+            Offer.is_active.is_(True),
+            Offer.end_date >= now
+        ).order_by(Offer.start_date, Offer.id).all()
+
+        # فصل الكائنات عن الجلسة حتى يمكن مشاركتها بين الطلبات
+        for offer in offers:
+            db.session.expunge(offer)
+
+        self._offers = offers
+        self._starts = [offer.start_date for offer in offers]
+        self._loaded_at = now
+
+    def _rebuild(self, now):
+        """حساب العروض النشطة وأقرب حد زمني قادم دون الرجوع لقاعدة البيانات"""
+        started = bisect.bisect_right(self._starts, now)
+        active = [offer for offer in self._offers[:started] if offer.end_date >= now]
+
+        boundaries = [offer.end_date for offer in active]
+        if started < len(self._starts):
+            boundaries.append(self._starts[started])
+
+        self._active = active
+        self._boundary = min(boundaries) if boundaries else None
+
+    def _refresh(self, now):
+        if self._offers is None or not 0 <= (now - self._loaded_at).total_seconds() < self.max_age:
+            self._load(now)
+            self._rebuild(now)
+        elif self._boundary is not None and now >= self._boundary:
+            self._rebuild(now)
+
+    def active_offers(self):
+        """العروض النشطة في هذه اللحظة"""
+        now = self.clock()
+        with self._lock:
+            self._refresh(now)
+            return list(self._active)
+
+    def seconds_until_change(self):
+        """عدد الثواني حتى يتغير محتوى صفحة العروض"""
+        now = self.clock()
+        with self._lock:
+            self._refresh(now)
+            remaining = self.max_age - (now - self._loaded_at).total_seconds()
+            if self._boundary is not None:
+                remaining = min(remaining, (self._boundary - now).total_seconds())
+        return max(int(remaining), 0)
+
+
+# إنشاء نسخة من الخدمة
+offer_scheduler = OfferScheduler()
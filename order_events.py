@@ -0,0 +1,230 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import render_template
+
+from extensions import db
+from mail_queue import mail_queue
+from models import Order, OrderEvent
+
+
+class OrderEventPipeline:
+    """نشر أحداث الطلبات إلى البريد الإلكتروني وإلى بث SSE للعملاء"""
+
+    EMAILS = {
+        'order_created': ('emails/order_created.html', 'تأكيد طلبك رقم #{order_id}'),
+        'order_status_changed': ('emails/order_status_changed.html', 'تحديث حالة طلبك رقم #{order_id}'),
+    }
+
+    def __init__(self, app=None):
+        self.app = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._subscribers = {}   # user_id -> مجموعة طوابير المشتركين في هذا العامل
+        self._subscribers_lock = threading.Lock()
+        self._last_seen_id = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.use_worker = app.config.get('ORDER_EVENTS_WORKER', True)
+        self.poll_interval = app.config.get('ORDER_EVENTS_POLL_INTERVAL', 30)
+        self.stream_poll_interval = app.config.get('ORDER_EVENTS_STREAM_POLL_INTERVAL', 2)
+        self.keepalive = app.config.get('ORDER_EVENTS_KEEPALIVE', 15)
+        self.stream_enabled = app.config.get('ORDER_EVENTS_STREAM', True)
+        self.stream_max_age = app.config.get('ORDER_EVENTS_STREAM_MAX_AGE', 300)
+        self.stream_retry = app.config.get('ORDER_EVENTS_STREAM_RETRY', 10000)
+
+    def record(self, order, event_type):
+        """تسجيل الحدث في نفس معاملة تعديل الطلب"""
+        payload = {
+            'order_id': order.id,
+            'status': order.status,
+            'status_display': order.get_status_display(),
+            'total_amount': order.total_amount,
+        }
+        event = OrderEvent(
+            order_id=order.id,
+            user_id=order.user_id,
+            event_type=event_type,
+            payload=json.dumps(payload, ensure_ascii=False)
+        )
+        db.session.add(event)
+        return event
+
+    def notify(self):
+        """إيقاظ الناشر بعد حفظ أحداث جديدة"""
+        if not self.use_worker:
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='order-events', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _has_subscribers(self):
+        with self._subscribers_lock:
+            return bool(self._subscribers)
+
+    def _run(self):
+        while True:
+            interval = self.stream_poll_interval if self._has_subscribers() else self.poll_interval
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.dispatch_pending()
+                    self._tail()
+                except Exception as e:
+                    self.app.logger.error(f'Error in order events worker: {str(e)}')
+                finally:
+                    db.session.remove()
+
+    # البريد الإلكتروني
+
+    def _enqueue_email(self, event):
+        template, subject = self.EMAILS[event.event_type]
+        order = db.session.get(Order, event.order_id)
+        if order is None:
+            return
+
+        recipient = order.customer_email or order.user.email
+        html = render_template(template, order=order, event=json.loads(event.payload))
+        mail_queue.enqueue(
+            subject=subject.format(order_id=order.id),
+            recipients=[recipient],
+            body=f'حالة الطلب #{order.id}: {order.get_status_display()}',
+            html=html
+        )
+
+    def dispatch_pending(self, limit=50):
+        """تحويل الأحداث الجديدة إلى رسائل بريد، مرة واحدة فقط عبر جميع العمال"""
+        events = OrderEvent.query.filter(
+            OrderEvent.dispatched_at.is_(None)
+        ).order_by(OrderEvent.id).limit(limit).all()
+
+        dispatched = 0
+        for event in events:
+            # حجز الحدث ووضع البريد في الطابور ضمن نفس المعاملة
+            result = db.session.execute(
+                db.update(OrderEvent)
+                .where(OrderEvent.id == event.id, OrderEvent.dispatched_at.is_(None))
+                .values(dispatched_at=datetime.utcnow())
+            )
+            if result.rowcount == 1:
+                self._enqueue_email(event)
+                dispatched += 1
+        db.session.commit()
+
+        if dispatched:
+            mail_queue.notify()
+        return dispatched
+
+    # البث المباشر (Server-Sent Events)
+
+    def _tail(self):
+        """نشر الأحداث الجديدة للمشتركين المتصلين بهذا العامل"""
+        with self._subscribers_lock:
+            user_ids = list(self._subscribers)
+        if not user_ids:
+            # لا حاجة لتتبع الأحداث دون مشتركين
+            self._last_seen_id = None
+            return
+
+        if self._last_seen_id is None:
+            self._last_seen_id = db.session.query(db.func.max(OrderEvent.id)).scalar() or 0
+            return
+
+        rows = db.session.query(
+            OrderEvent.id, OrderEvent.user_id, OrderEvent.event_type, OrderEvent.payload
+        ).filter(
+            OrderEvent.id > self._last_seen_id,
+            OrderEvent.user_id.in_(user_ids)
+        ).order_by(OrderEvent.id).all()
+
+        for event_id, user_id, event_type, payload in rows:
+            with self._subscribers_lock:
+                queues = list(self._subscribers.get(user_id, ()))
+            for subscriber in queues:
+                try:
+                    subscriber.put_nowait((event_id, event_type, payload))
+                except queue.Full:
+                    pass
+            self._last_seen_id = event_id
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=100)
+        with self._subscribers_lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        self.notify()
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._subscribers_lock:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(subscriber)
+                if not queues:
+                    del self._subscribers[user_id]
+
+    def should_stream(self, user_id):
+        """البث مفعل وللمستخدم طلبات لم تصل إلى حالة نهائية"""
+        if not self.stream_enabled:
+            return False
+        return db.session.query(
+            Order.query.filter(
+                Order.user_id == user_id, Order.status.notin_(Order.FINAL_STATUSES)
+            ).exists()
+        ).scalar()
+
+    def _missed_events(self, user_id, last_event_id, limit=100):
+        """أحداث فاتت المتصفح بين انتهاء الاتصال السابق وإعادة الاتصال"""
+        with self.app.app_context():
+            try:
+                return db.session.query(
+                    OrderEvent.id, OrderEvent.event_type, OrderEvent.payload
+                ).filter(
+                    OrderEvent.user_id == user_id, OrderEvent.id > last_event_id
+                ).order_by(OrderEvent.id).limit(limit).all()
+            finally:
+                db.session.remove()
+
+    def stream(self, user_id, last_event_id=None):
+        """مولد استجابة text/event-stream لأحداث طلبات المستخدم
+
+        ينتهي بعد stream_max_age حتى لا يحجز العامل إلى ما لا نهاية، ويكمل المتصفح
+        من Last-Event-ID عند إعادة الاتصال
+        """
+        subscriber = self.subscribe(user_id)
+        deadline = time.monotonic() + self.stream_max_age
+        try:
+            yield f'retry: {self.stream_retry}\n\n'
+            sent_id = last_event_id or 0
+            if last_event_id is not None:
+                for event_id, event_type, payload in self._missed_events(user_id, last_event_id):
+                    yield f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+                    sent_id = event_id
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event_id, event_type, payload = subscriber.get(timeout=min(self.keepalive, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                # قد يصل الحدث نفسه من الأحداث الفائتة ومن المتابعة معاً
+                if event_id > sent_id:
+                    yield f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+                    sent_id = event_id
+        finally:
+            self.unsubscribe(user_id, subscriber)
+
+
+# إنشاء نسخة من الخدمة
+order_events = OrderEventPipeline()
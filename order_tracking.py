@@ -0,0 +1,95 @@
+import secrets
+
+from extensions import db
+from models import Order, OrderStatusHistory
+from ttl_cache import TTLCache
+
+_MISSING = object()
+
+
+class OrderTracking:
+    """تتبع الطلبات برقم التتبع والبريد الإلكتروني"""
+
+    def __init__(self, app=None):
+        self.cache = TTLCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.cache = TTLCache(
+            ttl=app.config.get('TRACKING_CACHE_TTL', 30),
+            maxsize=app.config.get('TRACKING_CACHE_SIZE', 4096)
+        )
+
+    @staticmethod
+    def generate_tracking_number():
+        """إنشاء رقم تتبع عشوائي (64 بت) يكفي لتجنب التكرار عملياً"""
+        return f"AB{secrets.token_hex(8).upper()}"
+
+    @staticmethod
+    def record_status(order):
+        """إضافة الحالة الحالية إلى سجل الطلب ضمن المعاملة الحالية"""
+        history = OrderStatusHistory(order_id=order.id, status=order.status)
+        db.session.add(history)
+        return history
+
+    @staticmethod
+    def _normalize(tracking_number, email):
+        return (tracking_number or '').strip().upper(), (email or '').strip().lower()
+
+    def lookup(self, tracking_number, email):
+        """البحث عن حالة الطلب، مع ذاكرة مؤقتة قصيرة تشمل النتائج الفارغة"""
+        key = self._normalize(tracking_number, email)
+        if not all(key):
+            return None
+
+        result = self.cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        result = self._load(*key)
+        self.cache.set(key, result)
+        return result
+
+    def _load(self, tracking_number, email):
+        # الأعمدة المطلوبة كلها موجودة في ix_order_tracking_lookup
+        row = db.session.query(
+            Order.id, Order.status, Order.order_date
+        ).filter(
+            Order.tracking_number == tracking_number,
+            db.func.lower(Order.customer_email) == email
+        ).first()
+        if row is None:
+            return None
+
+        order_id, status, order_date = row
+        history = db.session.query(
+            OrderStatusHistory.status, OrderStatusHistory.created_at
+        ).filter(
+            OrderStatusHistory.order_id == order_id
+        ).order_by(OrderStatusHistory.created_at).all()
+
+        return {
+            'order_id': order_id,
+            'tracking_number': tracking_number,
+            'status': status,
+            'status_display': Order.STATUSES.get(status, status),
+            'order_date': order_date.strftime('%Y-%m-%d %H:%M'),
+            'history': [
+                {
+                    'status': entry_status,
+                    'status_display': Order.STATUSES.get(entry_status, entry_status),
+                    'created_at': created_at.strftime('%Y-%m-%d %H:%M'),
+                }
+                for entry_status, created_at in history
+            ],
+        }
+
+    def invalidate(self, order):
+        """حذف نتيجة الطلب من الذاكرة المؤقتة بعد تغيير حالته"""
+        if order.tracking_number and order.customer_email:
+            self.cache.delete(self._normalize(order.tracking_number, order.customer_email))
+
+
+# إنشاء نسخة من الخدمة
+order_tracking = OrderTracking()
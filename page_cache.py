@@ -0,0 +1,101 @@
+import hashlib
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import make_response, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+
+class PageCache:
+    """طلبات شرطية (ETag / Last-Modified) لصفحات الكتالوج
+
+    نسخة الصفحة تحسب من استعلام مفهرس صغير، فإن لم تتغير يرد 304 دون تنفيذ المسار أو القالب
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_age = 0
+        self._templates_version = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_age = app.config.get('CATALOG_CACHE_MAX_AGE', 0)
+        self._templates_version = app.config.get('ASSET_VERSION')
+
+    def templates_version(self):
+        """آخر تعديل على القوالب، حتى لا يخدم المتصفح صفحة بتصميم قديم"""
+        if self._templates_version is None:
+            latest = 0
+            for root, _, files in os.walk(os.path.join(self.app.root_path, self.app.template_folder)):
+                for name in files:
+                    latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+            self._templates_version = datetime.utcfromtimestamp(int(latest))
+        return self._templates_version
+
+    def last_modified_for(self, last_modified):
+        # Last-Modified لا يميز بين المستخدمين، فيعتمد على ETag وحده بعد تسجيل الدخول
+        if last_modified is None or current_user.is_authenticated:
+            return None
+        templates_version = self.templates_version()
+        if isinstance(templates_version, datetime):
+            return max(last_modified, templates_version)
+        return last_modified
+
+    def etag_for(self, version):
+        # الصفحة تعرض اسم المستخدم وروابط الأدمن، فالنسخة تختلف لكل مستخدم
+        if current_user.is_authenticated:
+            viewer = f'user:{current_user.id}:{current_user.version}'
+        else:
+            viewer = 'anonymous'
+        key = repr((request.endpoint, version, viewer, self.templates_version()))
+        return hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+    def _cache_headers(self, response, etag, last_modified):
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        if current_user.is_authenticated:
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        elif self.max_age:
+            response.cache_control.private = True
+            response.cache_control.max_age = self.max_age
+        else:
+            response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+
+    def conditional(self, version_func):
+        """مزخرف يستقبل دالة تعيد (نسخة البيانات، آخر تعديل) لنفس معاملات المسار"""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                # الرسائل المؤقتة تظهر مرة واحدة فقط، فلا نعيد استخدام نسخة المتصفح
+                if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                    return f(*args, **kwargs)
+
+                version, last_modified = version_func(*args, **kwargs)
+                etag = self.etag_for(version)
+                last_modified = self.last_modified_for(last_modified)
+                if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                    return self._cache_headers(make_response('', 304), etag, last_modified)
+
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200 or response.cache_control.private or response.cache_control.max_age:
+                    # المسار حدد سياسة التخزين بنفسه (مثل صفحة العروض)
+                    if response.status_code == 200:
+                        response.set_etag(etag, weak=True)
+                        if last_modified is not None:
+                            response.last_modified = last_modified
+                    return response
+                return self._cache_headers(response, etag, last_modified)
+            return decorated_function
+        return decorator
+
+
+# إنشاء نسخة من الخدمة
+page_cache = PageCache()
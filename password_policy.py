@@ -0,0 +1,94 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# البادئة vN$ تحدد إصدار سياسة التشفير، والتجزئات القديمة بدونها تعتبر الإصدار 1
+_VERSION_PREFIX = re.compile(r'^v(\d+)\$')
+
+
+class PasswordHashingBusy(Exception):
+    """لا توجد سعة متاحة لحساب كلمة المرور حالياً"""
+
+
+class PasswordPolicy:
+    """سياسة تشفير كلمات المرور مع تنفيذ الحساب في مجموعة خيوط محدودة"""
+
+    def __init__(self, app=None):
+        self.method = 'scrypt:32768:8:1'
+        self.salt_length = 16
+        self.version = 2
+        self.workers = 2
+        self.queue_size = 8
+        self.timeout = 5
+        self._method_prefix = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.salt_length = app.config.get('PASSWORD_HASH_SALT_LENGTH', self.salt_length)
+        self.version = app.config.get('PASSWORD_HASH_VERSION', self.version)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE_SIZE', self.queue_size)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._method_prefix = None
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+
+    def _get_executor(self):
+        # ينشأ عند أول استخدام حتى يكون لكل عامل مجموعته الخاصة بعد fork
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='password-hash')
+            return self._executor
+
+    def _run(self, func, *args):
+        """تنفيذ عملية التشفير في المجموعة المحدودة، ورفض الطلب عند امتلائها"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHashingBusy()
+        try:
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _split(stored_hash):
+        match = _VERSION_PREFIX.match(stored_hash)
+        if match:
+            return int(match.group(1)), stored_hash[match.end():]
+        return 1, stored_hash
+
+    def hash(self, password):
+        """تشفير كلمة المرور بالإعدادات الحالية"""
+        hashed = self._run(generate_password_hash, password, self.method, self.salt_length)
+        return f'v{self.version}${hashed}'
+
+    def verify(self, stored_hash, password):
+        if not stored_hash:
+            return False
+        _, hashed = self._split(stored_hash)
+        return self._run(check_password_hash, hashed, password)
+
+    @property
+    def method_prefix(self):
+        """الطريقة كما تخزنها Werkzeug بمعاملاتها الكاملة (scrypt -> scrypt:32768:8:1)
+
+        تحسب مرة واحدة بتجزئة قيمة فارغة، حتى تطابق التجزئات المخزنة أياً كانت صيغة الإعداد
+        """
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', self.method, 1).split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, stored_hash):
+        """هل تختلف إعدادات التجزئة المخزنة عن السياسة الحالية؟"""
+        version, hashed = self._split(stored_hash)
+        return version != self.version or hashed.split('$', 1)[0] != self.method_prefix
+
+
+# إنشاء نسخة من الخدمة
+password_policy = PasswordPolicy()
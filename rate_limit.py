@@ -0,0 +1,197 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request
+from werkzeug.exceptions import TooManyRequests
+
+_RULE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+_UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rule(rule):
+    """تحويل قاعدة مثل '5/minute' أو '3/10minutes' إلى (العدد، المدة بالثواني)"""
+    match = _RULE.match(rule)
+    if not match:
+        raise ValueError(f'Invalid rate limit rule: {rule}')
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * _UNITS[unit]
+
+
+def _sliding_window(now, period, limit, current, previous):
+    """تقدير عدد الطلبات في النافذة المنزلقة من نافذتين ثابتتين
+
+    يعيد (مسموح؟، ثواني الانتظار)
+    """
+    window_start = now - now % period
+    elapsed = now - window_start
+    estimated = previous * (period - elapsed) / period + current
+    if estimated < limit:
+        return True, 0
+
+    if current >= limit or not previous:
+        retry_after = period - elapsed
+    else:
+        # اللحظة التي يتناقص فيها وزن النافذة السابقة بما يكفي
+        retry_after = period * (1 - (limit - current) / previous) - elapsed
+    return False, max(1, math.ceil(retry_after))
+
+
+class MemoryStore:
+    """عدادات داخل العملية، مناسبة لعامل واحد
+
+    العدادات مرتبة حسب آخر استخدام، فالحذف يبدأ من أقدمها وبعدد ثابت لكل طلب
+    حتى مع سيل من مفاتيح مختلفة (عناوين أو أسماء مستخدمين)
+    """
+
+    # أقصى عدد من العدادات المنتهية يحذف في كل طلب
+    SWEEP_PER_HIT = 4
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()  # key -> [window_start, current, previous, expires_at]
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        window_start = int(now - now % period)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < window_start - period:
+                counter = [window_start, 0, 0, 0]
+            elif counter[0] < window_start:
+                counter = [window_start, 0, counter[1], 0]
+            # لا يؤثر العداد في أي قرار بعد انتهاء النافذة التالية
+            counter[3] = window_start + 2 * period
+            self._counters[key] = counter
+            self._counters.move_to_end(key)
+
+            allowed, retry_after = _sliding_window(now, period, limit, counter[1], counter[2])
+            if allowed:
+                counter[1] += 1
+
+            for _ in range(self.SWEEP_PER_HIT):
+                oldest = next(iter(self._counters.values()))
+                if oldest[3] > now:
+                    break
+                self._counters.popitem(last=False)
+            # عند امتلاء الحد يحذف الأقل استخداماً حتى لو لم ينته
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        return allowed, retry_after
+
+
+class SQLiteStore:
+    """عدادات مشتركة في ملف SQLite، مناسبة لعدة عمال على نفس الخادم"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                'key TEXT NOT NULL, window_start INTEGER NOT NULL, count INTEGER NOT NULL, '
+                'PRIMARY KEY (key, window_start)) WITHOUT ROWID'
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        window_start = int(now - now % period)
+        connection = self._connect()
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            counts = dict(connection.execute(
+                'SELECT window_start, count FROM rate_limit WHERE key = ? AND window_start IN (?, ?)',
+                (key, window_start, window_start - period)
+            ).fetchall())
+            allowed, retry_after = _sliding_window(
+                now, period, limit, counts.get(window_start, 0), counts.get(window_start - period, 0)
+            )
+            if allowed:
+                connection.execute(
+                    'INSERT INTO rate_limit (key, window_start, count) VALUES (?, ?, 1) '
+                    'ON CONFLICT (key, window_start) DO UPDATE SET count = count + 1',
+                    (key, window_start)
+                )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        # حذف النوافذ القديمة من حين لآخر
+        self._hits += 1
+        if self._hits % 1000 == 0:
+            connection.execute('DELETE FROM rate_limit WHERE window_start < ?', (int(now) - 2 * 86400,))
+        return allowed, retry_after
+
+
+def by_ip():
+    return request.remote_addr
+
+
+def by_form_field(name):
+    def key_func():
+        value = (request.form.get(name) or '').strip().lower()
+        return f'{name}={value}' if value else None
+    return key_func
+
+
+class RateLimiter:
+    """تحديد عدد الطلبات لكل IP أو اسم مستخدم قبل تشغيل المسار"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.store = MemoryStore()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self.store = self._create_store(app.config.get('RATELIMIT_STORAGE_URL', 'memory://'))
+
+    @staticmethod
+    def _create_store(url):
+        if url.startswith('sqlite:///'):
+            return SQLiteStore(url[len('sqlite:///'):])
+        if url == 'memory://':
+            return MemoryStore()
+        raise ValueError(f'Unsupported rate limit storage: {url}')
+
+    def limit(self, config_key, key_func=by_ip, methods=('POST',)):
+        """مزخرف يطبق القاعدة المحددة في الإعداد config_key"""
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if self.enabled and request.method in methods:
+                    key = key_func()
+                    if key:
+                        limit, period = parse_rule(self.app.config[config_key])
+                        allowed, retry_after = self.store.hit(f'{config_key}:{key}', limit, period)
+                        if not allowed:
+                            raise TooManyRequests(retry_after=retry_after)
+                return f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+
+# إنشاء نسخة من الخدمة
+rate_limiter = RateLimiter()
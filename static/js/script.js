@@ -355,4 +355,31 @@ document.addEventListener('DOMContentLoaded', function() {
         
         titleObserver.observe(titleElement);
     }
-});
\ No newline at end of file
+});
+// الاشتراك في تحديثات حالة الطلبات المباشرة من الخادم
+const ORDER_STATUS_BADGES = {
+    'pending': 'bg-warning',
+    'processing': 'bg-primary',
+    'shipped': 'bg-info',
+    'delivered': 'bg-success',
+    'cancelled': 'bg-danger'
+};
+
+function subscribeOrderEvents(url) {
+    if (!window.EventSource) {
+        return null;
+    }
+    
+    const source = new EventSource(url);
+    const handler = function(e) {
+        const data = JSON.parse(e.data);
+        document.querySelectorAll(`[data-order-status="${data.order_id}"]`).forEach(badge => {
+            Object.values(ORDER_STATUS_BADGES).forEach(cls => badge.classList.remove(cls));
+            badge.classList.add(ORDER_STATUS_BADGES[data.status] || 'bg-warning');
+            badge.textContent = data.status_display;
+        });
+    };
+    source.addEventListener('order_created', handler);
+    source.addEventListener('order_status_changed', handler);
+    return source;
+}
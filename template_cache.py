@@ -0,0 +1,60 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from jinja2 import FileSystemBytecodeCache
+
+
+class _LazyDirectoryBytecodeCache(FileSystemBytecodeCache):
+    """ينشئ المجلد عند أول كتابة حتى يبقى create_app بلا آثار على نظام الملفات"""
+
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+class TemplateCache:
+    """تخزين القوالب المترجمة في ملفات مشتركة بين العمال، وتحميلها مسبقاً عند الإقلاع
+
+    يجب استدعاء init_app قبل أول استخدام لـ app.jinja_env
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+            self.directory = app.config.get('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+            # المفتاح يتضمن مجموع القالب، فأي تعديل على الملف يعيد ترجمته
+            app.jinja_options = {**app.jinja_options, 'bytecode_cache': _LazyDirectoryBytecodeCache(self.directory)}
+        app.cli.add_command(compile_templates_command)
+
+    @staticmethod
+    def warm_up(app):
+        """ترجمة جميع القوالب وإبقاؤها في ذاكرة Jinja، ويعيد عددها
+
+        مع gunicorn --preload تتم الترجمة مرة واحدة في العملية الأم وتشترك العمال في الذاكرة
+        """
+        environment = app.jinja_env
+        names = [name for name in environment.list_templates() if name.endswith('.html')]
+        for name in names:
+            environment.get_template(name)
+        return len(names)
+
+
+@click.command('compile-templates')
+@with_appcontext
+def compile_templates_command():
+    """ترجمة جميع القوالب مسبقاً إلى مجلد التخزين المؤقت"""
+    count = template_cache.warm_up(current_app)
+    if template_cache.directory:
+        click.echo(f'Compiled {count} templates into {template_cache.directory}')
+    else:
+        click.echo(f'Compiled {count} templates (bytecode cache disabled)')
+
+
+# إنشاء نسخة من الخدمة
+template_cache = TemplateCache()
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import app as store
+from config import Config
+from extensions import db
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """إنشاء تطبيق على قاعدة SQLite مؤقتة، مع إعدادات إضافية لكل اختبار"""
+    def factory(**overrides):
+        settings = dict(
+            TESTING=True,
+            SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "store.db"}',
+            UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+            TEMPLATE_CACHE_DIR=str(tmp_path / 'jinja_cache'),
+            WTF_CSRF_ENABLED=False,
+            RATELIMIT_ENABLED=False,
+            MAIL_QUEUE_WORKER=False,
+            ORDER_EVENTS_WORKER=False,
+        )
+        settings.update(overrides)
+        app = store.create_app(type('TestConfig', (Config,), settings))
+
+        # مجلد القوالب باسم Templates، ولا يجده Flask باسم templates على أنظمة الملفات الحساسة لحالة الأحرف
+        if not os.path.isdir(os.path.join(app.root_path, app.template_folder)):
+            app.template_folder = 'Templates'
+            app.__dict__.pop('jinja_loader', None)
+
+        # الطلبات تفتح سياق تطبيق خاصاً بها، فلا يبقى السياق مفتوحاً أثناء الاختبار
+        with app.app_context():
+            db.create_all()
+        return app
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
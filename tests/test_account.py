@@ -0,0 +1,104 @@
+"""اختبارات تحديث معلومات الحساب وكلمة المرور (update_account)"""
+import pytest
+
+from extensions import db
+from models import User
+
+
+def make_user(username='buyer', password='secret123', **kwargs):
+    user = User(first_name='Test', last_name='Buyer', username=username,
+                email=f'{username}@example.com', **kwargs)
+    user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return session.get('_flashes', [])
+
+
+@pytest.fixture
+def user_id(app, client):
+    with app.app_context():
+        user_id = make_user(phone='0500000000')
+    client.post('/login', data={'username': 'buyer', 'password': 'secret123'})
+    return user_id
+
+
+def test_password_form_changes_only_the_password(app, client, user_id):
+    response = client.post('/update_account', data={
+        'current_password': 'secret123',
+        'new_password': 'newsecret456',
+        'confirm_password': 'newsecret456',
+    })
+    assert response.status_code == 302
+    assert ('success', 'تم تحديث كلمة المرور بنجاح') in flashes(client)
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert (user.first_name, user.username, user.email, user.phone) == \
+            ('Test', 'buyer', 'buyer@example.com', '0500000000')
+        assert user.check_password('newsecret456')
+        assert not user.check_password('secret123')
+
+
+def test_password_form_rejects_wrong_current_password(app, client, user_id):
+    client.post('/update_account', data={
+        'current_password': 'wrong',
+        'new_password': 'newsecret456',
+        'confirm_password': 'newsecret456',
+    })
+    assert ('danger', 'كلمة المرور الحالية غير صحيحة') in flashes(client)
+    with app.app_context():
+        assert db.session.get(User, user_id).check_password('secret123')
+
+
+def test_password_form_rejects_mismatched_confirmation(app, client, user_id):
+    client.post('/update_account', data={
+        'current_password': 'secret123',
+        'new_password': 'newsecret456',
+        'confirm_password': 'other',
+    })
+    assert ('danger', 'كلمة المرور الجديدة غير متطابقة') in flashes(client)
+    with app.app_context():
+        assert db.session.get(User, user_id).check_password('secret123')
+
+
+def test_profile_form_updates_submitted_fields(app, client, user_id):
+    client.post('/update_account', data={
+        'first_name': 'Noura',
+        'last_name': 'Saleh',
+        'username': 'noura',
+        'email': 'noura@example.com',
+        'phone': '',
+    })
+    assert ('success', 'تم تحديث معلومات الحساب بنجاح') in flashes(client)
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert (user.first_name, user.last_name, user.username, user.email, user.phone) == \
+            ('Noura', 'Saleh', 'noura', 'noura@example.com', None)
+        assert user.check_password('secret123')
+
+
+def test_profile_form_rejects_username_of_another_account(app, client, user_id):
+    with app.app_context():
+        make_user('taken')
+    client.post('/update_account', data={
+        'first_name': 'Test',
+        'last_name': 'Buyer',
+        'username': 'taken',
+        'email': 'buyer@example.com',
+    })
+    assert ('danger', 'اسم المستخدم موجود مسبقا، اختر اسم آخر') in flashes(client)
+    with app.app_context():
+        assert db.session.get(User, user_id).username == 'buyer'
+
+
+def test_profile_form_rejects_empty_required_field(app, client, user_id):
+    client.post('/update_account', data={'first_name': '', 'phone': '0511111111'})
+    assert ('danger', 'الرجاء تعبئة الحقول المطلوبة') in flashes(client)
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert (user.first_name, user.phone) == ('Test', '0500000000')
@@ -0,0 +1,71 @@
+"""اختبارات هوية المستخدم المخزنة في الجلسة (IdentityLoader)"""
+import pytest
+
+from extensions import db
+from models import User
+
+
+def make_user(username, is_admin=False):
+    user = User(first_name='Test', last_name='User', username=username,
+                email=f'{username}@example.com', is_admin=is_admin)
+    user.set_password('secret123')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+@pytest.fixture
+def users(app, client):
+    with app.app_context():
+        admin_id = make_user('manager', is_admin=True)
+        other_id = make_user('customer')
+    client.post('/login', data={'username': 'manager', 'password': 'secret123'})
+    return admin_id, other_id
+
+
+def change_in_another_worker(app, user_id, **values):
+    """تعديل صف المستخدم كما يفعل عامل آخر: القيم الجديدة مع زيادة رقم الإصدار"""
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for key, value in values.items():
+            setattr(user, key, value)
+        user.version += 1
+        db.session.commit()
+
+
+def test_demoted_admin_loses_access_immediately(app, client, users):
+    admin_id, other_id = users
+    assert client.post(f'/admin/user/toggle_admin/{other_id}').status_code == 302
+
+    change_in_another_worker(app, admin_id, is_admin=False)
+    assert client.post(f'/admin/user/toggle_admin/{other_id}').status_code == 403
+
+
+def test_deleted_user_session_stops_working(app, client, users):
+    admin_id, other_id = users
+    assert client.post(f'/admin/user/toggle_admin/{other_id}').status_code == 302
+
+    with app.app_context():
+        db.session.delete(db.session.get(User, admin_id))
+        db.session.commit()
+
+    response = client.post(f'/admin/user/toggle_admin/{other_id}')
+    assert response.status_code == 302
+    assert '/login' in response.headers['Location']
+    with app.app_context():
+        assert db.session.get(User, other_id).is_admin is True
+
+
+def test_snapshot_is_reused_while_version_is_unchanged(app, client, users):
+    admin_id, other_id = users
+    client.post(f'/admin/user/toggle_admin/{other_id}')
+
+    # تغيير دون زيادة الإصدار لا يقرأ حتى تنتهي مدة الهوية
+    with app.app_context():
+        db.session.get(User, admin_id).first_name = 'Renamed'
+        db.session.commit()
+    with client.session_transaction() as session:
+        assert session['_identity']['first_name'] == 'Test'
+    client.post(f'/admin/user/toggle_admin/{other_id}')
+    with client.session_transaction() as session:
+        assert session['_identity']['first_name'] == 'Test'
@@ -0,0 +1,64 @@
+"""اختبارات حدود فك الصور وحفظ الصور المتحركة (ImageService)"""
+import io
+import os
+
+import pytest
+from PIL import Image, ImageDraw
+
+from image_service import image_service
+
+
+def animated_gif(size, frames):
+    images = []
+    for i in range(frames):
+        image = Image.new('RGB', size, (255, 255, 255))
+        ImageDraw.Draw(image).rectangle((i, i, i + size[0] // 3, i + size[1] // 3), fill=(200, 30, i * 10 % 256))
+        images.append(image)
+    stream = io.BytesIO()
+    images[0].save(stream, 'GIF', save_all=True, append_images=images[1:], duration=40, loop=0)
+    stream.seek(0)
+    return stream
+
+
+def test_animated_budget_counts_every_frame(app):
+    with app.app_context():
+        # 100x100 بعشرين إطاراً: 100*100*(1+4) للفك + 20 إطاراً * 100*100*4
+        image_service.config.MAX_DECODE_MEMORY = 850_000
+        image_service.open_image(animated_gif((100, 100), 20), 'GIF').close()
+
+        image_service.config.MAX_DECODE_MEMORY = 849_999
+        with pytest.raises(ValueError):
+            image_service.open_image(animated_gif((100, 100), 20), 'GIF')
+
+
+def test_static_budget_counts_the_padded_canvas(app):
+    with app.app_context():
+        stream = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(stream, 'PNG')
+        # الصور الثابتة تحشى إلى أبعاد الحجم الكبير كاملة
+        large = image_service.config.LARGE_SIZE
+        image_service.config.MAX_DECODE_MEMORY = large[0] * large[1] * 4
+        with pytest.raises(ValueError):
+            image_service.open_image(stream, 'PNG')
+
+
+def test_animated_variants_are_not_padded_or_upscaled(app):
+    with app.app_context():
+        variants = image_service.process_image_stream(animated_gif((120, 80), 6), 'products')
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], 'products')
+        for name in variants.values():
+            with Image.open(os.path.join(upload_path, name)) as image:
+                assert image.size == (120, 80)
+                assert image.n_frames == 6
+
+
+def test_animated_variants_fit_the_size_box(app):
+    with app.app_context():
+        variants = image_service.process_image_stream(animated_gif((900, 450), 3), 'products')
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], 'products')
+        sizes = {}
+        for size_name, name in variants.items():
+            with Image.open(os.path.join(upload_path, name)) as image:
+                sizes[size_name] = image.size
+        assert sizes == {'thumbnail': (300, 150), 'medium': (600, 300),
+                         'large': (900, 450), 'original': (900, 450)}
@@ -0,0 +1,61 @@
+"""اختبارات الطلبات الشرطية لصفحات الكتالوج (ETag و 304)"""
+from extensions import db
+from models import Product, User
+
+
+def make_product(app, name='عباية'):
+    with app.app_context():
+        product = Product(name=name, description='عباية بقصة واسعة', price=100.0, category='عبايات', stock=5)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+
+
+def test_unchanged_catalog_returns_304(app, client):
+    make_product(app)
+    response = client.get('/products')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    cached = client.get('/products', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+
+def test_product_change_invalidates_etag(app, client):
+    product_id = make_product(app)
+    etag = client.get(f'/product/{product_id}').headers['ETag']
+
+    with app.app_context():
+        db.session.get(Product, product_id).price = 80.0
+        db.session.commit()
+
+    response = client.get(f'/product/{product_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_new_product_invalidates_listing(app, client):
+    make_product(app)
+    etag = client.get('/products').headers['ETag']
+    make_product(app, 'عباية سوداء')
+    assert client.get('/products', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_differs_per_viewer(app, client):
+    make_product(app)
+    anonymous = client.get('/products').headers['ETag']
+
+    with app.app_context():
+        user = User(first_name='Test', last_name='Buyer', username='buyer', email='buyer@example.com')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+    client.post('/login', data={'username': 'buyer', 'password': 'secret123'})
+    client.get('/')  # عرض رسالة تسجيل الدخول، فالصفحات التي فيها رسائل لا ترد 304
+
+    response = client.get('/products', headers={'If-None-Match': anonymous})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != anonymous
+    assert 'private' in response.headers['Cache-Control']
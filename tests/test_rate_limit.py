@@ -0,0 +1,59 @@
+"""اختبارات تحديد عدد محاولات تسجيل الدخول (RateLimiter)"""
+from extensions import db
+from models import User
+
+
+def login(client, username, password='wrong', ip='10.0.0.1'):
+    return client.post('/login', data={'username': username, 'password': password},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def make_user(app, username='buyer'):
+    with app.app_context():
+        user = User(first_name='Test', last_name='Buyer', username=username,
+                    email=f'{username}@example.com')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+
+
+def test_login_is_limited_per_username(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN_USERNAME='3/minute',
+                   RATELIMIT_LOGIN_IP='100/minute')
+    make_user(app)
+    client = app.test_client()
+
+    for _ in range(3):
+        assert login(client, 'buyer').status_code == 200
+    response = login(client, 'buyer')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    # حتى كلمة المرور الصحيحة ترفض بعد تجاوز الحد، واسم مستخدم آخر غير متأثر
+    assert login(client, 'buyer', 'secret123').status_code == 429
+    assert login(client, 'BUYER ', 'secret123').status_code == 429
+    assert login(client, 'someone').status_code == 200
+
+
+def test_login_is_limited_per_ip(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN_USERNAME='100/minute',
+                   RATELIMIT_LOGIN_IP='2/minute')
+    client = app.test_client()
+
+    assert login(client, 'first').status_code == 200
+    assert login(client, 'second').status_code == 200
+    assert login(client, 'third').status_code == 429
+    assert login(client, 'third', ip='10.0.0.2').status_code == 200
+
+
+def test_get_and_disabled_limiter_are_not_counted(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN_USERNAME='1/minute',
+                   RATELIMIT_LOGIN_IP='1/minute')
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get('/login').status_code == 200
+
+    app = make_app(RATELIMIT_ENABLED=False, RATELIMIT_LOGIN_USERNAME='1/minute')
+    client = app.test_client()
+    for _ in range(3):
+        assert login(client, 'buyer').status_code == 200
@@ -0,0 +1,188 @@
+"""اختبارات حجز المخزون عند إنشاء الطلب (reserve_stock و process_order)"""
+import app as store
+from extensions import db
+from models import Cart, Order, OrderItem, Product, ProductVariant, User
+
+
+def make_product(stock=0, **kwargs):
+    product = Product(name='عباية', price=100.0, category='عبايات', stock=stock, **kwargs)
+    db.session.add(product)
+    db.session.commit()
+    return product.id
+
+
+def make_variant(product_id, stock, sku='AB-M-BLK', size='M', color='أسود'):
+    variant = ProductVariant(product_id=product_id, sku=sku, size=size, color=color, stock=stock)
+    db.session.add(variant)
+    db.session.commit()
+    return variant.id
+
+
+def make_user(username='buyer'):
+    user = User(first_name='Test', last_name='Buyer', username=username,
+                email=f'{username}@example.com')
+    user.set_password('secret123')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def checkout(client):
+    client.post('/login', data={'username': 'buyer', 'password': 'secret123'})
+    return client.post('/process_order', data={'payment_method': 'cash',
+                                               'shipping_address': 'الرياض'})
+
+
+def test_last_variant_unit_is_sold_once(app):
+    with app.app_context():
+        product_id = make_product()
+        variant_id = make_variant(product_id, stock=1)
+        assert db.session.get(Product, product_id).stock == 1
+
+        first = Cart(user_id=1, product_id=product_id, variant_id=variant_id, quantity=1)
+        second = Cart(user_id=2, product_id=product_id, variant_id=variant_id, quantity=1)
+        assert store.reserve_stock(first) is True
+        assert store.reserve_stock(second) is False
+        db.session.commit()
+
+        db.session.expire_all()
+        assert db.session.get(ProductVariant, variant_id).stock == 0
+        # المجموع في المنتج ينقص مع المتغير
+        assert db.session.get(Product, product_id).stock == 0
+
+
+def test_inactive_variant_is_not_reserved(app):
+    with app.app_context():
+        product_id = make_product()
+        variant_id = make_variant(product_id, stock=5)
+        db.session.get(ProductVariant, variant_id).is_active = False
+        db.session.commit()
+
+        item = Cart(user_id=1, product_id=product_id, variant_id=variant_id, quantity=1)
+        assert store.reserve_stock(item) is False
+        db.session.expire_all()
+        assert db.session.get(ProductVariant, variant_id).stock == 5
+
+
+def test_product_without_variants_is_not_oversold(app):
+    with app.app_context():
+        product_id = make_product(stock=2)
+
+        assert store.reserve_stock(Cart(user_id=1, product_id=product_id, quantity=2)) is True
+        assert store.reserve_stock(Cart(user_id=2, product_id=product_id, quantity=1)) is False
+        db.session.commit()
+
+        db.session.expire_all()
+        assert db.session.get(Product, product_id).stock == 0
+
+
+def test_process_order_rolls_back_when_an_item_runs_out(app, client):
+    with app.app_context():
+        user_id = make_user()
+        plain_id = make_product(stock=5)
+        with_variants_id = make_product()
+        variant_id = make_variant(with_variants_id, stock=1)
+        # العنصر الأول يحجز بنجاح قبل أن يفشل الثاني، فيجب التراجع عن خصمه
+        db.session.add_all([
+            Cart(user_id=user_id, product_id=plain_id, quantity=2),
+            Cart(user_id=user_id, product_id=with_variants_id, variant_id=variant_id, quantity=2),
+        ])
+        db.session.commit()
+
+    response = checkout(client)
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/cart')
+
+    with app.app_context():
+        assert Order.query.count() == 0
+        assert OrderItem.query.count() == 0
+        assert Cart.query.filter_by(user_id=user_id).count() == 2
+        assert db.session.get(Product, plain_id).stock == 5
+        assert db.session.get(ProductVariant, variant_id).stock == 1
+        assert db.session.get(Product, with_variants_id).stock == 1
+
+
+def test_process_order_reserves_variant_stock(app, client):
+    with app.app_context():
+        user_id = make_user()
+        product_id = make_product()
+        variant_id = make_variant(product_id, stock=3)
+        db.session.add(Cart(user_id=user_id, product_id=product_id, variant_id=variant_id, quantity=2))
+        db.session.commit()
+
+    response = checkout(client)
+    assert response.status_code == 302
+    assert '/order_confirmation/' in response.headers['Location']
+
+    with app.app_context():
+        item = OrderItem.query.one()
+        variant = db.session.get(ProductVariant, variant_id)
+        assert (item.variant_id, item.sku, item.quantity) == (variant_id, 'AB-M-BLK', 2)
+        assert item.variant_label == variant.get_label()
+        assert variant.stock == 1
+        assert db.session.get(Product, product_id).stock == 1
+        assert Cart.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_item_without_variant_is_not_reserved_from_variant_stock(app):
+    with app.app_context():
+        product_id = make_product()
+        variant_id = make_variant(product_id, stock=3)
+
+        item = Cart(user_id=1, product_id=product_id, quantity=1)
+        assert store.reserve_stock(item) is False
+        db.session.commit()
+
+        assert db.session.get(Product, product_id).stock == 3
+        assert db.session.get(ProductVariant, variant_id).stock == 3
+
+
+def test_process_order_asks_for_variant_on_legacy_cart_item(app, client):
+    with app.app_context():
+        user_id = make_user()
+        product_id = make_product(stock=4)
+        # عنصر أضيف قبل أن تضاف للمنتج متغيرات
+        db.session.add(Cart(user_id=user_id, product_id=product_id, quantity=1))
+        db.session.commit()
+        variant_id = make_variant(product_id, stock=2)
+
+    response = checkout(client)
+    assert response.headers['Location'].endswith('/cart')
+
+    with app.app_context():
+        assert Order.query.count() == 0
+        assert db.session.get(Product, product_id).stock == 2
+        assert db.session.get(ProductVariant, variant_id).stock == 2
+
+
+def test_add_to_cart_requires_a_variant(app, client):
+    with app.app_context():
+        make_user()
+        product_id = make_product()
+        variant_id = make_variant(product_id, stock=2)
+    client.post('/login', data={'username': 'buyer', 'password': 'secret123'})
+
+    response = client.post(f'/add_to_cart/{product_id}', data={'quantity': 1})
+    assert response.headers['Location'].endswith(f'/product/{product_id}')
+    with app.app_context():
+        assert Cart.query.count() == 0
+
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 1, 'variant_id': variant_id},
+                headers={'Referer': '/products'})
+    with app.app_context():
+        assert Cart.query.one().variant_id == variant_id
+
+
+def test_update_cart_does_not_increase_legacy_item(app, client):
+    with app.app_context():
+        user_id = make_user()
+        product_id = make_product(stock=4)
+        db.session.add(Cart(user_id=user_id, product_id=product_id, quantity=1))
+        db.session.commit()
+        cart_id = Cart.query.one().id
+        make_variant(product_id, stock=2)
+    client.post('/login', data={'username': 'buyer', 'password': 'secret123'})
+
+    client.post(f'/update_cart/{cart_id}', data={'action': 'increase'})
+    with app.app_context():
+        assert db.session.get(Cart, cart_id).quantity == 1
@@ -0,0 +1,31 @@
+from extensions import db
+from models import User
+
+CONFLICT_MESSAGES = {
+    'username': 'اسم المستخدم موجود مسبقا، اختر اسم آخر',
+    'email': 'البريد الإلكتروني موجود مسبقا، اختر بريد آخر',
+}
+
+
+def find_conflicts(username=None, email=None, exclude_user_id=None):
+    """التحقق من تكرار اسم المستخدم والبريد الإلكتروني في استعلام EXISTS واحد
+
+    يعيد مجموعة أسماء الحقول المكررة
+    """
+    def exists(column, value):
+        query = db.select(User.id).where(column == value)
+        if exclude_user_id is not None:
+            query = query.where(User.id != exclude_user_id)
+        return query.exists().label(column.key)
+
+    checks = []
+    if username:
+        checks.append(exists(User.username, username))
+    if email:
+        checks.append(exists(User.email, email))
+    if not checks:
+        return set()
+
+    row = db.session.execute(db.select(*checks)).one()
+    return {field for field, taken in row._mapping.items() if taken}
+
@@ -0,0 +1,12 @@
+# نقطة الدخول لخوادم WSGI، مثال: gunicorn --preload wsgi:app
+# مع --preload تترجم القوالب مرة واحدة في العملية الأم وتشترك فيها جميع العمال
+# البث المباشر لأحداث الطلبات (/account/order_events) يحجز عاملاً طوال الاتصال، فاستخدم
+# عمالاً بخيوط: gunicorn --preload --worker-class gthread --threads 16 wsgi:app
+# أو عطله مع عمال sync الافتراضيين: ORDER_EVENTS_STREAM = False
+from app import create_app
+from template_cache import template_cache
+
+app = create_app()
+
+if app.config.get('TEMPLATE_WARMUP'):
+    template_cache.warm_up(app)